@@ -0,0 +1,158 @@
+"""Échéanciers d'amortissement calculés pour tous les prêts à la fois (tableaux NumPy)"""
+import numpy as np
+import pandas as pd
+
+# ==================== CONFIGURATION ====================
+# Périodicité : (unité du pas, pas, échéances par an)
+PERIODICITES = {
+    'mensuelle': ('M', 1, 12),
+    'trimestrielle': ('M', 3, 4),
+    'semestrielle': ('M', 6, 2),
+    'annuelle': ('M', 12, 1),
+    'hebdomadaire': ('D', 7, 52),
+}
+PERIODICITE_DEFAUT = 'mensuelle'
+
+# 'annuite' : échéances constantes ; 'capital' : part de capital constante, échéances décroissantes
+MODES_AMORTISSEMENT = ('annuite', 'capital')
+MODE_DEFAUT = 'annuite'
+
+# ==================== DATES ====================
+def _decaler(debuts, unites_mois, pas, rangs):
+    """Dates des échéances de rang `rangs` (N × K) à partir des dates de début (N)
+
+    Pas en mois : même jour du mois que le début, ramené au dernier jour
+    des mois plus courts. Pas en jours : simple addition.
+    """
+    debuts = debuts[:, None]
+    pas = pas[:, None]
+    mois_debut = debuts.astype('datetime64[M]')
+    jour = (debuts - mois_debut.astype('datetime64[D]')).astype(np.int64)
+    mois = mois_debut + rangs * pas
+    longueur = ((mois + 1).astype('datetime64[D]') - mois.astype('datetime64[D]')).astype(np.int64)
+    par_mois = mois.astype('datetime64[D]') + np.minimum(jour, longueur - 1)
+    par_jours = debuts + rangs * pas
+    return np.where(unites_mois[:, None], par_mois, par_jours)
+
+def _nombre_echeances(debuts, fins, unites_mois, pas):
+    """Nombre d'échéances entre le début (exclu) et l'échéance finale (incluse), au moins 1"""
+    mois = fins.astype('datetime64[M]').astype(np.int64) - debuts.astype('datetime64[M]').astype(np.int64)
+    jours = (fins - debuts).astype(np.int64)
+    return np.maximum(1, np.where(unites_mois, mois, jours) // pas)
+
+# ==================== ÉCHÉANCIER ====================
+class Echeancier:
+    """Échéanciers de N prêts sur au plus K échéances
+
+    Les tableaux sont de forme N × K ; au-delà de la dernière échéance d'un
+    prêt, les dates valent NaT et les montants 0 (solde compris).
+    """
+
+    def __init__(self, ids, principaux, nombres, dates, paiements, interets, capital, soldes):
+        self.ids = ids
+        self.principaux = principaux
+        self.nombres = nombres
+        self.dates = dates
+        self.paiements = paiements
+        self.interets = interets
+        self.capital = capital
+        self.soldes = soldes
+        # Total dû (intérêts compris) et montant payé après chaque échéance
+        self.cumuls = np.cumsum(paiements, axis=1)
+        self.totaux = self.cumuls[:, -1] if paiements.shape[1] else np.zeros(len(ids))
+        self.positions = {id_: i for i, id_ in enumerate(ids)}
+
+    def echues(self, jour):
+        """Nombre d'échéances passées (datées au plus tard `jour`) de chaque prêt"""
+        return (self.dates <= np.datetime64(jour, 'D')).sum(axis=1)
+
+    def solde_attendu(self, jour):
+        """Reste à payer (intérêts compris) selon l'échéancier après les échéances passées
+
+        Comparable au solde restant d'un prêt, qui diminue de chaque
+        remboursement : paiements cumulés contre échéances cumulées.
+        """
+        echues = self.echues(jour)
+        lignes = np.arange(len(self.ids))
+        payes = np.where(echues > 0, self.cumuls[lignes, np.maximum(echues - 1, 0)], 0.0)
+        return self.totaux - payes
+
+    def prochaine(self, jour):
+        """Date et montant de la prochaine échéance de chaque prêt (NaT et NaN une fois terminé)"""
+        echues = self.echues(jour)
+        restantes = echues < self.nombres
+        lignes = np.arange(len(self.ids))
+        rang = np.minimum(echues, self.dates.shape[1] - 1)
+        dates = np.where(restantes, self.dates[lignes, rang], np.datetime64('NaT'))
+        montants = np.where(restantes, self.paiements[lignes, rang], np.nan)
+        return dates, montants
+
+    def tableau(self, id_):
+        """Échéancier détaillé d'un prêt"""
+        i = self.positions[id_]
+        n = self.nombres[i]
+        return pd.DataFrame({
+            'rang': np.arange(1, n + 1),
+            'date': self.dates[i, :n],
+            'echeance': self.paiements[i, :n],
+            'interets': self.interets[i, :n],
+            'capital': self.capital[i, :n],
+            'solde': self.soldes[i, :n],
+        })
+
+def parametres(prets):
+    """Tableaux des paramètres d'amortissement de chaque prêt, valeurs par défaut comprises
+
+    Les prêts antérieurs à l'échéancier (sans date de début) sont
+    traités comme des prêts mensuels sans intérêts dont la première
+    échéance est la « prochaine échéance » enregistrée.
+    """
+    periodicites = [p.get('periodicite') or PERIODICITE_DEFAUT for p in prets]
+    unites_mois = np.array([PERIODICITES[p][0] == 'M' for p in periodicites], dtype=bool)
+    pas = np.array([PERIODICITES[p][1] for p in periodicites], dtype=np.int64)
+    par_an = np.array([PERIODICITES[p][2] for p in periodicites], dtype=float)
+    debuts = np.array([p.get('date_debut') or p['prochaine_echeance'] for p in prets], dtype='datetime64[D]')
+    anciens = np.array([not p.get('date_debut') for p in prets], dtype=bool)
+    if anciens.any():
+        # Début reconstitué : une période avant la première échéance connue
+        debuts[anciens] = _decaler(debuts[anciens], unites_mois[anciens], -pas[anciens], np.array([[1]]))[:, 0]
+    return {
+        'ids': [p['id'] for p in prets],
+        'principaux': np.array([p['montant_total'] for p in prets], dtype=float),
+        'taux': np.array([p.get('taux_annuel') or 0.0 for p in prets], dtype=float) / 100 / par_an,
+        'capital_constant': np.array([p.get('mode_amortissement') == 'capital' for p in prets], dtype=bool),
+        'debuts': debuts,
+        'fins': np.array([p['echeance'] for p in prets], dtype='datetime64[D]'),
+        'unites_mois': unites_mois,
+        'pas': pas,
+    }
+
+def calculer_echeanciers(prets):
+    """Échéanciers complets de tous les prêts, calculés ensemble"""
+    if not prets:
+        vide = np.empty((0, 0))
+        return Echeancier([], np.empty(0), np.empty(0, dtype=np.int64), vide.astype('datetime64[D]'), vide, vide, vide, vide)
+    p = parametres(prets)
+    principaux, taux = p['principaux'][:, None], p['taux'][:, None]
+    nombres = _nombre_echeances(p['debuts'], p['fins'], p['unites_mois'], p['pas'])
+    n = nombres[:, None]
+    rangs = np.arange(1, int(nombres.max()) + 1)[None, :]
+    actives = rangs <= n
+
+    # Solde après chaque échéance, sous forme fermée (pas de récurrence ligne à ligne)
+    avec_taux = taux > 0
+    taux_sur = np.where(avec_taux, taux, 1.0)
+    facteurs = (1 + taux) ** rangs
+    annuites = np.where(avec_taux, principaux * taux_sur / (1 - (1 + taux_sur) ** -n), principaux / n)
+    soldes_annuite = np.where(avec_taux, principaux * facteurs - annuites * (facteurs - 1) / taux_sur, principaux - annuites * rangs)
+    soldes_capital = principaux * (1 - rangs / n)
+    soldes = np.where(p['capital_constant'][:, None], soldes_capital, soldes_annuite)
+    # Arrondis flottants : dernière échéance exactement soldée, jamais de solde négatif
+    soldes = np.where(actives & (rangs < n), np.maximum(soldes, 0.0), 0.0)
+
+    precedents = np.concatenate([principaux, soldes[:, :-1]], axis=1)
+    interets = np.where(actives, precedents * taux, 0.0)
+    capital = np.where(actives, precedents - soldes, 0.0)
+    dates = _decaler(p['debuts'], p['unites_mois'], p['pas'], rangs)
+    dates = np.where(actives, dates, np.datetime64('NaT'))
+    return Echeancier(p['ids'], p['principaux'], nombres, dates, interets + capital, interets, capital, soldes)
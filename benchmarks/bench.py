@@ -0,0 +1,220 @@
+"""Benchmarks des chemins de données et d'agrégation de Finance Pro
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.bench --tailles 1000 10000 100000 --sortie resultats.json
+    python -m benchmarks.bench --reference resultats.json   # échoue si une mesure régresse
+
+Chaque taille est générée de façon déterministe (benchmarks/generateur.py),
+écrite avec le mode de stockage demandé dans un dossier temporaire, puis
+chaque opération est chronométrée plusieurs fois. « froid » vide les caches
+partagés et les mémos de session avant chaque répétition, « chaud » non.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.logger import set_log_level
+
+# Hors `streamlit run`, l'import de l'app et chaque accès à st.session_state émettent un avertissement
+set_log_level('error')
+
+import depense as D
+from benchmarks.generateur import GRAINE, generer_grand_livre
+from stockage import ouvrir_stockage
+
+# ==================== CONFIGURATION ====================
+TAILLES_DEFAUT = (1000, 10000, 100000)
+REPETITIONS_DEFAUT = 5
+# Hausse relative de la médiane au-delà de laquelle une mesure est une régression
+TOLERANCE_DEFAUT = 0.25
+# Écart absolu (secondes) en dessous duquel une hausse est du bruit
+ECART_MINIMAL = 0.002
+
+# Périodes calculées par calculer_soldes_periode, comme les renvoie render_period_selector
+PERIODES = {
+    'jour': ('jour', date(2026, 6, 15), None),
+    'semaine': ('semaine', date(2026, 6, 15), None),
+    'mois': ('mois', 6, 2026),
+    'annee': ('annee', None, 2026),
+    'plage': ('plage', date(2025, 3, 1), date(2026, 8, 31)),
+}
+
+# ==================== CHRONOMÉTRAGE ====================
+def chronometrer(fonction, repetitions, preparer=None):
+    """Durées (secondes) de `repetitions` appels, `preparer` exécuté hors chrono avant chacun"""
+    durees = []
+    for _ in range(repetitions):
+        if preparer is not None:
+            preparer()
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return {
+        'min_s': min(durees),
+        'mediane_s': statistics.median(durees),
+        'moyenne_s': statistics.fmean(durees),
+        'max_s': max(durees),
+        'repetitions': repetitions,
+    }
+
+def vider_caches():
+    """Oublier les DataFrames, index et mémos : le prochain appel repart de zéro"""
+    livre = D.get_grand_livre()
+    with livre.verrou_caches:
+        livre.caches.clear()
+    for cle in ('soldes_memo', 'grilles'):
+        st.session_state.pop(cle, None)
+
+def fermer_stockage():
+    D.get_stockage().fermer()
+    D.get_grand_livre.clear()
+    D.get_stockage.clear()
+
+def ouvrir():
+    """Chargement complet à froid : stockage, grand livre et instantané de session"""
+    fermer_stockage()
+    D.init_session_data()
+
+# ==================== SCÉNARIO ====================
+def mesurer(taille, mode, repetitions):
+    """Toutes les mesures pour une taille et un mode de stockage"""
+    dossier = tempfile.mkdtemp(prefix='finance_bench_')
+    origine = os.getcwd()
+    try:
+        os.chdir(dossier)
+        debut = time.perf_counter()
+        donnees = generer_grand_livre(taille)
+        generation = time.perf_counter() - debut
+        stockage = ouvrir_stockage(mode)
+        stockage.sauvegarder(donnees)
+        stockage.fermer()
+        del donnees
+
+        D.STOCKAGE_MODE = mode
+        D.init_session_data()
+        mesures = {'generation': {'min_s': generation, 'mediane_s': generation, 'moyenne_s': generation, 'max_s': generation, 'repetitions': 1}}
+
+        mesures['load_data'] = chronometrer(ouvrir, repetitions)
+        mesures['save_data'] = chronometrer(D.save_data, repetitions)
+
+        for nom, fonction in (
+            ('get_revenus_df', D.get_revenus_df),
+            ('get_depenses_df', D.get_depenses_df),
+            ('get_epargne_df', D.get_epargne_df),
+            ('get_prets_df', D.get_prets_df),
+            ('get_revenus_df_mois', lambda: D.get_revenus_df(6, 2026)),
+            ('get_depenses_df_mois', lambda: D.get_depenses_df(6, 2026)),
+        ):
+            mesures[f'{nom}_froid'] = chronometrer(fonction, repetitions, vider_caches)
+            mesures[f'{nom}_chaud'] = chronometrer(fonction, repetitions)
+
+        for nom, periode in PERIODES.items():
+            mesures[f'calculer_soldes_periode_{nom}_froid'] = chronometrer(
+                lambda: D.calculer_soldes_periode(*periode), repetitions, vider_caches)
+            # Nouvelle période sur des index déjà construits (mémo de session vidé)
+            mesures[f'calculer_soldes_periode_{nom}_index'] = chronometrer(
+                lambda: D.calculer_soldes_periode(*periode), repetitions,
+                lambda: st.session_state.pop('soldes_memo', None))
+            mesures[f'calculer_soldes_periode_{nom}_chaud'] = chronometrer(
+                lambda: D.calculer_soldes_periode(*periode), repetitions)
+
+        bornes = D.bornes_periode(*PERIODES['annee'])
+        mesures['agregat_categories_froid'] = chronometrer(
+            lambda: D.get_agregat_categories(*bornes).tableau(), repetitions, vider_caches)
+        mesures['agregat_categories_dataframe'] = chronometrer(
+            lambda: D.get_agregat_categories(*bornes).tableau(), repetitions,
+            lambda: (vider_caches(), D.get_df('depenses')))
+        mesures['agregat_categories_chaud'] = chronometrer(
+            lambda: D.get_agregat_categories(*bornes).tableau(), repetitions)
+
+        fermer_stockage()
+        return [{'taille': taille, 'mode': mode, 'mesure': nom, **valeurs} for nom, valeurs in mesures.items()]
+    finally:
+        os.chdir(origine)
+        shutil.rmtree(dossier, ignore_errors=True)
+
+# ==================== RÉSULTATS ====================
+def environnement():
+    """Contexte des mesures, enregistré avec les résultats"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    try:
+        import orjson
+        version_orjson = orjson.__version__
+    except ImportError:
+        version_orjson = None
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'revision': revision,
+        'python': platform.python_version(),
+        'plateforme': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'streamlit': st.__version__,
+        'orjson': version_orjson,
+        'graine': GRAINE,
+    }
+
+def comparer(resultats, reference, tolerance):
+    """Mesures dont la médiane dépasse celle de la référence de plus de `tolerance`"""
+    anciennes = {(r['taille'], r['mode'], r['mesure']): r for r in reference['resultats']}
+    regressions = []
+    for r in resultats:
+        ancienne = anciennes.get((r['taille'], r['mode'], r['mesure']))
+        if ancienne is None or r['mesure'] == 'generation':
+            continue
+        ecart = r['mediane_s'] - ancienne['mediane_s']
+        if ecart > ECART_MINIMAL and r['mediane_s'] > ancienne['mediane_s'] * (1 + tolerance):
+            regressions.append({**r, 'reference_s': ancienne['mediane_s'], 'rapport': r['mediane_s'] / ancienne['mediane_s']})
+    return regressions
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tailles', type=int, nargs='+', default=TAILLES_DEFAUT, help="nombres d'enregistrements (1000 à 1000000)")
+    parser.add_argument('--modes', nargs='+', default=['json'], help="modes de stockage (json, journal, sqlite, parquet)")
+    parser.add_argument('--repetitions', type=int, default=REPETITIONS_DEFAUT)
+    parser.add_argument('--sortie', help="fichier JSON des résultats (sortie standard sinon)")
+    parser.add_argument('--reference', help="résultats précédents à comparer")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE_DEFAUT)
+    args = parser.parse_args(arguments)
+
+    # Écritures synchrones : les mesures de sauvegarde incluent l'écriture
+    D.ECRITURE_DIFFEREE = False
+    resultats = []
+    for mode in args.modes:
+        for taille in args.tailles:
+            print(f"⏱️  {mode} — {taille:,} enregistrements", file=sys.stderr)
+            resultats.extend(mesurer(taille, mode, args.repetitions))
+
+    rapport = {'environnement': environnement(), 'resultats': resultats}
+    if args.reference:
+        with open(args.reference, 'r', encoding='utf-8') as f:
+            rapport['regressions'] = comparer(resultats, json.load(f), args.tolerance)
+
+    texte = json.dumps(rapport, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as f:
+            f.write(texte)
+    else:
+        print(texte)
+
+    for r in rapport.get('regressions', []):
+        print(f"❌ {r['mode']} {r['taille']:,} {r['mesure']} : {r['mediane_s'] * 1000:.1f} ms "
+              f"(référence {r['reference_s'] * 1000:.1f} ms, x{r['rapport']:.2f})", file=sys.stderr)
+    return 1 if rapport.get('regressions') else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
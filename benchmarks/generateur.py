@@ -0,0 +1,107 @@
+"""Générateur déterministe de grands livres synthétiques pour les benchmarks"""
+import numpy as np
+
+from moteur import TYPES_DEPENSES, TYPES_REVENUS
+
+# ==================== CONFIGURATION ====================
+GRAINE = 20240101
+# Dernier jour couvert ; les dates remontent de ANNEES ans
+FIN = np.datetime64('2026-12-31')
+ANNEES = 3
+
+# Part de chaque collection dans le nombre total d'enregistrements
+REPARTITION = {'revenus': 0.30, 'depenses': 0.62, 'epargne': 0.06, 'prets': 0.02}
+
+# Fréquence relative des catégories : les premières de chaque liste sont les plus courantes
+# (décroissance en 1/rang), montant médian (FCFA) et dispersion log-normale
+def _poids(types):
+    poids = 1 / np.arange(1, len(types) + 1)
+    return poids / poids.sum()
+
+MONTANTS_REVENUS = {
+    "Vente": 45000, "Service": 60000, "Consultation": 80000, "Abonnement": 15000, "Commission": 25000,
+    "Salaire": 250000, "Encaissement de devis": 150000, "Maintenance": 40000, "Dons": 10000, "Autre": 20000,
+}
+MONTANTS_DEPENSES = {
+    "Virements": 30000, "Transport": 2500, "Nourriture": 3500, "Factures": 20000, "Shopping": 15000,
+    "Santé": 12000, "Loisirs": 8000, "Restaurant": 6000, "Salaires": 150000, "Marketing": 50000,
+    "Loyer": 120000, "Équipement": 75000, "Maintenance": 25000, "Dîme": 10000, "Offrande": 2000,
+    "Promesse": 5000, "Sortie entre amis": 7000, "Salaire des employés": 120000, "WiFi": 20000,
+    "Crédit téléphonique": 1000, "Vêtement": 12000, "Engagement": 5000, "Autre": 5000,
+}
+DISPERSION = 0.6
+
+FOURNISSEURS = ["Orange", "MTN", "Moov", "Total", "Carrefour", "CIE", "SODECI", "Marché", "Pharmacie", "Boutique"]
+CLIENTS = ["Client A", "Client B", "Client C", "Société K", "Entreprise Z", "Particulier"]
+OBJECTIFS = ["Voyage", "Urgence", "Maison", "Études", "Voiture"]
+
+# ==================== GÉNÉRATION ====================
+def _ids(rng, nombre):
+    return [f'{x:016x}' for x in rng.integers(0, 2 ** 63, nombre, dtype=np.int64)]
+
+def _dates(rng, nombre):
+    jours = rng.integers(0, 365 * ANNEES, nombre)
+    return np.datetime_as_string(FIN - jours, unit='D').tolist()
+
+def _montants(rng, categories, medianes):
+    base = np.array([medianes[c] for c in categories], dtype=float)
+    return np.round(base * rng.lognormal(0, DISPERSION, len(categories)), -1).tolist()
+
+def generer_revenus(rng, nombre):
+    types = rng.choice(TYPES_REVENUS, nombre, p=_poids(TYPES_REVENUS)).tolist()
+    clients = rng.choice(CLIENTS, nombre).tolist()
+    return [
+        {'id': id_, 'date': d, 'type_revenu': t, 'client': c, 'montant': m, 'description': ''}
+        for id_, d, t, c, m in zip(_ids(rng, nombre), _dates(rng, nombre), types, clients, _montants(rng, types, MONTANTS_REVENUS))
+    ]
+
+def generer_depenses(rng, nombre):
+    types = rng.choice(TYPES_DEPENSES, nombre, p=_poids(TYPES_DEPENSES)).tolist()
+    fournisseurs = rng.choice(FOURNISSEURS, nombre).tolist()
+    return [
+        {'id': id_, 'date': d, 'type_depense': t, 'montant': m, 'fournisseur': f, 'description': ''}
+        for id_, d, t, m, f in zip(_ids(rng, nombre), _dates(rng, nombre), types, _montants(rng, types, MONTANTS_DEPENSES), fournisseurs)
+    ]
+
+def generer_epargne(rng, nombre):
+    dates = _dates(rng, nombre)
+    depots = np.round(rng.lognormal(np.log(25000), DISPERSION, nombre), -2)
+    objectifs = rng.choice(OBJECTIFS, nombre).tolist()
+    return [
+        {'id': id_, 'date': d, 'montant_depose': float(m), 'objectif': o}
+        for id_, d, m, o in zip(_ids(rng, nombre), dates, depots, objectifs)
+    ]
+
+def generer_prets(rng, nombre):
+    totaux = np.round(rng.lognormal(np.log(500000), 0.8, nombre), -3)
+    rembourses = np.round(totaux * rng.uniform(0, 1.2, nombre).clip(0, 1), -2)
+    echeances = _dates(rng, nombre)
+    prets = []
+    for i, id_ in enumerate(_ids(rng, nombre)):
+        restant = float(totaux[i] - rembourses[i])
+        prets.append({
+            'id': id_, 'nom_pret': f'Prêt {i + 1}', 'montant_total': float(totaux[i]),
+            'montant_rembourse': float(rembourses[i]), 'echeance': echeances[i],
+            'prochaine_echeance': echeances[i], 'solde_restant': restant,
+            'statut': 'soldé' if restant <= 0 else 'actif',
+        })
+    return prets
+
+def generer_grand_livre(taille, graine=GRAINE):
+    """Données de toutes les collections pour `taille` enregistrements au total
+
+    Même taille et même graine donnent exactement les mêmes données.
+    """
+    rng = np.random.default_rng(graine)
+    nombres = {col: max(1, int(round(taille * part))) for col, part in REPARTITION.items()}
+    return {
+        'revenus': generer_revenus(rng, nombres['revenus']),
+        'depenses': generer_depenses(rng, nombres['depenses']),
+        'recurrences': [],
+        'epargne': generer_epargne(rng, nombres['epargne']),
+        'objectifs': [],
+        'prets': generer_prets(rng, nombres['prets']),
+        'remboursements': [],
+        'projets': [],
+        'clients': [],
+    }
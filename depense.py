@@ -1,9 +1,21 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date
-import plotly.graph_objects as go
+import numpy as np
+from datetime import datetime, date, timedelta
 import calendar
+from bisect import bisect_right
+import os
 import time
+import moteur
+from amortissement import MODES_AMORTISSEMENT, PERIODICITES
+from diagnostic import CHRONOMETRE, DIAGNOSTIC_ACTIF, chronometrer, etape
+from grand_livre import GrandLivre
+from exportation import FORMATS_EXPORT, fichier_export, morceaux, nom_export
+from importation import CHAMPS, CHAMPS_OBLIGATOIRES, SENS_MONTANTS, colonnes_source, deviner_correspondance, importer
+from moteur import COLONNES_DF, COLONNES_MONTANT, TYPES_DEPENSES, TYPES_REVENUS, Registre, bornes_periode, filtrer_periode
+from prevision import CHEMINS_DEFAUT, HISTORIQUE_MOIS, HORIZON_DEFAUT, PERCENTILES_PREVISION
+from recurrences import FREQUENCES, dates_occurrences
+from stockage import ouvrir_stockage
 
 # ==================== CONFIGURATION ====================
 st.set_page_config(
@@ -32,8 +44,10 @@ COLORS = {
 }
 
 # ==================== CSS MOBILE ====================
-def load_mobile_dark_css():
-    st.markdown(f"""
+@st.cache_resource
+def feuille_de_style():
+    """Feuille de style construite une seule fois par processus"""
+    return f"""
     <style>
         @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800;900&display=swap');
         
@@ -262,6 +276,35 @@ def load_mobile_dark_css():
             box-shadow: 0 4px 12px rgba(255, 153, 102, 0.4);
         }}
         
+        .st-key-page_courante div[role="radiogroup"] {{
+            gap: 0.5rem;
+            padding: 0 1.5rem;
+            margin-bottom: 1.5rem;
+            flex-wrap: nowrap;
+            overflow-x: auto;
+            -webkit-overflow-scrolling: touch;
+        }}
+        
+        .st-key-page_courante div[role="radiogroup"] > label {{
+            background: {COLORS['bg_card']};
+            border-radius: 12px;
+            color: {COLORS['text_secondary']};
+            font-weight: 600;
+            padding: 0.875rem 1.25rem;
+            white-space: nowrap;
+            flex-shrink: 0;
+        }}
+        
+        .st-key-page_courante div[role="radiogroup"] > label > div:first-child {{
+            display: none;
+        }}
+        
+        .st-key-page_courante div[role="radiogroup"] > label:has(input:checked) {{
+            background: linear-gradient(135deg, {COLORS['accent_orange']}, {COLORS['accent_pink']});
+            color: {COLORS['text_primary']};
+            box-shadow: 0 4px 12px rgba(255, 153, 102, 0.4);
+        }}
+        
         .form-card {{
             background: {COLORS['bg_card']};
             border-radius: 20px;
@@ -336,242 +379,110 @@ def load_mobile_dark_css():
             border-radius: 10px;
         }}
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+@chronometrer()
+def load_mobile_dark_css():
+    st.markdown(feuille_de_style(), unsafe_allow_html=True)
 
 # ==================== INITIALISATION ====================
+# Mode de stockage : 'json' (un fichier par collection), 'journal' (journal d'écritures + compaction)
+# 'sqlite' (base indexée, requêtes par période en SQL) ou 'parquet' (partitions mensuelles)
+STOCKAGE_MODE = os.environ.get('FINANCE_STOCKAGE', 'json')
+# Écritures persistées en arrière-plan par lots ('0' pour écrire pendant la requête)
+ECRITURE_DIFFEREE = os.environ.get('FINANCE_ECRITURE_DIFFEREE', '1') != '0'
+
+@st.cache_resource
+def get_stockage():
+    """Stockage partagé par toutes les sessions du processus"""
+    return ouvrir_stockage(STOCKAGE_MODE, differe=ECRITURE_DIFFEREE)
+
+@st.cache_resource
+def get_grand_livre():
+    """Grand livre partagé : une seule copie des données pour toutes les sessions"""
+    return GrandLivre(get_stockage())
+
+def get_registre():
+    """Registre de la session, figé sur un instantané pour l'exécution en cours"""
+    return st.session_state.registre
+
+def get_instantane():
+    return get_registre().instantane
+
+def get_donnees():
+    """Listes de l'instantané, indexées par collection (lecture seule)"""
+    return get_registre().donnees
+
 def save_data():
-    """Sauvegarder toutes les données dans des fichiers JSON"""
-    import json
-    import os
-    
-    # Créer le dossier data s'il n'existe pas
-    if not os.path.exists('data'):
-        os.makedirs('data')
-    
-    # Sauvegarder chaque type de données
-    with open('data/revenus.json', 'w', encoding='utf-8') as f:
-        json.dump(st.session_state.revenus, f, ensure_ascii=False, indent=2)
-    
-    with open('data/depenses.json', 'w', encoding='utf-8') as f:
-        json.dump(st.session_state.depenses, f, ensure_ascii=False, indent=2)
-    
-    with open('data/epargne.json', 'w', encoding='utf-8') as f:
-        json.dump(st.session_state.epargne, f, ensure_ascii=False, indent=2)
-    
-    with open('data/prets.json', 'w', encoding='utf-8') as f:
-        json.dump(st.session_state.prets, f, ensure_ascii=False, indent=2)
-    
-    with open('data/projets.json', 'w', encoding='utf-8') as f:
-        json.dump(st.session_state.projets, f, ensure_ascii=False, indent=2)
-    
-    with open('data/clients.json', 'w', encoding='utf-8') as f:
-        json.dump(st.session_state.clients, f, ensure_ascii=False, indent=2)
+    """Sauvegarder toutes les données"""
+    get_grand_livre().sauvegarder()
 
-def load_data():
-    """Charger toutes les données depuis les fichiers JSON"""
-    import json
-    import os
-    
-    # Charger les revenus
-    if os.path.exists('data/revenus.json'):
-        try:
-            with open('data/revenus.json', 'r', encoding='utf-8') as f:
-                st.session_state.revenus = json.load(f)
-        except:
-            st.session_state.revenus = []
-    else:
-        st.session_state.revenus = []
-    
-    # Charger les dépenses
-    if os.path.exists('data/depenses.json'):
-        try:
-            with open('data/depenses.json', 'r', encoding='utf-8') as f:
-                st.session_state.depenses = json.load(f)
-        except:
-            st.session_state.depenses = []
-    else:
-        st.session_state.depenses = []
-    
-    # Charger l'épargne
-    if os.path.exists('data/epargne.json'):
-        try:
-            with open('data/epargne.json', 'r', encoding='utf-8') as f:
-                st.session_state.epargne = json.load(f)
-        except:
-            st.session_state.epargne = []
-    else:
-        st.session_state.epargne = []
-    
-    # Charger les prêts
-    if os.path.exists('data/prets.json'):
-        try:
-            with open('data/prets.json', 'r', encoding='utf-8') as f:
-                st.session_state.prets = json.load(f)
-        except:
-            st.session_state.prets = []
-    else:
-        st.session_state.prets = []
-    
-    # Charger les projets
-    if os.path.exists('data/projets.json'):
-        try:
-            with open('data/projets.json', 'r', encoding='utf-8') as f:
-                st.session_state.projets = json.load(f)
-        except:
-            st.session_state.projets = []
-    else:
-        st.session_state.projets = []
-    
-    # Charger les clients
-    if os.path.exists('data/clients.json'):
-        try:
-            with open('data/clients.json', 'r', encoding='utf-8') as f:
-                st.session_state.clients = json.load(f)
-        except:
-            st.session_state.clients = []
-    else:
-        st.session_state.clients = []
+def get_enregistrement(collection, id_):
+    return get_registre().enregistrement(collection, id_)
+
+def enregistrer_mutations(mutations):
+    get_registre().soumettre(mutations)
 
+def ajouter_enregistrement(collection, enregistrement):
+    return moteur.ajouter_enregistrement(get_registre(), collection, enregistrement)
+
+def supprimer_enregistrements(collection, ids):
+    return moteur.supprimer_enregistrements(get_registre(), collection, ids)
+
+def modifier_enregistrement(collection, enregistrement):
+    moteur.modifier_enregistrement(get_registre(), collection, enregistrement)
+
+@chronometrer()
 def init_session_data():
-    """Initialiser les données en session"""
-    if 'data_loaded' not in st.session_state:
-        # Charger les données depuis les fichiers
-        load_data()
-        st.session_state.data_loaded = True
-
-# ==================== CATÉGORIES ====================
-CATEGORIES_INFO = {
-    "Virements": {"icon": "💸", "color": "#66ffcc"},
-    "Transport": {"icon": "🚗", "color": "#6699ff"},
-    "Nourriture": {"icon": "🍔", "color": "#ffcc66"},
-    "Factures": {"icon": "📄", "color": "#ff9966"},
-    "Shopping": {"icon": "🛍️", "color": "#ff66cc"},
-    "Santé": {"icon": "⚕️", "color": "#cc66ff"},
-    "Loisirs": {"icon": "🎮", "color": "#66ff99"},
-    "Restaurant": {"icon": "🍽️", "color": "#ff6699"},
-    "Salaires": {"icon": "💼", "color": "#6699ff"},
-    "Marketing": {"icon": "📢", "color": "#ff9966"},
-}
+    """Adopter le dernier instantané du grand livre pour cette exécution"""
+    livre = get_grand_livre()
+    registre = st.session_state.get('registre')
+    if registre is None or registre.livre is not livre:
+        st.session_state.registre = Registre(livre)
+    else:
+        registre.actualiser()
+
+# ==================== DONNÉES ====================
+# Requêtes du moteur sur le registre de la session
+def get_version(collection):
+    return get_registre().version(collection)
+
+def get_df(collection):
+    return moteur.get_df(get_registre(), collection)
 
-TYPES_REVENUS = ["Vente", "Service", "Consultation", "Abonnement", "Commission", "Salaire", "Encaissement de devis", "Maintenance", "Dons", "Autre"]
-TYPES_DEPENSES = list(CATEGORIES_INFO.keys()) + ["Loyer", "Équipement", "Maintenance", "Dîme", "Offrande", "Promesse", "Sortie entre amis", "Salaire des employés", "WiFi", "Crédit téléphonique", "Vêtement", "Engagement", "Autre"]
-ETATS_PROJET = ["En cours", "Terminé", "En attente", "Annulé"]
+def get_agregat_categories(debut, fin):
+    return moteur.get_agregat_categories(get_registre(), debut, fin)
 
-# ==================== FONCTIONS ====================
 def get_revenus_df(mois=None, annee=None):
-    if not st.session_state.revenus:
-        return pd.DataFrame(columns=['date', 'type_revenu', 'client', 'montant', 'description'])
-    
-    df = pd.DataFrame(st.session_state.revenus)
-    df['date'] = pd.to_datetime(df['date'])
-    
-    if mois and annee:
-        df = df[(df['date'].dt.month == mois) & (df['date'].dt.year == annee)]
-    
-    return df.sort_values('date', ascending=False)
+    return moteur.get_revenus_df(get_registre(), mois, annee)
 
 def get_depenses_df(mois=None, annee=None):
-    if not st.session_state.depenses:
-        return pd.DataFrame(columns=['date', 'type_depense', 'montant', 'fournisseur', 'description'])
-    
-    df = pd.DataFrame(st.session_state.depenses)
-    df['date'] = pd.to_datetime(df['date'])
-    
-    if mois and annee:
-        df = df[(df['date'].dt.month == mois) & (df['date'].dt.year == annee)]
-    
-    return df.sort_values('date', ascending=False)
+    return moteur.get_depenses_df(get_registre(), mois, annee)
 
 def get_epargne_df():
-    if not st.session_state.epargne:
-        return pd.DataFrame(columns=['date', 'montant_depose', 'objectif', 'solde_actuel'])
-    
-    df = pd.DataFrame(st.session_state.epargne)
-    df['date'] = pd.to_datetime(df['date'])
-    return df.sort_values('date', ascending=False)
+    return moteur.get_epargne_df(get_registre())
 
-def get_solde_epargne():
-    df = get_epargne_df()
-    return df['solde_actuel'].iloc[0] if not df.empty else 0
+def get_solde_epargne(jour=None):
+    return moteur.get_solde_epargne(get_registre(), jour)
 
 def get_prets_df(statut=None):
-    if not st.session_state.prets:
-        return pd.DataFrame(columns=['nom_pret', 'montant_total', 'montant_rembourse', 'echeance', 'prochaine_echeance', 'solde_restant', 'statut'])
-    
-    df = pd.DataFrame(st.session_state.prets)
-    if statut:
-        df = df[df['statut'] == statut]
-    return df
+    return moteur.get_prets_df(get_registre(), statut)
 
+@chronometrer()
 def calculer_soldes_periode(periode_type, param1, param2):
     """Calcule les soldes selon la période sélectionnée"""
-    revenus_df = pd.DataFrame(st.session_state.revenus) if st.session_state.revenus else pd.DataFrame()
-    depenses_df = pd.DataFrame(st.session_state.depenses) if st.session_state.depenses else pd.DataFrame()
-    
-    if not revenus_df.empty:
-        revenus_df['date'] = pd.to_datetime(revenus_df['date'])
-    if not depenses_df.empty:
-        depenses_df['date'] = pd.to_datetime(depenses_df['date'])
-    
-    if periode_type == 'jour':
-        # param1 = date sélectionnée
-        if not revenus_df.empty:
-            revenus_df = revenus_df[revenus_df['date'].dt.date == param1]
-        if not depenses_df.empty:
-            depenses_df = depenses_df[depenses_df['date'].dt.date == param1]
-            
-    elif periode_type == 'semaine':
-        # param1 = date de début de semaine
-        debut_semaine = param1 - pd.Timedelta(days=param1.weekday())
-        fin_semaine = debut_semaine + pd.Timedelta(days=6)
-        
-        if not revenus_df.empty:
-            revenus_df = revenus_df[(revenus_df['date'].dt.date >= debut_semaine) & 
-                                   (revenus_df['date'].dt.date <= fin_semaine)]
-        if not depenses_df.empty:
-            depenses_df = depenses_df[(depenses_df['date'].dt.date >= debut_semaine) & 
-                                     (depenses_df['date'].dt.date <= fin_semaine)]
-            
-    elif periode_type == 'mois':
-        # param1 = mois, param2 = année
-        if not revenus_df.empty:
-            revenus_df = revenus_df[(revenus_df['date'].dt.month == param1) & 
-                                   (revenus_df['date'].dt.year == param2)]
-        if not depenses_df.empty:
-            depenses_df = depenses_df[(depenses_df['date'].dt.month == param1) & 
-                                     (depenses_df['date'].dt.year == param2)]
-            
-    elif periode_type == 'annee':
-        # param2 = année
-        if not revenus_df.empty:
-            revenus_df = revenus_df[revenus_df['date'].dt.year == param2]
-        if not depenses_df.empty:
-            depenses_df = depenses_df[depenses_df['date'].dt.year == param2]
-    
-    total_revenus = revenus_df['montant'].sum() if not revenus_df.empty else 0
-    total_depenses = depenses_df['montant'].sum() if not depenses_df.empty else 0
-    
-    return {
-        'revenus': total_revenus,
-        'depenses': total_depenses,
-        'solde': total_revenus - total_depenses,
-        'epargne': get_solde_epargne(),
-        'depenses_df': depenses_df
-    }
+    # Résultat mémorisé tant que ni la période ni les données ne changent
+    cle = (periode_type, param1, param2, get_version('revenus'), get_version('depenses'), get_version('epargne'), get_version('recurrences'))
+    memo = st.session_state.get('soldes_memo')
+    if memo is not None and memo[0] == cle:
+        return memo[1]
+    
+    soldes = moteur.calculer_soldes_periode(get_registre(), periode_type, param1, param2)
+    st.session_state.soldes_memo = (cle, soldes)
+    return soldes
 
 def calculer_soldes(mois, annee):
-    revenus_df = get_revenus_df(mois, annee)
-    depenses_df = get_depenses_df(mois, annee)
-    
-    total_revenus = revenus_df['montant'].sum() if not revenus_df.empty else 0
-    total_depenses = depenses_df['montant'].sum() if not depenses_df.empty else 0
-    
-    return {
-        'revenus': total_revenus,
-        'depenses': total_depenses,
-        'solde': total_revenus - total_depenses,
-        'epargne': get_solde_epargne()
-    }
+    return moteur.calculer_soldes(get_registre(), mois, annee)
 
 # ==================== UI ====================
 def render_mobile_header():
@@ -587,6 +498,7 @@ def render_mobile_header():
         </div>
     """, unsafe_allow_html=True)
 
+@chronometrer()
 def render_period_selector():
     st.markdown('<div style="padding: 0 1.5rem 1rem 1.5rem;">', unsafe_allow_html=True)
     
@@ -595,7 +507,7 @@ def render_period_selector():
     with col1:
         periode = st.selectbox(
             "Période",
-            ["Jour", "Semaine", "Mois", "Année"],
+            ["Jour", "Semaine", "Mois", "Année", "Personnalisée"],
             index=2,
             label_visibility="collapsed"
         )
@@ -653,7 +565,7 @@ def render_period_selector():
             st.markdown('</div>', unsafe_allow_html=True)
             return ('mois', months_options[selected][0], months_options[selected][1])
             
-        else:  # Année
+        elif periode == "Année":
             annee = st.selectbox(
                 "Année",
                 range(2020, 2031),
@@ -662,7 +574,23 @@ def render_period_selector():
             )
             st.markdown('</div>', unsafe_allow_html=True)
             return ('annee', None, annee)
+            
+        else:  # Personnalisée
+            plage = st.date_input(
+                "Du ... au ...",
+                value=(date.today().replace(day=1), date.today()),
+                min_value=date(2020, 1, 1),
+                max_value=date(2030, 12, 31),
+                format="DD/MM/YYYY",
+                label_visibility="collapsed"
+            )
+            # Tant que la date de fin n'est pas choisie, la plage se réduit à un jour
+            debut = plage[0] if plage else date.today()
+            fin = plage[1] if len(plage) > 1 else debut
+            st.markdown('</div>', unsafe_allow_html=True)
+            return ('plage', debut, fin)
 
+@chronometrer()
 def render_stats_cards(soldes):
     st.markdown(f"""
         <div class="stats-row">
@@ -686,20 +614,21 @@ def render_stats_cards(soldes):
         </div>
     """, unsafe_allow_html=True)
 
-def render_circular_chart(depenses_df, total_depenses):
-    if depenses_df.empty:
+@chronometrer()
+def render_circular_chart(categories, total_depenses):
+    if not categories:
         return
     
-    cat_data = depenses_df.groupby('type_depense')['montant'].sum().reset_index()
-    cat_data = cat_data.sort_values('montant', ascending=False)
+    # Import différé : plotly n'est chargé que si un graphique est affiché
+    import plotly.graph_objects as go
     
     colors = ['#ff66cc', '#66ffcc', '#6699ff', '#ffcc66', '#cc66ff', '#ff9966']
     
     fig = go.Figure(data=[go.Pie(
-        labels=cat_data['type_depense'],
-        values=cat_data['montant'],
+        labels=[cat['categorie'] for cat in categories],
+        values=[cat['montant'] for cat in categories],
         hole=0.75,
-        marker=dict(colors=colors[:len(cat_data)]),
+        marker=dict(colors=colors[:len(categories)]),
         textinfo='none',
         hovertemplate='<b>%{label}</b><br>%{value:,.0f} FCFA<br>%{percent}<extra></extra>'
     )])
@@ -723,40 +652,404 @@ def render_circular_chart(depenses_df, total_depenses):
     st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
     st.markdown('</div>', unsafe_allow_html=True)
 
-def render_category_list(depenses_df, total_depenses):
-    if depenses_df.empty:
+@chronometrer()
+def render_category_list(categories, total_depenses):
+    if not categories:
         return
     
-    cat_data = depenses_df.groupby('type_depense')['montant'].sum().reset_index()
-    cat_data = cat_data.sort_values('montant', ascending=False)
-    
-    st.markdown('<div class="category-list">', unsafe_allow_html=True)
-    
-    for _, row in cat_data.iterrows():
-        cat_name = row['type_depense']
-        montant = row['montant']
-        pourcentage = (montant / total_depenses * 100) if total_depenses > 0 else 0
-        
-        cat_info = CATEGORIES_INFO.get(cat_name, {"icon": "📦", "color": "#8a8a8a"})
-        
-        st.markdown(f"""
+    # Toute la liste en un seul bloc HTML
+    items = "".join(f"""
             <div class="category-item">
                 <div class="category-left">
-                    <div class="category-icon" style="background: {cat_info['color']}20;">
-                        {cat_info['icon']}
+                    <div class="category-icon" style="background: {cat['color']}20;">
+                        {cat['icon']}
                     </div>
-                    <div class="category-name">{cat_name}</div>
+                    <div class="category-name">{cat['categorie']}</div>
                 </div>
                 <div class="category-right">
-                    <div class="category-amount">-{montant:,.0f} FCFA</div>
-                    <div class="category-percent">{pourcentage:.0f}%</div>
+                    <div class="category-amount">-{cat['montant']:,.0f} FCFA</div>
+                    <div class="category-percent">{cat['pourcentage']:.0f}%</div>
                 </div>
             </div>
-        """, unsafe_allow_html=True)
+        """ for cat in categories)
+    
+    st.markdown(f'<div class="category-list">{items}</div>', unsafe_allow_html=True)
+
+# ==================== PRÉVISION ====================
+SERIES_LIBELLES = {
+    'tresorerie': "Trésorerie cumulée",
+    'solde': "Solde du mois",
+    'revenus': "Revenus",
+    'depenses': "Dépenses",
+    'echeances': "Échéances de prêts",
+    'epargne': "Épargne",
+}
+CHEMINS_CHOIX = (10000, 50000, 100000)
+
+def get_prevision(horizon=HORIZON_DEFAUT, chemins=CHEMINS_DEFAUT):
+    return moteur.get_prevision(get_registre(), horizon, chemins)
+
+def lire_prevision(horizon=HORIZON_DEFAUT, chemins=CHEMINS_DEFAUT):
+    return moteur.lire_prevision(get_registre(), horizon, chemins)
+
+@chronometrer()
+def render_prevision_chart(prevision, serie, hauteur=320):
+    """Médiane et bandes de percentiles (5–95 et 25–75) d'une série"""
+    import plotly.graph_objects as go
+    
+    tableau = prevision.tableau(serie)
+    bas, haut = f"p{PERCENTILES_PREVISION[0]}", f"p{PERCENTILES_PREVISION[-1]}"
+    q1, q3 = f"p{PERCENTILES_PREVISION[1]}", f"p{PERCENTILES_PREVISION[-2]}"
+    fig = go.Figure()
+    for inferieur, superieur, opacite in ((bas, haut, 0.15), (q1, q3, 0.3)):
+        fig.add_trace(go.Scatter(x=tableau['mois'], y=tableau[superieur], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(
+            x=tableau['mois'], y=tableau[inferieur], mode='lines', line=dict(width=0), fill='tonexty',
+            fillcolor=f'rgba(102, 153, 255, {opacite})', name=f"{inferieur[1:]}–{superieur[1:]} %", hoverinfo='skip'
+        ))
+    fig.add_trace(go.Scatter(
+        x=tableau['mois'], y=tableau['p50'], mode='lines+markers', line=dict(color=COLORS['accent_blue'], width=2),
+        name="Médiane", hovertemplate='%{x|%m/%Y}<br>%{y:,.0f} FCFA<extra></extra>'
+    ))
+    fig.update_layout(
+        title=dict(text=SERIES_LIBELLES[serie], font=dict(color=COLORS['text_primary'], size=16)),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color=COLORS['text_secondary']),
+        margin=dict(t=40, b=20, l=20, r=20),
+        height=hauteur,
+        legend=dict(orientation='h', y=-0.15),
+        yaxis=dict(gridcolor='#252525'),
+    )
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+
+# ==================== HISTORIQUE ====================
+# Colonnes affichées dans la grille d'historique de chaque collection
+HISTORIQUE_COLONNES = {
+    'revenus': {'date': "Date", 'type_revenu': "Type", 'client': "Client", 'montant': "Montant (FCFA)", 'description': "Description"},
+    'depenses': {'date': "Date", 'type_depense': "Type", 'fournisseur': "Fournisseur", 'montant': "Montant (FCFA)", 'description': "Description"},
+    'epargne': {'date': "Date", 'montant_depose': "Mouvement (FCFA)", 'objectif': "Objectif", 'solde_actuel': "Solde (FCFA)"},
+}
+TAILLES_PAGE = [25, 50, 100, 250]
+
+def trier_filtrer(collection, df, filtre, tri, croissant, vue_source=None):
+    """Lignes filtrées et triées, mémorisées tant que les données et les critères ne changent pas"""
+    # Les occurrences des récurrences changent avec les règles et avec la date du jour
+    cle = (get_version(collection), get_version('recurrences'), date.today(), vue_source, filtre, tri, croissant)
+    grille = collection if vue_source is None else f"{collection}_{vue_source[0]}"
+    memo = st.session_state.setdefault('grilles', {})
+    if grille not in memo or memo[grille][0] != cle:
+        vue = df
+        if filtre:
+            colonnes_texte = [c for c in HISTORIQUE_COLONNES[collection] if c != 'date' and c not in COLONNES_MONTANT]
+            masque = np.zeros(len(vue), dtype=bool)
+            for col in colonnes_texte:
+                if col in vue.columns:
+                    masque |= vue[col].astype(str).str.contains(filtre, case=False, regex=False).to_numpy()
+            vue = vue[masque]
+        vue = vue.sort_values(tri, ascending=croissant, kind='stable')
+        memo[grille] = (cle, vue)
+    return memo[grille][1]
+
+@chronometrer()
+def render_historique(collection, df, vue_source=None):
+    """Grille paginée : filtre et tri côté serveur, seule la page visible est envoyée
+
+    `vue_source` distingue une grille de lignes choisies (('recherche', requête, bornes))
+    de l'historique complet : chacune a ses propres réglages.
+    """
+    colonnes = HISTORIQUE_COLONNES[collection]
+    grille = collection if vue_source is None else f"{collection}_{vue_source[0]}"
+    
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        filtre = st.text_input("🔎 Filtrer", key=f"filtre_{grille}")
+    with col2:
+        tri = st.selectbox("Trier par", list(colonnes), format_func=lambda c: colonnes[c], key=f"tri_{grille}")
+    with col3:
+        croissant = st.toggle("Croissant", key=f"ordre_{grille}")
+    with col4:
+        taille = st.selectbox("Lignes", TAILLES_PAGE, key=f"taille_{grille}")
+    
+    vue = trier_filtrer(collection, df, filtre.strip(), tri, croissant, vue_source)
+    nb_pages = max(1, -(-len(vue) // taille))
+    cle_page = f"page_{grille}"
+    if st.session_state.get(cle_page, 1) > nb_pages:
+        st.session_state[cle_page] = nb_pages
+    page = st.number_input(f"Page (sur {nb_pages})", min_value=1, max_value=nb_pages, step=1, key=cle_page)
+    
+    page_df = vue.iloc[(page - 1) * taille:page * taille]
+    colonnes_page = [c for c in colonnes if c in page_df.columns]
+    selection = st.dataframe(
+        page_df[colonnes_page],
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        column_config={
+            c: (st.column_config.DateColumn(colonnes[c], format="DD/MM/YYYY") if c == 'date'
+                else st.column_config.NumberColumn(colonnes[c], format="%.0f") if c in COLONNES_MONTANT
+                else st.column_config.TextColumn(colonnes[c]))
+            for c in colonnes_page
+        },
+        # La sélection est réinitialisée quand la page affichée change
+        key=f"grille_{grille}_{page}_{taille}_{filtre}_{tri}_{croissant}"
+    )
+    st.caption(f"{len(vue):,} ligne(s)")
+    
+    ids = page_df['id'].iloc[selection.selection.rows].tolist()
+    if ids and st.button(f"🗑️ Supprimer la sélection ({len(ids)})", key=f"supprimer_{grille}"):
+        supprimer_enregistrements(collection, ids)
+        notifier(f"{len(ids)} ligne(s) supprimée(s) !")
+        st.rerun()
+
+# ==================== RÉCURRENCES ====================
+FREQUENCES_LIBELLES = {'mensuelle': "Mensuelle", 'hebdomadaire': "Hebdomadaire", 'jours': "Tous les N jours"}
+UNITES_FREQUENCE = {'mensuelle': "mois", 'hebdomadaire': "semaine(s)", 'jours': "jour(s)"}
+# Champs propres à chaque collection : type, tiers et libellé du tiers
+CHAMPS_RECURRENCE = {
+    'revenus': ('type_revenu', 'client', "Client"),
+    'depenses': ('type_depense', 'fournisseur', "Fournisseur"),
+}
+# Occurrences proposées à la modification, de part et d'autre d'aujourd'hui
+JOURS_OCCURRENCES = 92
+
+def libelle_recurrence(regle):
+    champ_type, _, _ = CHAMPS_RECURRENCE[regle['collection']]
+    intervalle = regle.get('intervalle') or 1
+    rythme = f"tous les {intervalle} {UNITES_FREQUENCE[regle['frequence']]}" if intervalle > 1 else FREQUENCES_LIBELLES[regle['frequence']].lower()
+    return f"{regle['modele'][champ_type]} — {regle['modele']['montant']:,.0f} FCFA, {rythme}"
+
+@chronometrer()
+def render_recurrences(collection, types):
+    """Règles récurrentes : création, liste, arrêt et modification d'une seule occurrence"""
+    champ_type, champ_tiers, libelle_tiers = CHAMPS_RECURRENCE[collection]
+    
+    st.markdown('<div class="form-card">', unsafe_allow_html=True)
+    with st.form(f"form_recurrence_{collection}"):
+        col1, col2 = st.columns(2)
+        with col1:
+            type_ = st.selectbox("Type", types)
+            montant = st.number_input("Montant (FCFA)", min_value=0.0, step=1000.0)
+            tiers = st.text_input(libelle_tiers)
+            description = st.text_input("Description")
+        with col2:
+            frequence = st.selectbox("Fréquence", list(FREQUENCES), format_func=FREQUENCES_LIBELLES.get)
+            intervalle = st.number_input("Intervalle (tous les N mois, semaines ou jours)", min_value=1, value=1, step=1)
+            date_debut = st.date_input("Première occurrence", value=date.today(), format="DD/MM/YYYY")
+            date_fin = st.date_input("Dernière occurrence (facultatif)", value=None, format="DD/MM/YYYY")
+        
+        submitted = st.form_submit_button("🔁 Créer la récurrence", use_container_width=True)
     
+    if submitted:
+        if montant <= 0:
+            st.error("❌ Le montant doit être supérieur à 0", icon="❌")
+        elif date_fin is not None and date_fin < date_debut:
+            st.error("❌ La dernière occurrence précède la première", icon="❌")
+        else:
+            moteur.ajouter_recurrence(get_registre(), collection, {
+                champ_type: type_,
+                'montant': montant,
+                champ_tiers: tiers,
+                'description': description,
+            }, frequence, date_debut, date_fin, int(intervalle))
+            notifier(f"Récurrence « {type_} » de {montant:,.0f} FCFA créée !", icon="🔁")
+            st.rerun()
     st.markdown('</div>', unsafe_allow_html=True)
+    
+    regles = {r['id']: r for r in get_registre().donnees['recurrences'] if r['collection'] == collection}
+    if not regles:
+        st.info("Aucune récurrence")
+        return
+    
+    aujourd_hui = date.today()
+    st.markdown("### 📋 Récurrences")
+    st.dataframe(
+        pd.DataFrame([
+            {
+                'regle': libelle_recurrence(r),
+                'tiers': r['modele'].get(champ_tiers, ''),
+                'debut': pd.Timestamp(r['date_debut']),
+                'fin': pd.Timestamp(r['date_fin']) if r.get('date_fin') else pd.NaT,
+                'prochaine': next(iter(dates_occurrences(r, aujourd_hui, aujourd_hui + timedelta(days=400))), pd.NaT),
+                'exceptions': len(r.get('exceptions') or {}),
+            }
+            for r in regles.values()
+        ]),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'regle': st.column_config.TextColumn("Règle"),
+            'tiers': st.column_config.TextColumn(libelle_tiers),
+            'debut': st.column_config.DateColumn("Début", format="DD/MM/YYYY"),
+            'fin': st.column_config.DateColumn("Fin", format="DD/MM/YYYY"),
+            'prochaine': st.column_config.DateColumn("Prochaine", format="DD/MM/YYYY"),
+            'exceptions': st.column_config.NumberColumn("Exceptions"),
+        }
+    )
+    
+    regle_id = st.selectbox("Récurrence", list(regles), format_func=lambda r: libelle_recurrence(regles[r]), key=f"recurrence_{collection}")
+    regle = regles[regle_id]
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("⏹️ Arrêter aujourd'hui", use_container_width=True, key=f"arreter_{collection}"):
+            moteur.arreter_recurrence(get_registre(), regle_id, aujourd_hui)
+            notifier("Récurrence arrêtée : les occurrences passées sont conservées", icon="⏹️")
+            st.rerun()
+    with col2:
+        if st.button("🗑️ Supprimer la règle", use_container_width=True, key=f"supprimer_recurrence_{collection}",
+                     help="Retire aussi toutes ses occurrences passées"):
+            supprimer_enregistrements('recurrences', [regle_id])
+            notifier("Récurrence supprimée", icon="🗑️")
+            st.rerun()
+    
+    # Modification d'une seule occurrence, conservée comme exception de la règle
+    exceptions = regle.get('exceptions') or {}
+    jours = dates_occurrences(regle, aujourd_hui - timedelta(days=JOURS_OCCURRENCES), aujourd_hui + timedelta(days=JOURS_OCCURRENCES)).astype(str).tolist()
+    if not jours:
+        return
+    st.markdown("### ✏️ Une seule occurrence")
+    def libelle_jour(jour):
+        etat = " (ignorée)" if jour in exceptions and exceptions[jour] is None else " (modifiée)" if jour in exceptions else ""
+        return f"{date.fromisoformat(jour):%d/%m/%Y}{etat}"
+    col1, col2 = st.columns(2)
+    with col1:
+        jour = st.selectbox("Occurrence", jours, index=min(bisect_right(jours, str(aujourd_hui)), len(jours) - 1),
+                            format_func=libelle_jour, key=f"occurrence_{collection}")
+    with col2:
+        actuel = (exceptions.get(jour) or {}).get('montant', regle['modele']['montant'])
+        nouveau_montant = st.number_input("Montant de cette occurrence (FCFA)", min_value=0.0, value=float(actuel), step=1000.0,
+                                          key=f"montant_occurrence_{collection}_{regle_id}_{jour}")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("✏️ Modifier", use_container_width=True, key=f"modifier_occurrence_{collection}"):
+            moteur.remplacer_occurrence(get_registre(), regle_id, jour, {'montant': nouveau_montant})
+            notifier(f"Occurrence du {libelle_jour(jour)} : {nouveau_montant:,.0f} FCFA")
+            st.rerun()
+    with col2:
+        if st.button("⏭️ Ignorer", use_container_width=True, key=f"ignorer_occurrence_{collection}"):
+            moteur.remplacer_occurrence(get_registre(), regle_id, jour, None)
+            notifier(f"Occurrence du {libelle_jour(jour)} ignorée", icon="⏭️")
+            st.rerun()
+    with col3:
+        if st.button("↩️ Rétablir", use_container_width=True, key=f"retablir_occurrence_{collection}", disabled=jour not in exceptions):
+            moteur.retablir_occurrence(get_registre(), regle_id, jour)
+            notifier(f"Occurrence du {date.fromisoformat(jour):%d/%m/%Y} rétablie", icon="↩️")
+            st.rerun()
+
+# ==================== IMPORT ====================
+SENS_LIBELLES = {
+    'tous': "Toutes les lignes (valeur absolue)",
+    'debits': "Débits seulement (montants négatifs)",
+    'credits': "Crédits seulement (montants positifs)",
+}
+
+@chronometrer()
+def render_import(collection, types):
+    """Import d'un relevé CSV ou Excel, lu et enregistré par lots"""
+    fichier = st.file_uploader("Relevé bancaire ou mobile money", type=['csv', 'xlsx'], key=f"fichier_{collection}")
+    if fichier is None:
+        st.caption("Fichier CSV (séparateur , ; ou tabulation) ou Excel, avec une ligne d'en-têtes")
+        return
+    
+    colonnes = colonnes_source(fichier, fichier.name)
+    devinee = deviner_correspondance(colonnes, collection)
+    libelles = HISTORIQUE_COLONNES[collection]
+    choix = ['—'] + colonnes
+    
+    st.markdown("##### Correspondance des colonnes")
+    correspondance = {}
+    cols = st.columns(len(CHAMPS[collection]))
+    for col, champ in zip(cols, CHAMPS[collection]):
+        with col:
+            colonne = st.selectbox(
+                libelles[champ] + (" *" if champ in CHAMPS_OBLIGATOIRES else ""),
+                choix,
+                index=choix.index(devinee[champ]) if champ in devinee else 0,
+                key=f"champ_{collection}_{champ}"
+            )
+            if colonne != '—':
+                correspondance[champ] = colonne
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        categorie_defaut = st.selectbox("Type par défaut", types, index=len(types) - 1, key=f"type_import_{collection}")
+    with col2:
+        sens = st.selectbox("Lignes à importer", SENS_MONTANTS, format_func=SENS_LIBELLES.get, key=f"sens_{collection}")
+    
+    if st.button("📥 Importer", key=f"importer_{collection}", use_container_width=True):
+        etat = st.empty()
+        try:
+            bilan = importer(
+                fichier, fichier.name, collection, correspondance, enregistrer_mutations,
+                categorie_defaut=categorie_defaut, sens=sens,
+                progression=lambda b: etat.caption(f"⏳ {b['importees']:,} ligne(s) importée(s)...")
+            )
+        except ValueError as erreur:
+            st.error(f"❌ {erreur}", icon="❌")
+            return
+        notifier(f"{bilan['importees']:,} ligne(s) importée(s), {bilan['rejetees']:,} rejetée(s)")
+        st.rerun()
+
+# ==================== EXPORT ====================
+EXPORT_COLLECTIONS = {'revenus': "Revenus", 'depenses': "Dépenses", 'epargne': "Épargne", 'objectifs': "Objectifs d'épargne", 'prets': "Prêts", 'remboursements': "Remboursements"}
+
+def preparer_export(collection, bornes, format_export):
+    """Fichier d'export construit au clic (appelé hors de l'exécution du script)
+
+    Le DataFrame partagé et les bornes sont capturés au rendu : le filtrage
+    est celui de calculer_soldes_periode, les totaux correspondent donc aux
+    cartes du tableau de bord.
+    """
+    registre = get_registre()
+    recurrente = collection in ('revenus', 'depenses')
+    df = moteur.get_historique_df(registre, collection) if recurrente and not bornes else get_df(collection)
+    colonnes = [c for c in COLONNES_DF[collection] if c != 'id']
+    def construire():
+        vue = filtrer_periode(df, *bornes) if bornes else df
+        if bornes and recurrente:
+            # Occurrences des récurrences de la période, générées au clic
+            vue = moteur.ajouter_occurrences(registre, collection, vue, *bornes)
+        return fichier_export(morceaux(vue, colonnes), format_export)
+    return construire
+
+@chronometrer()
+def render_export(periode_type, param1, param2):
+    """Téléchargement des lignes de la période affichée ou de tout l'historique"""
+    with st.expander("📤 Exporter"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            collection = st.selectbox("Données", list(EXPORT_COLLECTIONS), format_func=EXPORT_COLLECTIONS.get, key="export_collection")
+        with col2:
+            etendue = st.selectbox("Étendue", ["Période affichée", "Tout l'historique"], key="export_etendue")
+        with col3:
+            format_export = st.selectbox("Format", list(FORMATS_EXPORT), format_func=str.upper, key="export_format")
+        
+        bornes = None
+        suffixe = "historique"
+        if etendue == "Période affichée":
+            if 'date' in COLONNES_DF[collection]:
+                bornes = bornes_periode(periode_type, param1, param2)
+                suffixe = f"{bornes[0]:%Y-%m-%d}_{bornes[1]:%Y-%m-%d}"
+            else:
+                st.caption(f"{EXPORT_COLLECTIONS[collection]} : pas de date, tout l'historique est exporté")
+        
+        st.download_button(
+            "⬇️ Télécharger",
+            data=preparer_export(collection, bornes, format_export),
+            file_name=nom_export(collection, suffixe, format_export),
+            mime=FORMATS_EXPORT[format_export][0],
+            on_click="ignore",
+            use_container_width=True
+        )
 
 # ==================== PAGES ====================
+MODES_LIBELLES = {
+    'annuite': "Échéances constantes",
+    'capital': "Capital constant (échéances décroissantes)",
+}
+
+@chronometrer()
 def page_dashboard():
     render_mobile_header()
     
@@ -768,11 +1061,9 @@ def page_dashboard():
     
     render_stats_cards(soldes)
     
-    depenses_df = soldes['depenses_df']
-    
-    if not depenses_df.empty:
-        render_circular_chart(depenses_df, soldes['depenses'])
-        render_category_list(depenses_df, soldes['depenses'])
+    if soldes['categories']:
+        render_circular_chart(soldes['categories'], soldes['depenses'])
+        render_category_list(soldes['categories'], soldes['depenses'])
     else:
         st.markdown("""
             <div style="text-align: center; padding: 4rem 2rem; color: #8a8a8a;">
@@ -781,18 +1072,30 @@ def page_dashboard():
             </div>
         """, unsafe_allow_html=True)
     
+    render_export(periode_type, param1, param2)
+    
+    render_prevision_dashboard()
+    
     st.markdown('</div>', unsafe_allow_html=True)
 
+def render_prevision_dashboard():
+    """Bande de trésorerie lue dans le cache : seule la page Prévisions relance la simulation d'office"""
+    prevision, a_jour = lire_prevision()
+    if prevision is None:
+        if not st.button("🔮 Calculer la prévision de trésorerie", key="prevision_dashboard", use_container_width=True):
+            st.caption(f"Trésorerie projetée sur {HORIZON_DEFAUT} mois ({CHEMINS_DEFAUT:,} simulations) — ou voir la page Prévisions")
+            return
+        prevision, a_jour = get_prevision(), True
+    render_prevision_chart(prevision, 'tresorerie', hauteur=260)
+    etat = "" if a_jour else ", avant les dernières saisies"
+    st.caption(f"🔮 Trésorerie projetée sur {HORIZON_DEFAUT} mois ({CHEMINS_DEFAUT:,} simulations{etat}) — détail dans Prévisions")
+
+@chronometrer()
 def page_revenus():
     render_mobile_header()
     st.title("💰 Revenus")
     
-    # Afficher le message de succès s'il existe
-    if 'message_success' in st.session_state and st.session_state.message_success:
-        st.success(st.session_state.message_success, icon="✅")
-        st.session_state.message_success = None
-    
-    tab1, tab2 = st.tabs(["➕ Ajouter", "📋 Historique"])
+    tab1, tab2, tab3, tab4 = st.tabs(["➕ Ajouter", "📋 Historique", "📥 Importer", "🔁 Récurrents"])
     
     with tab1:
         st.markdown('<div class="form-card">', unsafe_allow_html=True)
@@ -816,21 +1119,16 @@ def page_revenus():
             
         if submitted:
             if montant > 0:
-                st.session_state.revenus.append({
+                # Enregistrer le revenu (sauvegarde incluse)
+                ajouter_enregistrement('revenus', {
                     'date': str(date_rev),
                     'type_revenu': type_rev,
                     'client': client,
                     'montant': montant,
                     'description': description
                 })
-                # Sauvegarder les données
-                save_data()
-                # Message de succès
-                st.success(f"✅ Revenu de {montant:,.0f} FCFA enregistré avec succès !", icon="✅")
-                st.balloons()
-                # Attendre 2 secondes pour voir le message
-
-                time.sleep(2)
+                # Message affiché après la redirection
+                notifier(f"Revenu de {montant:,.0f} FCFA enregistré avec succès !", ballons=True)
                 # Rediriger vers dashboard
                 st.session_state.active_page = 'dashboard'
                 st.rerun()
@@ -844,48 +1142,23 @@ def page_revenus():
         if not df.empty:
             st.metric("💵 Total", f"{df['montant'].sum():,.0f} FCFA")
             
-            # Bouton de suppression pour chaque ligne
             st.markdown("### 🗑️ Gérer les revenus")
-            for idx, row in df.iterrows():
-                col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
-                with col1:
-                    st.write(f"📅 {row['date'].strftime('%d/%m/%Y')}")
-                with col2:
-                    st.write(f"**{row['type_revenu']}**")
-                with col3:
-                    st.write(f"👤 {row['client']}")
-                with col4:
-                    st.write(f"💰 {row['montant']:,.0f} FCFA")
-                with col5:
-                    # Trouver l'index dans la liste originale
-                    original_idx = None
-                    for i, rev in enumerate(st.session_state.revenus):
-                        if (rev['date'] == str(row['date'].date()) and 
-                            rev['montant'] == row['montant'] and 
-                            rev['type_revenu'] == row['type_revenu']):
-                            original_idx = i
-                            break
-                    
-                    if original_idx is not None:
-                        if st.button("🗑️", key=f"del_rev_{original_idx}"):
-                            st.session_state.revenus.pop(original_idx)
-                            save_data()
-                            st.success("✅ Revenu supprimé !")
-                            time.sleep(1)
-                            st.rerun()
+            render_historique('revenus', df)
         else:
             st.info("Aucun revenu")
+    
+    with tab3:
+        render_import('revenus', TYPES_REVENUS)
+    
+    with tab4:
+        render_recurrences('revenus', TYPES_REVENUS)
 
+@chronometrer()
 def page_depenses():
     render_mobile_header()
     st.title("💸 Dépenses")
     
-    # Afficher le message de succès s'il existe
-    if 'message_success' in st.session_state and st.session_state.message_success:
-        st.success(st.session_state.message_success, icon="✅")
-        st.session_state.message_success = None
-    
-    tab1, tab2 = st.tabs(["➕ Ajouter", "📋 Historique"])
+    tab1, tab2, tab3, tab4 = st.tabs(["➕ Ajouter", "📋 Historique", "📥 Importer", "🔁 Récurrents"])
     
     with tab1:
         st.markdown('<div class="form-card">', unsafe_allow_html=True)
@@ -909,20 +1182,15 @@ def page_depenses():
             
         if submitted:
             if montant > 0:
-                st.session_state.depenses.append({
+                ajouter_enregistrement('depenses', {
                     'date': str(date_dep),
                     'type_depense': type_dep,
                     'montant': montant,
                     'fournisseur': fournisseur,
                     'description': description
                 })
-                save_data()
-                # Message de succès
-                st.success(f"✅ Dépense de {montant:,.0f} FCFA enregistrée avec succès !", icon="✅")
-                st.balloons()
-                # Attendre 2 secondes
-
-                time.sleep(2)
+                # Message affiché après la redirection
+                notifier(f"Dépense de {montant:,.0f} FCFA enregistrée avec succès !", ballons=True)
                 # Rediriger vers dashboard
                 st.session_state.active_page = 'dashboard'
                 st.rerun()
@@ -936,44 +1204,24 @@ def page_depenses():
         if not df.empty:
             st.metric("💸 Total", f"{df['montant'].sum():,.0f} FCFA")
             
-            # Bouton de suppression pour chaque ligne
             st.markdown("### 🗑️ Gérer les dépenses")
-            for idx, row in df.iterrows():
-                col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
-                with col1:
-                    st.write(f"📅 {row['date'].strftime('%d/%m/%Y')}")
-                with col2:
-                    st.write(f"**{row['type_depense']}**")
-                with col3:
-                    st.write(f"🏪 {row['fournisseur']}")
-                with col4:
-                    st.write(f"💸 {row['montant']:,.0f} FCFA")
-                with col5:
-                    # Trouver l'index dans la liste originale
-                    original_idx = None
-                    for i, dep in enumerate(st.session_state.depenses):
-                        if (dep['date'] == str(row['date'].date()) and 
-                            dep['montant'] == row['montant'] and 
-                            dep['type_depense'] == row['type_depense']):
-                            original_idx = i
-                            break
-                    
-                    if original_idx is not None:
-                        if st.button("🗑️", key=f"del_dep_{original_idx}"):
-                            st.session_state.depenses.pop(original_idx)
-                            save_data()
-                            st.success("✅ Dépense supprimée !")
-            
-                            time.sleep(1)
-                            st.rerun()
+            render_historique('depenses', df)
         else:
             st.info("Aucune dépense")
+    
+    with tab3:
+        render_import('depenses', TYPES_DEPENSES)
+    
+    with tab4:
+        render_recurrences('depenses', TYPES_DEPENSES)
 
+@chronometrer()
 def page_epargne():
     render_mobile_header()
     st.title("💎 Épargne")
     
-    tab1, tab2 = st.tabs(["➕ Ajouter", "📊 Suivi"])
+    tab1, tab2, tab3 = st.tabs(["➕ Ajouter", "📊 Suivi", "🎯 Objectifs"])
+    objectifs = {o['id']: o['nom'] for o in get_registre().donnees['objectifs']}
     
     with tab1:
         st.markdown('<div class="form-card">', unsafe_allow_html=True)
@@ -992,32 +1240,32 @@ def page_epargne():
                     max_value=date(2030, 12, 31),
                     format="DD/MM/YYYY"
                 )
-                montant_depose = st.number_input("Montant à déposer (FCFA)", min_value=0.0, step=1000.0)
+                montant_depose = st.number_input("Montant (FCFA)", min_value=0.0, step=1000.0)
             with col2:
-                objectif = st.text_input("Objectif (ex: Voyage, Maison...)")
+                operation = st.radio("Opération", ["Dépôt", "Retrait"], horizontal=True)
+                objectif_id = st.selectbox(
+                    "Objectif",
+                    [None] + list(objectifs),
+                    format_func=lambda o: "Sans objectif" if o is None else objectifs[o]
+                )
             
-            submitted = st.form_submit_button("💾 Déposer et voir le Dashboard", use_container_width=True)
+            submitted = st.form_submit_button("💾 Enregistrer et voir le Dashboard", use_container_width=True)
             
         if submitted:
-            if montant_depose > 0:
-                # Calculer le nouveau solde
-                nouveau_solde = solde_actuel_display + montant_depose
-                
-                st.session_state.epargne.append({
-                    'date': str(date_ep),
-                    'montant_depose': montant_depose,
-                    'objectif': objectif,
-                    'solde_actuel': nouveau_solde
-                })
-                save_data()
-                st.success(f"✅ Dépôt de {montant_depose:,.0f} FCFA enregistré ! Nouveau solde : {nouveau_solde:,.0f} FCFA", icon="✅")
-                st.balloons()
-
-                time.sleep(2)
+            # Un retrait ne peut dépasser ni le solde à sa date ni le solde actuel, ni le versé de l'objectif
+            disponible = min(get_solde_epargne(date_ep), solde_actuel_display)
+            if objectif_id is not None:
+                disponible = min(disponible, moteur.get_total_objectif(get_registre(), objectif_id))
+            if montant_depose <= 0:
+                st.error("❌ Le montant doit être supérieur à 0", icon="❌")
+            elif operation == "Retrait" and montant_depose > disponible:
+                st.error(f"❌ Solde insuffisant : {disponible:,.0f} FCFA disponibles", icon="❌")
+            else:
+                mouvement = montant_depose if operation == "Dépôt" else -montant_depose
+                nouveau_solde = moteur.deposer_epargne(get_registre(), date_ep, mouvement, objectif_id=objectif_id)
+                notifier(f"{operation} de {montant_depose:,.0f} FCFA enregistré ! Nouveau solde : {nouveau_solde:,.0f} FCFA", ballons=operation == "Dépôt")
                 st.session_state.active_page = 'dashboard'
                 st.rerun()
-            else:
-                st.error("❌ Le montant doit être supérieur à 0", icon="❌")
         
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -1025,45 +1273,87 @@ def page_epargne():
         df = get_epargne_df()
         if not df.empty:
             solde = get_solde_epargne()
-            total_depose = df['montant_depose'].sum()
+            total_depose = df['montant_depose'].clip(lower=0).sum()
             
-            col1, col2 = st.columns(2)
+            col1, col2, col3 = st.columns(3)
             with col1:
                 st.metric("💰 Solde actuel", f"{solde:,.0f} FCFA")
             with col2:
                 st.metric("📊 Total déposé", f"{total_depose:,.0f} FCFA")
+            with col3:
+                jour = st.date_input("Solde au", value=date.today(), format="DD/MM/YYYY", key="solde_epargne_au")
+                st.metric("📅 Solde à cette date", f"{get_solde_epargne(jour):,.0f} FCFA")
             
-            st.markdown("### 📈 Historique des dépôts")
-            for idx, row in df.iterrows():
-                col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
-                with col1:
-                    st.write(f"📅 {row['date'].strftime('%d/%m/%Y')}")
-                with col2:
-                    st.write(f"💰 {row['montant_depose']:,.0f} FCFA")
-                with col3:
-                    st.write(f"🎯 {row['objectif']}")
-                with col4:
-                    st.write(f"💎 Solde: {row['solde_actuel']:,.0f} FCFA")
-                with col5:
-                    # Trouver l'index dans la liste originale
-                    original_idx = None
-                    for i, ep in enumerate(st.session_state.epargne):
-                        if (ep['date'] == str(row['date'].date()) and 
-                            ep['montant_depose'] == row['montant_depose']):
-                            original_idx = i
-                            break
-                    
-                    if original_idx is not None:
-                        if st.button("🗑️", key=f"del_ep_{original_idx}"):
-                            st.session_state.epargne.pop(original_idx)
-                            save_data()
-                            st.success("✅ Dépôt supprimé !")
+            render_objectifs()
             
-                            time.sleep(1)
-                            st.rerun()
+            st.markdown("### 📈 Historique des mouvements")
+            render_historique('epargne', df)
         else:
             st.info("Aucun dépôt d'épargne")
+    
+    with tab3:
+        st.markdown('<div class="form-card">', unsafe_allow_html=True)
+        with st.form("form_objectif"):
+            nom = st.text_input("Nom de l'objectif (ex: Voyage, Maison...)")
+            col1, col2 = st.columns(2)
+            with col1:
+                montant_cible = st.number_input("Montant cible (FCFA)", min_value=0.0, step=10000.0)
+            with col2:
+                date_cible = st.date_input("Date cible", value=date.today() + timedelta(days=365), format="DD/MM/YYYY")
+            
+            submitted_objectif = st.form_submit_button("🎯 Créer l'objectif", use_container_width=True)
+        
+        if submitted_objectif:
+            if not nom.strip():
+                st.error("❌ Donnez un nom à l'objectif", icon="❌")
+            elif montant_cible <= 0:
+                st.error("❌ Le montant cible doit être supérieur à 0", icon="❌")
+            else:
+                moteur.ajouter_objectif(get_registre(), nom.strip(), montant_cible, date_cible)
+                notifier(f"Objectif '{nom.strip()}' créé !", icon="🎯")
+                st.rerun()
+        
+        if objectifs:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                objectif_id = st.selectbox("Objectif à supprimer", list(objectifs), format_func=objectifs.get)
+            with col2:
+                if st.button("🗑️ Supprimer", use_container_width=True):
+                    moteur.supprimer_objectif(get_registre(), objectif_id)
+                    notifier(f"Objectif '{objectifs[objectif_id]}' supprimé (ses mouvements sont conservés)", icon="🗑️")
+                    st.rerun()
+        
+        st.markdown('</div>', unsafe_allow_html=True)
 
+@chronometrer()
+def render_objectifs():
+    """Progression de tous les objectifs d'épargne, en un seul tableau"""
+    suivi = moteur.suivi_objectifs(get_registre(), date.today())
+    if not suivi:
+        st.caption("Aucun objectif : créez-en un dans l'onglet « 🎯 Objectifs »")
+        return
+    st.markdown("### 🎯 Objectifs")
+    tableau = pd.DataFrame(suivi, columns=['nom', 'verse', 'montant_cible', 'progression', 'reste', 'date_cible', 'mensuel_requis'])
+    tableau['date_cible'] = pd.to_datetime(tableau['date_cible'])
+    st.dataframe(
+        tableau,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'nom': st.column_config.TextColumn("Objectif"),
+            'verse': st.column_config.NumberColumn("Versé", format="%.0f"),
+            'montant_cible': st.column_config.NumberColumn("Cible", format="%.0f"),
+            'progression': st.column_config.ProgressColumn("Progression", format="percent", min_value=0.0, max_value=1.0),
+            'reste': st.column_config.NumberColumn("Reste", format="%.0f"),
+            'date_cible': st.column_config.DateColumn("Date cible", format="DD/MM/YYYY"),
+            'mensuel_requis': st.column_config.NumberColumn("Par mois", format="%.0f", help="Versement mensuel requis pour atteindre la cible à la date prévue"),
+        }
+    )
+    sans_objectif = moteur.get_total_objectif(get_registre(), None)
+    if sans_objectif:
+        st.caption(f"Épargne sans objectif : {sans_objectif:,.0f} FCFA")
+
+@chronometrer()
 def page_prets():
     render_mobile_header()
     st.title("💳 Suivi des Prêts")
@@ -1077,42 +1367,36 @@ def page_prets():
             col1, col2 = st.columns(2)
             with col1:
                 montant_total = st.number_input("Montant total (FCFA)", min_value=0.0, step=10000.0)
-                echeance = st.date_input(
-                    "Échéance finale",
+                taux_annuel = st.number_input("Taux d'intérêt annuel (%)", min_value=0.0, max_value=100.0, step=0.5)
+                periodicite = st.selectbox("Périodicité des échéances", list(PERIODICITES), format_func=str.capitalize)
+            with col2:
+                date_debut = st.date_input(
+                    "Date du prêt",
                     value=date.today(),
                     min_value=date(2020, 1, 1),
                     max_value=date(2030, 12, 31),
                     format="DD/MM/YYYY"
                 )
-            with col2:
-                prochaine = st.date_input(
-                    "Prochaine échéance",
+                echeance = st.date_input(
+                    "Échéance finale",
                     value=date.today(),
                     min_value=date(2020, 1, 1),
-                    max_value=date(2030, 12, 31),
+                    max_value=date(2035, 12, 31),
                     format="DD/MM/YYYY"
                 )
+                mode_amortissement = st.selectbox("Remboursement", MODES_AMORTISSEMENT, format_func=MODES_LIBELLES.get)
             
             submitted = st.form_submit_button("💾 Enregistrer et voir le Dashboard", use_container_width=True)
             
         if submitted:
-            if nom_pret and montant_total > 0:
-                st.session_state.prets.append({
-                    'nom_pret': nom_pret,
-                    'montant_total': montant_total,
-                    'montant_rembourse': 0,
-                    'echeance': str(echeance),
-                    'prochaine_echeance': str(prochaine),
-                    'solde_restant': montant_total,
-                    'statut': 'actif'
-                })
-                save_data()
-                st.success(f"✅ Prêt '{nom_pret}' de {montant_total:,.0f} FCFA enregistré avec succès !", icon="✅")
-                st.balloons()
-
-                time.sleep(2)
+            if nom_pret and montant_total > 0 and echeance > date_debut:
+                moteur.ajouter_pret(get_registre(), nom_pret, montant_total, date_debut, echeance,
+                                    taux_annuel, periodicite, mode_amortissement)
+                notifier(f"Prêt '{nom_pret}' de {montant_total:,.0f} FCFA enregistré avec succès !", ballons=True)
                 st.session_state.active_page = 'dashboard'
                 st.rerun()
+            elif nom_pret and montant_total > 0:
+                st.error("❌ L'échéance finale doit suivre la date du prêt", icon="❌")
             else:
                 st.error("❌ Veuillez remplir tous les champs", icon="❌")
         
@@ -1121,120 +1405,334 @@ def page_prets():
     with tab2:
         st.markdown('<div class="form-card">', unsafe_allow_html=True)
         
-        prets_actifs = get_prets_df(statut='actif')
+        prets = get_prets_df()
         
-        if not prets_actifs.empty:
-            # Sélectionner le prêt à rembourser
-            pret_names = prets_actifs['nom_pret'].tolist()
-            pret_selectionne = st.selectbox("Sélectionner le prêt à rembourser", pret_names)
-            
-            # Trouver le prêt sélectionné
-            pret_idx = prets_actifs[prets_actifs['nom_pret'] == pret_selectionne].index[0]
-            pret = st.session_state.prets[pret_idx]
+        if not prets.empty:
+            # Prêts désignés par identifiant (deux prêts peuvent porter le même nom), actifs en premier
+            prets = prets.sort_values('statut', key=lambda statuts: statuts != 'actif', kind='stable')
+            noms = {id_: f"{nom} ✅" if statut == 'soldé' else nom for id_, nom, statut in zip(prets['id'], prets['nom_pret'], prets['statut'])}
+            pret_id = st.selectbox("Sélectionner le prêt", list(noms), format_func=noms.get)
+            pret = get_enregistrement('prets', pret_id)
             
             # Afficher les infos du prêt
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Montant total", f"{pret['montant_total']:,.0f} FCFA")
+                st.metric("Total dû", f"{pret['montant_rembourse'] + pret['solde_restant']:,.0f} FCFA",
+                          help=f"Capital de {pret['montant_total']:,.0f} FCFA, intérêts compris")
             with col2:
                 st.metric("Déjà remboursé", f"{pret['montant_rembourse']:,.0f} FCFA")
             with col3:
                 st.metric("Restant", f"{pret['solde_restant']:,.0f} FCFA")
             
-            # Formulaire de remboursement
-            with st.form("form_remboursement"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    date_remb = st.date_input(
-                        "Date de remboursement",
-                        value=date.today(),
-                        min_value=date(2020, 1, 1),
-                        max_value=date(2030, 12, 31),
-                        format="DD/MM/YYYY"
-                    )
-                with col2:
-                    montant_remb = st.number_input(
-                        f"Montant à rembourser (Max: {pret['solde_restant']:,.0f} FCFA)",
-                        min_value=0.0,
-                        max_value=float(pret['solde_restant']),
-                        step=1000.0
-                    )
-                
-                note = st.text_area("Note (optionnel)")
-                
-                submitted_remb = st.form_submit_button("💰 Rembourser et voir le Dashboard", use_container_width=True)
-                
-            if submitted_remb:
-                if montant_remb > 0:
-                    # Mettre à jour le prêt
-                    st.session_state.prets[pret_idx]['montant_rembourse'] += montant_remb
-                    st.session_state.prets[pret_idx]['solde_restant'] -= montant_remb
+            if pret['statut'] == 'actif':
+                # Formulaire de remboursement
+                with st.form("form_remboursement"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        date_remb = st.date_input(
+                            "Date de remboursement",
+                            value=date.today(),
+                            min_value=date(2020, 1, 1),
+                            max_value=date(2030, 12, 31),
+                            format="DD/MM/YYYY"
+                        )
+                    with col2:
+                        montant_remb = st.number_input(
+                            f"Montant à rembourser (Max: {pret['solde_restant']:,.0f} FCFA)",
+                            min_value=0.0,
+                            max_value=float(pret['solde_restant']),
+                            step=1000.0
+                        )
                     
-                    # Si complètement remboursé, changer le statut
-                    if st.session_state.prets[pret_idx]['solde_restant'] <= 0:
-                        st.session_state.prets[pret_idx]['statut'] = 'soldé'
-                        save_data()
-                        st.success(f"🎉 Prêt '{pret_selectionne}' entièrement remboursé !", icon="🎉")
-                        st.balloons()
-                    else:
-                        save_data()
-                        st.success(f"✅ Remboursement de {montant_remb:,.0f} FCFA enregistré !", icon="✅")
+                    note = st.text_area("Note (optionnel)")
                     
-    
-                    time.sleep(2)
-                    st.session_state.active_page = 'dashboard'
-                    st.rerun()
-                else:
-                    st.error("❌ Le montant doit être supérieur à 0", icon="❌")
+                    submitted_remb = st.form_submit_button("💰 Rembourser et voir le Dashboard", use_container_width=True)
+                    
+                if submitted_remb:
+                    if montant_remb > 0:
+                        pret = moteur.rembourser_pret(get_registre(), pret_id, montant_remb, date_remb, note)
+                        
+                        if pret['statut'] == 'soldé':
+                            notifier(f"Prêt '{pret['nom_pret']}' entièrement remboursé !", icon="🎉", ballons=True)
+                        else:
+                            notifier(f"Remboursement de {montant_remb:,.0f} FCFA enregistré !")
+                        
+                        st.session_state.active_page = 'dashboard'
+                        st.rerun()
+                    else:
+                        st.error("❌ Le montant doit être supérieur à 0", icon="❌")
+            
+            historique = moteur.historique_remboursements(get_registre(), pret_id)
+            if not historique.empty:
+                st.markdown("### 🧾 Historique des remboursements")
+                st.dataframe(
+                    historique[['date', 'montant', 'note']],
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        'date': st.column_config.DateColumn("Date", format="DD/MM/YYYY"),
+                        'montant': st.column_config.NumberColumn("Montant (FCFA)", format="%.0f"),
+                        'note': st.column_config.TextColumn("Note"),
+                    }
+                )
+                libelles = {
+                    id_: f"{jour:%d/%m/%Y} — {montant:,.0f} FCFA"
+                    for id_, jour, montant in zip(historique['id'], historique['date'], historique['montant'])
+                }
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    remboursement_id = st.selectbox("Remboursement saisi par erreur", list(libelles), format_func=libelles.get)
+                with col2:
+                    if st.button("↩️ Annuler", use_container_width=True):
+                        moteur.annuler_remboursement(get_registre(), remboursement_id)
+                        notifier(f"Remboursement du {libelles[remboursement_id]} annulé", icon="↩️")
+                        st.rerun()
         else:
-            st.info("Aucun prêt actif à rembourser")
+            st.info("Aucun prêt à rembourser")
         
         st.markdown('</div>', unsafe_allow_html=True)
     
     with tab3:
-        prets = get_prets_df(statut='actif')
+        prets = moteur.suivi_prets(get_registre(), date.today())
         if not prets.empty:
             st.markdown("### 📋 Liste des prêts actifs")
             
-            for idx, pret in prets.iterrows():
-                prog = (pret['montant_rembourse'] / pret['montant_total']) * 100 if pret['montant_total'] > 0 else 0
-                
-                with st.expander(f"💳 {pret['nom_pret']}", expanded=True):
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Montant total", f"{pret['montant_total']:,.0f} FCFA")
-                    with col2:
-                        st.metric("Remboursé", f"{pret['montant_rembourse']:,.0f} FCFA")
-                    with col3:
-                        st.metric("Restant", f"{pret['solde_restant']:,.0f} FCFA")
-                    
-                    st.progress(prog / 100, text=f"Progression: {prog:.1f}%")
-                    
-                    st.markdown(f"**Échéance finale:** {pret['echeance']}")
-                    st.markdown(f"**Prochaine échéance:** {pret['prochaine_echeance']}")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Restant dû", f"{prets['solde_restant'].sum():,.0f} FCFA")
+            with col2:
+                st.metric("Restant selon échéancier", f"{prets['solde_attendu'].sum():,.0f} FCFA")
+            with col3:
+                st.metric("Retard", f"{prets['ecart'].clip(lower=0).sum():,.0f} FCFA")
+            
+            # Un seul tableau, quel que soit le nombre de prêts
+            st.dataframe(
+                prets[['nom_pret', 'montant_total', 'solde_restant', 'solde_attendu', 'ecart', 'prochaine_date', 'prochain_montant', 'echeance']],
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    'nom_pret': st.column_config.TextColumn("Prêt"),
+                    'montant_total': st.column_config.NumberColumn("Montant total", format="%.0f"),
+                    'solde_restant': st.column_config.NumberColumn("Restant", format="%.0f"),
+                    'solde_attendu': st.column_config.NumberColumn("Restant attendu", format="%.0f"),
+                    'ecart': st.column_config.NumberColumn("Écart", format="%+.0f", help="Positif : en retard sur l'échéancier"),
+                    'prochaine_date': st.column_config.DateColumn("Prochaine échéance", format="DD/MM/YYYY"),
+                    'prochain_montant': st.column_config.NumberColumn("Montant échéance", format="%.0f"),
+                    'echeance': st.column_config.TextColumn("Échéance finale"),
+                }
+            )
+            
+            noms = dict(zip(prets['id'], prets['nom_pret']))
+            pret_id = st.selectbox("📅 Échéancier du prêt", list(noms), format_func=noms.get)
+            pret = prets[prets['id'] == pret_id].iloc[0]
+            # Part du total dû (intérêts compris) déjà remboursée
+            du = pret['montant_rembourse'] + pret['solde_restant']
+            prog = (pret['montant_rembourse'] / du) * 100 if du > 0 else 0
+            st.progress(min(prog, 100) / 100, text=f"Progression: {prog:.1f}%")
+            
+            echeancier = moteur.get_echeancier(get_registre()).tableau(pret_id)
+            st.dataframe(
+                echeancier,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    'rang': st.column_config.NumberColumn("N°"),
+                    'date': st.column_config.DateColumn("Date", format="DD/MM/YYYY"),
+                    'echeance': st.column_config.NumberColumn("Échéance", format="%.0f"),
+                    'interets': st.column_config.NumberColumn("Intérêts", format="%.0f"),
+                    'capital': st.column_config.NumberColumn("Capital", format="%.0f"),
+                    'solde': st.column_config.NumberColumn("Capital restant", format="%.0f"),
+                }
+            )
         else:
             st.info("Aucun prêt actif")
 
+@chronometrer()
+def page_prevision():
+    render_mobile_header()
+    st.title("🔮 Prévisions")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        horizon = st.slider("Horizon (mois)", min_value=3, max_value=36, value=HORIZON_DEFAUT, key="prevision_horizon")
+    with col2:
+        chemins = st.selectbox("Simulations", CHEMINS_CHOIX, format_func=lambda n: f"{n:,}", key="prevision_chemins")
+    
+    prevision = get_prevision(horizon, chemins)
+    st.caption(
+        "Chaque simulation tire, pour chaque mois et chaque catégorie, le total d'un mois passé "
+        f"({HISTORIQUE_MOIS} derniers mois complets) ; les échéances des prêts actifs sont ajoutées telles que prévues."
+    )
+    
+    fin = {serie: prevision.tableau(serie).iloc[-1] for serie in ('tresorerie', 'epargne')}
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Trésorerie médiane à l'horizon", f"{fin['tresorerie']['p50']:,.0f} FCFA")
+    with col2:
+        st.metric("Scénario défavorable (5 %)", f"{fin['tresorerie']['p5']:,.0f} FCFA")
+    with col3:
+        st.metric("Épargne médiane à l'horizon", f"{fin['epargne']['p50']:,.0f} FCFA")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        render_prevision_chart(prevision, 'tresorerie')
+        render_prevision_chart(prevision, 'revenus')
+    with col2:
+        render_prevision_chart(prevision, 'epargne')
+        render_prevision_chart(prevision, 'depenses')
+    
+    serie = st.selectbox("Détail mensuel", list(SERIES_LIBELLES), format_func=SERIES_LIBELLES.get, key="prevision_serie")
+    tableau = prevision.tableau(serie)
+    st.dataframe(
+        tableau,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'mois': st.column_config.DateColumn("Mois", format="MM/YYYY"),
+            'moyenne': st.column_config.NumberColumn("Moyenne", format="%.0f"),
+            **{c: st.column_config.NumberColumn(f"{c[1:]} %", format="%.0f") for c in tableau.columns if c.startswith('p')},
+        }
+    )
+
+# Collections interrogées par la recherche et colonne de montant de chacune
+RECHERCHE_COLLECTIONS = {
+    'revenus': ("💰 Revenus", 'montant'),
+    'depenses': ("💸 Dépenses", 'montant'),
+    'epargne': ("💎 Épargne", 'montant_depose'),
+}
+
+@chronometrer()
+def page_recherche():
+    render_mobile_header()
+    st.title("🔎 Recherche")
+    
+    requete = st.text_input(
+        "Rechercher",
+        placeholder="Fournisseur, client, description ou objectif (débuts de mots, accents facultatifs)",
+        key="recherche_requete"
+    )
+    limiter = st.toggle("Limiter à une période", key="recherche_limiter")
+    bornes = bornes_periode(*render_period_selector()) if limiter else (None, None)
+    if not requete.strip():
+        st.info("Saisissez un ou plusieurs mots : « ora fact » trouve « Facture Orange »")
+        return
+    
+    debut = time.perf_counter()
+    resultats = {c: moteur.rechercher(get_registre(), c, requete, *bornes) for c in RECHERCHE_COLLECTIONS}
+    duree = time.perf_counter() - debut
+    totaux = {c: resultats[c][champ].sum() for c, (_, champ) in RECHERCHE_COLLECTIONS.items()}
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("💰 Revenus", f"{totaux['revenus']:,.0f} FCFA")
+    with col2:
+        st.metric("💸 Dépenses", f"{totaux['depenses']:,.0f} FCFA")
+    with col3:
+        st.metric("💵 Solde", f"{totaux['revenus'] - totaux['depenses']:+,.0f} FCFA")
+    with col4:
+        st.metric("💎 Épargne (mouvements)", f"{totaux['epargne']:+,.0f} FCFA")
+    st.caption(f"{sum(len(df) for df in resultats.values()):,} résultat(s) en {duree * 1000:.0f} ms")
+    
+    onglets = st.tabs([f"{libelle} ({len(resultats[c]):,})" for c, (libelle, _) in RECHERCHE_COLLECTIONS.items()])
+    for onglet, collection in zip(onglets, RECHERCHE_COLLECTIONS):
+        with onglet:
+            if resultats[collection].empty:
+                st.info("Aucun résultat")
+            else:
+                render_historique(collection, resultats[collection], ('recherche', requete, bornes))
+
 # ==================== NAVIGATION ====================
+PAGES = {
+    'dashboard': ("📊 Dashboard", page_dashboard),
+    'revenus': ("💰 Revenus", page_revenus),
+    'depenses': ("💸 Dépenses", page_depenses),
+    'epargne': ("💎 Épargne", page_epargne),
+    'prets': ("💳 Prêts", page_prets),
+    'prevision': ("🔮 Prévisions", page_prevision),
+    'recherche': ("🔎 Recherche", page_recherche),
+}
+
+def notifier(message, icon="✅", ballons=False):
+    """Message affiché en toast au prochain rendu (survit au st.rerun())"""
+    st.session_state.notification = (message, icon, ballons)
+
+def afficher_notification():
+    notification = st.session_state.pop('notification', None)
+    if notification:
+        message, icon, ballons = notification
+        st.toast(message, icon=icon)
+        if ballons:
+            st.balloons()
+    erreur = get_grand_livre().derniere_erreur or getattr(get_stockage(), 'derniere_erreur', None)
+    if erreur is not None:
+        st.error(f"❌ Échec de la sauvegarde : {erreur}", icon="❌")
+
+@chronometrer()
 def render_nav_tabs():
-    tabs = st.tabs(["📊 Dashboard", "💰 Revenus", "💸 Dépenses", "💎 Épargne", "💳 Prêts"])
-    
-    with tabs[0]:
-        page_dashboard()
-    with tabs[1]:
-        page_revenus()
-    with tabs[2]:
-        page_depenses()
-    with tabs[3]:
-        page_epargne()
-    with tabs[4]:
-        page_prets()
+    # Redirection demandée par une page (ex. retour au dashboard après un enregistrement)
+    redirection = st.session_state.pop('active_page', None)
+    if redirection in PAGES:
+        st.session_state.page_courante = redirection
+    st.session_state.setdefault('page_courante', 'dashboard')
+    
+    page = st.radio(
+        "Navigation",
+        list(PAGES),
+        format_func=lambda p: PAGES[p][0],
+        horizontal=True,
+        key='page_courante',
+        label_visibility="collapsed"
+    )
+    
+    afficher_notification()
+    
+    # Seule la page affichée est exécutée
+    PAGES[page][1]()
+
+# ==================== DIAGNOSTIC ====================
+def diagnostic_actif():
+    """Chronométrage demandé pour tout le processus ou pour cette session (?diagnostic=1)"""
+    return DIAGNOSTIC_ACTIF or st.query_params.get('diagnostic') == '1'
+
+def render_diagnostic():
+    """Durées des étapes, agrégées sur les dernières exécutions de toutes les sessions"""
+    with st.expander("🩺 Diagnostic des performances"):
+        statistiques = CHRONOMETRE.statistiques()
+        if not statistiques:
+            st.caption("Aucune mesure pour l'instant")
+            return
+        tableau = pd.DataFrame.from_dict(statistiques, orient='index')
+        tableau.index.name = 'Étape'
+        st.dataframe(tableau.round(1), use_container_width=True)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button(
+                "📥 JSON",
+                data=CHRONOMETRE.vers_json,
+                file_name=f"diagnostic_{datetime.now():%Y%m%d_%H%M%S}.json",
+                mime='application/json',
+                on_click="ignore",
+                use_container_width=True
+            )
+        with col2:
+            if st.button("📝 Journaliser", use_container_width=True):
+                CHRONOMETRE.journaliser()
+                st.toast("Statistiques écrites dans le journal du serveur", icon="📝")
+        with col3:
+            if st.button("🗑️ Réinitialiser", use_container_width=True):
+                CHRONOMETRE.vider()
+                st.rerun()
 
 # ==================== MAIN ====================
 def main():
-    init_session_data()
-    load_mobile_dark_css()
-    render_nav_tabs()
+    actif = diagnostic_actif()
+    CHRONOMETRE.activer(actif)
+    with etape('main'):
+        init_session_data()
+        load_mobile_dark_css()
+        render_nav_tabs()
+    if actif:
+        render_diagnostic()
 
 if __name__ == "__main__":
     main()
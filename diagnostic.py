@@ -0,0 +1,149 @@
+"""Chronométrage des étapes d'exécution de Finance Pro, agrégé d'une exécution à l'autre"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+# ==================== CONFIGURATION ====================
+# Active le chronométrage pour toutes les sessions (sinon : ?diagnostic=1 dans l'URL)
+DIAGNOSTIC_ACTIF = os.environ.get('FINANCE_DIAGNOSTIC', '0') != '0'
+# Nombre de durées conservées par étape (les plus récentes)
+HISTORIQUE_DUREES = 500
+PERCENTILES = (50, 90, 99)
+# Séparateur des étapes imbriquées dans le chemin affiché
+SEPARATEUR = ' › '
+
+# ==================== ÉTAPES ====================
+class _EtapeInactive:
+    """Contexte sans effet, partagé : seul coût quand le chronométrage est désactivé"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+ETAPE_INACTIVE = _EtapeInactive()
+
+class _Etape:
+    __slots__ = ('chronometre', 'nom', 'chemin', 'debut')
+
+    def __init__(self, chronometre, nom):
+        self.chronometre = chronometre
+        self.nom = nom
+
+    def __enter__(self):
+        pile = self.chronometre._local.pile
+        pile.append(self.nom)
+        self.chemin = SEPARATEUR.join(pile)
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # Enregistrée aussi si l'étape est interrompue (st.rerun(), st.stop(), erreur)
+        duree = time.perf_counter() - self.debut
+        self.chronometre._local.pile.pop()
+        self.chronometre.enregistrer(self.chemin, duree)
+        return False
+
+# ==================== CHRONOMÈTRE ====================
+class _Contexte(threading.local):
+    # Valeur de classe : lue sans exception dans les threads jamais activés
+    actif = False
+
+    def __init__(self):
+        self.pile = []
+
+class Chronometre:
+    """Durées des étapes, conservées par chemin (« main › render_nav_tabs › page_dashboard »)
+
+    Le chronométrage s'active par thread : Streamlit exécute chaque passage
+    du script dans son propre thread, activer() en tête de main() ne vaut
+    donc que pour la session concernée. Les durées de toutes les sessions
+    sont agrégées ensemble.
+    """
+
+    def __init__(self, historique=HISTORIQUE_DUREES):
+        self.historique = historique
+        self._durees = {}
+        self._verrou = threading.Lock()
+        self._local = _Contexte()
+
+    def activer(self, actif=True):
+        """(Dés)activer le chronométrage pour le thread courant"""
+        self._local.actif = actif
+        self._local.pile.clear()
+
+    def etape(self, nom):
+        """Contexte chronométrant le bloc sous le nom `nom`"""
+        if not self._local.actif:
+            return ETAPE_INACTIVE
+        return _Etape(self, nom)
+
+    def chronometrer(self, nom=None):
+        """Décorateur chronométrant chaque appel de la fonction"""
+        def decorer(fonction):
+            libelle = nom or fonction.__name__
+            local = self._local
+
+            @functools.wraps(fonction)
+            def enveloppe(*args, **kwargs):
+                if not local.actif:
+                    return fonction(*args, **kwargs)
+                with _Etape(self, libelle):
+                    return fonction(*args, **kwargs)
+            return enveloppe
+        return decorer
+
+    def enregistrer(self, chemin, duree):
+        with self._verrou:
+            durees = self._durees.get(chemin)
+            if durees is None:
+                durees = self._durees[chemin] = deque(maxlen=self.historique)
+            durees.append(duree)
+
+    def vider(self):
+        with self._verrou:
+            self._durees.clear()
+
+    def statistiques(self):
+        """Par étape : nombre de mesures, moyenne, percentiles et maximum (millisecondes)"""
+        with self._verrou:
+            copies = {chemin: np.array(durees) * 1000 for chemin, durees in self._durees.items()}
+        statistiques = {}
+        for chemin in sorted(copies):
+            durees = copies[chemin]
+            valeurs = np.percentile(durees, PERCENTILES)
+            statistiques[chemin] = {
+                'mesures': len(durees),
+                'moyenne_ms': float(durees.mean()),
+                **{f'p{p}_ms': float(v) for p, v in zip(PERCENTILES, valeurs)},
+                'max_ms': float(durees.max()),
+                'derniere_ms': float(durees[-1]),
+            }
+        return statistiques
+
+    def vers_json(self):
+        """Statistiques sérialisées, avec la date du relevé"""
+        return json.dumps({
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'etapes': self.statistiques(),
+        }, ensure_ascii=False, indent=2)
+
+    def journaliser(self, niveau=logging.INFO):
+        """Une ligne de journal par étape"""
+        journal = logging.getLogger(__name__)
+        for chemin, stats in self.statistiques().items():
+            journal.log(niveau, "%s : n=%d p50=%.1f ms p90=%.1f ms p99=%.1f ms max=%.1f ms",
+                        chemin, stats['mesures'], stats['p50_ms'], stats['p90_ms'], stats['p99_ms'], stats['max_ms'])
+
+# Chronomètre du processus, partagé par toutes les sessions
+CHRONOMETRE = Chronometre()
+etape = CHRONOMETRE.etape
+chronometrer = CHRONOMETRE.chronometrer
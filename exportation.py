@@ -0,0 +1,92 @@
+"""Export des données Finance Pro en CSV, Excel et Parquet, écrit par morceaux"""
+import io
+import tempfile
+
+import pandas as pd
+
+# ==================== CONFIGURATION ====================
+# Nombre de lignes converties et écrites à la fois
+TAILLE_MORCEAU = 10000
+# Au-delà, le fichier produit est déversé sur disque plutôt que gardé en mémoire
+TAILLE_MEMOIRE_MAX = 8 * 1024 * 1024
+
+FORMATS_EXPORT = {
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# ==================== MORCEAUX ====================
+def morceaux(df, colonnes, taille=TAILLE_MORCEAU):
+    """Tranches successives des colonnes exportées, sans copier le DataFrame entier"""
+    colonnes = [c for c in colonnes if c in df.columns]
+    for debut in range(0, len(df), taille):
+        yield df.iloc[debut:debut + taille][colonnes]
+    if len(df) == 0:
+        yield df[colonnes]
+
+# ==================== ÉCRIVAINS ====================
+def _ecrire_csv(tranches, sortie):
+    # utf-8-sig : les accents s'affichent correctement à l'ouverture dans Excel
+    texte = io.TextIOWrapper(sortie, encoding='utf-8-sig', newline='')
+    for i, tranche in enumerate(tranches):
+        tranche.to_csv(texte, header=(i == 0), index=False, date_format='%Y-%m-%d')
+    texte.flush()
+    texte.detach()
+
+def _ecrire_xlsx(tranches, sortie):
+    from openpyxl import Workbook
+    # Mode écriture seule : les lignes partent dans le fichier au fil de l'eau
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet()
+    for i, tranche in enumerate(tranches):
+        if i == 0:
+            feuille.append(list(tranche.columns))
+        colonnes_date = [j for j, c in enumerate(tranche.columns) if pd.api.types.is_datetime64_any_dtype(tranche[c])]
+        for ligne in tranche.astype(object).where(tranche.notna(), None).itertuples(index=False, name=None):
+            if colonnes_date:
+                ligne = list(ligne)
+                for j in colonnes_date:
+                    if ligne[j] is not None:
+                        ligne[j] = ligne[j].date()
+            feuille.append(ligne)
+    classeur.save(sortie)
+
+def _ecrire_parquet(tranches, sortie):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    ecrivain = None
+    try:
+        for tranche in tranches:
+            # Catégories en texte : le schéma ne dépend pas du morceau
+            tranche = tranche.astype({c: str for c in tranche.columns if isinstance(tranche[c].dtype, pd.CategoricalDtype)})
+            if ecrivain is None:
+                table = pa.Table.from_pandas(tranche, preserve_index=False)
+                ecrivain = pq.ParquetWriter(sortie, table.schema)
+            else:
+                table = pa.Table.from_pandas(tranche, schema=ecrivain.schema, preserve_index=False)
+            # Un groupe de lignes par morceau
+            ecrivain.write_table(table)
+    finally:
+        if ecrivain is not None:
+            ecrivain.close()
+
+ECRIVAINS = {'csv': _ecrire_csv, 'xlsx': _ecrire_xlsx, 'parquet': _ecrire_parquet}
+
+# ==================== EXPORT ====================
+def exporter(tranches, format_export, sortie):
+    """Écrire les tranches d'un DataFrame dans le fichier binaire `sortie`"""
+    if format_export not in ECRIVAINS:
+        raise ValueError(f"Format d'export inconnu : {format_export} (choix : {', '.join(ECRIVAINS)})")
+    ECRIVAINS[format_export](tranches, sortie)
+
+def fichier_export(tranches, format_export):
+    """Fichier temporaire (en mémoire, puis sur disque s'il grossit) rembobiné, prêt à lire"""
+    sortie = tempfile.SpooledTemporaryFile(max_size=TAILLE_MEMOIRE_MAX)
+    exporter(tranches, format_export, sortie)
+    sortie.seek(0)
+    return sortie
+
+def nom_export(collection, etendue, format_export):
+    """Nom de fichier proposé, ex. depenses_2026-10-01_2026-10-31.xlsx"""
+    return f"{collection}_{etendue}.{FORMATS_EXPORT[format_export][1]}"
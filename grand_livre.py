@@ -0,0 +1,237 @@
+"""Grand livre partagé par toutes les sessions du processus Finance Pro"""
+import logging
+import queue
+import threading
+from collections import deque
+
+from stockage import COLLECTIONS, annuler_mutations, appliquer_mutation, attribuer_ids, indexer_positions
+
+# Nombre de demandes dont les changements sont conservés par collection pour rattraper les index
+HISTORIQUE_CHANGEMENTS = 64
+
+class EnregistrementIntrouvable(KeyError):
+    """Modification d'un enregistrement supprimé entre-temps par une autre session"""
+
+# ==================== INSTANTANÉ ====================
+class Instantane:
+    """État figé des données à une version donnée
+
+    Les listes et tables de positions d'un instantané ne sont jamais
+    modifiées : le rédacteur travaille sur des copies des seules collections
+    touchées puis publie un nouvel instantané. Une session peut donc lire
+    le sien sans verrou pendant toute une exécution du script.
+    """
+
+    def __init__(self, donnees, positions, versions, version):
+        self.donnees = donnees
+        self.positions = positions
+        self.versions = versions
+        self.version = version
+
+    def __getitem__(self, collection):
+        return self.donnees[collection]
+
+    def enregistrement(self, collection, id_):
+        positions = self.positions[collection]
+        if id_ not in positions:
+            raise EnregistrementIntrouvable(id_)
+        return self.donnees[collection][positions[id_]]
+
+# ==================== GRAND LIVRE ====================
+class GrandLivre:
+    """Données en mémoire partagées, modifiées par un unique thread rédacteur
+
+    soumettre() place des mutations en file et attend qu'elles soient
+    appliquées : les mutations de toutes les sessions sont ainsi sérialisées
+    et aucune n'écrase celle d'une autre. Une demande est appliquée en
+    entier ou rejetée en entier. Les mutations arrivées ensemble
+    sont appliquées en un lot (une copie par collection touchée) puis
+    transmises au stockage.
+
+    Une mutation {'op': 'calcul', 'fonction': f} est évaluée par le
+    rédacteur : f reçoit l'état courant (un Instantane, lecture seule) et
+    renvoie les mutations à appliquer. Les champs déduits d'un
+    enregistrement (solde d'un prêt...) partent ainsi de sa dernière
+    version, jamais de celle, peut-être périmée, lue par une session.
+
+    `caches` accueille les structures dérivées partagées entre sessions
+    (DataFrames, index), protégées par `verrou_caches`.
+    """
+
+    def __init__(self, stockage):
+        self.stockage = stockage
+        self.derniere_erreur = None
+        donnees = stockage.charger()
+        # Les enregistrements antérieurs aux identifiants en reçoivent un, sauvegardé aussitôt
+        if attribuer_ids(donnees):
+            stockage.sauvegarder(donnees)
+        self._instantane = Instantane(
+            donnees,
+            {col: indexer_positions(donnees[col]) for col in COLLECTIONS},
+            {col: 1 for col in COLLECTIONS},
+            1
+        )
+        self._changements = {col: deque(maxlen=HISTORIQUE_CHANGEMENTS) for col in COLLECTIONS}
+        self.caches = {}
+        self.verrou_caches = threading.Lock()
+        self._file = queue.Queue()
+        self._thread = threading.Thread(target=self._rediger_en_continu, name='grand-livre', daemon=True)
+        self._thread.start()
+
+    def instantane(self):
+        """Dernier instantané publié"""
+        return self._instantane
+
+    def soumettre(self, mutations):
+        """Appliquer des mutations via le rédacteur ; renvoie l'instantané qui les contient"""
+        demande = {'mutations': mutations, 'fait': threading.Event()}
+        self._file.put(demande)
+        demande['fait'].wait()
+        if 'erreur' in demande:
+            raise demande['erreur']
+        return demande['instantane']
+
+    def sauvegarder(self):
+        """Réécrire tout le stockage à partir du dernier instantané"""
+        self.stockage.sauvegarder(self._instantane.donnees)
+
+    def changements(self, collection, depuis, jusqua):
+        """Couples (ancien, nouveau) appliqués à `collection` entre deux versions
+
+        None si l'historique conservé ne couvre plus tout l'intervalle.
+        """
+        suite = []
+        version = depuis
+        for avant, apres, lot in list(self._changements[collection]):
+            if apres <= depuis:
+                continue
+            if avant != version or apres > jusqua:
+                return None
+            suite.extend(lot)
+            version = apres
+        return suite if version == jusqua else None
+
+    # ---------- Rédacteur ----------
+    def _rediger_en_continu(self):
+        while True:
+            demandes = [self._file.get()]
+            while True:
+                try:
+                    demandes.append(self._file.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                appliquees = self._rediger(demandes)
+            except Exception as erreur:
+                logging.getLogger(__name__).exception("Échec de l'application d'un lot de mutations")
+                for demande in demandes:
+                    demande.setdefault('erreur', erreur)
+                appliquees = []
+            if appliquees:
+                # Persisté avant de rendre la main (simple mise en file si le stockage est différé)
+                try:
+                    self.stockage.enregistrer_lot(appliquees, self._instantane.donnees)
+                    self.derniere_erreur = None
+                except Exception as erreur:
+                    self.derniere_erreur = erreur
+                    logging.getLogger(__name__).exception("Échec de l'écriture de %d mutation(s)", len(appliquees))
+            for demande in demandes:
+                demande['fait'].set()
+
+    def _rediger(self, demandes):
+        courant = self._instantane
+        donnees = dict(courant.donnees)
+        positions = dict(courant.positions)
+        versions = dict(courant.versions)
+        version = courant.version
+        copiees = set()
+        appliquees = []
+        changements = []
+        for demande in demandes:
+            nb_appliquees = len(appliquees)
+            annulation = []
+            lots = {}
+            try:
+                mutations = self._resoudre(Instantane(donnees, positions, versions, version), demande['mutations'])
+                self._verifier(positions, mutations)
+                for mutation in mutations:
+                    col = mutation['col']
+                    if col not in copiees:
+                        # Copie à l'écriture : l'instantané publié reste intact
+                        donnees[col] = list(donnees[col])
+                        positions[col] = dict(positions[col])
+                        copiees.add(col)
+                    lot = self._preparer(donnees, positions, mutation)
+                    appliquer_mutation(donnees, mutation, positions[col], annulation)
+                    lots.setdefault(col, []).extend(lot)
+                    appliquees.append(mutation)
+            except Exception as erreur:
+                # Demande rejetée en entier, sans toucher aux autres demandes du lot
+                annuler_mutations(donnees, positions, annulation)
+                del appliquees[nb_appliquees:]
+                if not isinstance(erreur, EnregistrementIntrouvable):
+                    logging.getLogger(__name__).exception("Demande de mutations rejetée")
+                demande['erreur'] = erreur
+                continue
+            # Une version et une entrée d'historique par collection et par demande,
+            # quel que soit le nombre de mutations (import de milliers de lignes)
+            for col, lot in lots.items():
+                version += 1
+                changements.append((col, (versions[col], version, lot)))
+                versions[col] = version
+        self._instantane = Instantane(donnees, positions, versions, version)
+        for col, entree in changements:
+            self._changements[col].append(entree)
+        for demande in demandes:
+            demande['instantane'] = self._instantane
+        return appliquees
+
+    @staticmethod
+    def _resoudre(etat, mutations):
+        """Mutations de la demande, chaque mutation 'calcul' remplacée par celles que sa fonction déduit de `etat`
+
+        Seules ces mutations ordinaires sont appliquées et transmises au stockage.
+        """
+        resolues = []
+        for mutation in mutations:
+            if mutation['op'] == 'calcul':
+                resolues.extend(mutation['fonction'](etat))
+            else:
+                resolues.append(mutation)
+        return resolues
+
+    @staticmethod
+    def _verifier(positions, mutations):
+        """Lever EnregistrementIntrouvable si une modification de la demande vise un enregistrement absent
+
+        Les ajouts et suppressions qui la précèdent dans la demande sont pris
+        en compte : la vérification est faite avant d'appliquer la première.
+        """
+        ajoutes, supprimes = set(), set()
+        for mutation in mutations:
+            col = mutation['col']
+            if mutation['op'] == 'ajout':
+                cle = (col, mutation['rec'].get('id'))
+                ajoutes.add(cle)
+                supprimes.discard(cle)
+            elif mutation['op'] == 'suppression':
+                for id_ in mutation['ids']:
+                    ajoutes.discard((col, id_))
+                    supprimes.add((col, id_))
+            elif mutation['op'] == 'modification':
+                id_ = mutation['rec']['id']
+                if (col, id_) not in ajoutes and (id_ not in positions[col] or (col, id_) in supprimes):
+                    raise EnregistrementIntrouvable(id_)
+
+    @staticmethod
+    def _preparer(donnees, positions, mutation):
+        """Couples (ancien, nouveau) d'une mutation, transmis aux index"""
+        col = mutation['col']
+        if mutation['op'] == 'ajout':
+            return [(None, mutation['rec'])]
+        if mutation['op'] == 'suppression':
+            return [(donnees[col][positions[col][id_]], None) for id_ in mutation['ids'] if id_ in positions[col]]
+        return [(donnees[col][positions[col][mutation['rec']['id']]], mutation['rec'])]
+
+    def fermer(self):
+        self.stockage.fermer()
@@ -0,0 +1,206 @@
+"""Import en masse de relevés bancaires et mobile money (CSV, Excel)"""
+import csv
+import io
+import re
+import unicodedata
+
+import pandas as pd
+
+from stockage import COLONNE_CATEGORIE, COLONNES_TYPEES, nouveaux_ids
+
+# ==================== CONFIGURATION ====================
+# Nombre de lignes lues, validées et enregistrées à la fois
+TAILLE_LOT = 5000
+
+# Champs de chaque collection importable et noms de colonnes reconnus d'office
+CHAMPS = {col: colonnes[1:] for col, colonnes in COLONNES_TYPEES.items()}
+CHAMPS_OBLIGATOIRES = ('date', 'montant')
+SYNONYMES = {
+    'date': ('date', 'date operation', 'date de l operation', 'date valeur', 'date transaction', 'jour'),
+    'montant': ('montant', 'montant fcfa', 'amount', 'somme', 'valeur', 'debit', 'credit'),
+    'type_depense': ('type depense', 'type', 'categorie', 'category'),
+    'type_revenu': ('type revenu', 'type', 'categorie', 'category'),
+    'fournisseur': ('fournisseur', 'beneficiaire', 'destinataire', 'marchand', 'payee'),
+    'client': ('client', 'emetteur', 'expediteur', 'payeur'),
+    'description': ('description', 'libelle', 'libelle operation', 'motif', 'reference', 'details'),
+}
+
+# Formats essayés dans l'ordre, chacun sur les seules dates encore non reconnues
+FORMATS_DATE = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%y')
+
+# Sens des montants conservés : valeur absolue de tout, débits (négatifs) ou crédits (positifs)
+SENS_MONTANTS = ('tous', 'debits', 'credits')
+
+# ==================== LECTURE PAR LOTS ====================
+def normaliser_nom(nom):
+    """Nom de colonne sans accents, casse ni ponctuation"""
+    nom = unicodedata.normalize('NFKD', str(nom)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', ' ', nom.lower()).strip()
+
+def _est_excel(nom):
+    return nom.lower().endswith(('.xlsx', '.xlsm'))
+
+def _parametres_csv(fichier):
+    """Encodage et séparateur déduits du début du fichier (position remise à zéro)"""
+    echantillon = fichier.read(16384)
+    fichier.seek(0)
+    try:
+        texte = echantillon.decode('utf-8-sig')
+        encodage = 'utf-8-sig'
+    except UnicodeDecodeError:
+        # Exports bancaires Windows
+        texte = echantillon.decode('cp1252', errors='replace')
+        encodage = 'cp1252'
+    try:
+        separateur = csv.Sniffer().sniff(texte, delimiters=',;\t|').delimiter
+    except csv.Error:
+        separateur = ','
+    return encodage, separateur
+
+def lire_par_lots(fichier, nom, taille=TAILLE_LOT):
+    """Lots successifs (DataFrames de texte brut) d'un fichier CSV ou Excel
+
+    `fichier` est un fichier binaire ouvert (ou un fichier téléversé) ; il
+    n'est jamais chargé en entier dans un DataFrame.
+    """
+    if _est_excel(nom):
+        from openpyxl import load_workbook
+        classeur = load_workbook(fichier, read_only=True, data_only=True)
+        try:
+            lignes = classeur.active.iter_rows(values_only=True)
+            entetes = [str(c) if c is not None else f'colonne_{i + 1}' for i, c in enumerate(next(lignes, ()))]
+            lot = []
+            for ligne in lignes:
+                if any(v is not None for v in ligne):
+                    lot.append(ligne[:len(entetes)])
+                if len(lot) >= taille:
+                    yield pd.DataFrame(lot, columns=entetes, dtype=object)
+                    lot = []
+            if lot:
+                yield pd.DataFrame(lot, columns=entetes, dtype=object)
+        finally:
+            classeur.close()
+        return
+    encodage, separateur = _parametres_csv(fichier)
+    texte = io.TextIOWrapper(fichier, encoding=encodage, newline='')
+    try:
+        yield from pd.read_csv(texte, sep=separateur, dtype=str, keep_default_na=False,
+                               skipinitialspace=True, chunksize=taille)
+    finally:
+        # Le fichier appartient à l'appelant : ne pas le fermer avec l'enveloppe
+        texte.detach()
+
+def colonnes_source(fichier, nom):
+    """En-têtes du fichier, pour proposer la correspondance des colonnes"""
+    lots = lire_par_lots(fichier, nom, taille=1)
+    lot = next(lots, None)
+    lots.close()
+    fichier.seek(0)
+    return [] if lot is None else list(lot.columns)
+
+def deviner_correspondance(colonnes, collection):
+    """Correspondance {champ: colonne du fichier} déduite des noms de colonnes"""
+    normalisees = {normaliser_nom(c): c for c in colonnes}
+    correspondance = {}
+    for champ in CHAMPS[collection]:
+        for synonyme in SYNONYMES.get(champ, (champ,)):
+            colonne = normalisees.get(synonyme)
+            if colonne is not None and colonne not in correspondance.values():
+                correspondance[champ] = colonne
+                break
+    return correspondance
+
+# ==================== VALIDATION ====================
+def convertir_dates(serie):
+    """Dates reconnues (Timestamp), NaT pour les valeurs illisibles"""
+    brutes = serie.where(serie.notna(), '')
+    dates = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    # Dates déjà typées (cellules Excel) ; les colonnes lues en CSV sont du texte
+    if brutes.dtype == object:
+        typees = brutes.map(lambda v: hasattr(v, 'year')).astype(bool)
+    else:
+        typees = pd.Series(False, index=brutes.index)
+    if typees.any():
+        dates[typees] = pd.to_datetime(brutes[typees], errors='coerce')
+    texte = brutes[~typees].astype(str).str.strip()
+    for fmt in FORMATS_DATE:
+        restantes = texte[dates[texte.index].isna() & texte.ne('')]
+        if restantes.empty:
+            break
+        dates[restantes.index] = pd.to_datetime(restantes, format=fmt, errors='coerce')
+    return dates
+
+def convertir_montants(serie):
+    """Montants numériques (1 234,50 / 1.234,50 / 1,234.50 / 25.000 / -500 FCFA), NaN si illisibles"""
+    # Cellules Excel déjà numériques : reprises telles quelles, sans lecture des séparateurs
+    nombres = serie.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).astype(bool)
+    texte = serie.astype(str).str.replace('[\\s\u00a0\u202f]|FCFA|XOF|CFA|F$', '', regex=True)
+    # Le séparateur qui précède l'autre est celui des milliers
+    texte = texte.where(~texte.str.contains(r'\..*,', regex=True), texte.str.replace('.', '', regex=False))
+    texte = texte.where(~texte.str.contains(r',.*\.', regex=True), texte.str.replace(',', '', regex=False))
+    # Points seuls suivis de groupes de trois chiffres : milliers (25.000, 1.500.000), jamais une décimale
+    milliers = texte.str.fullmatch(r'[-+]?\d{1,3}(\.\d{3})+')
+    texte = texte.where(~milliers, texte.str.replace('.', '', regex=False))
+    # Plusieurs virgules : milliers aussi (1,500,000) ; une seule reste une virgule décimale
+    milliers = texte.str.fullmatch(r'[-+]?\d{1,3}(,\d{3}){2,}')
+    texte = texte.where(~milliers, texte.str.replace(',', '', regex=False))
+    montants = pd.to_numeric(texte.str.replace(',', '.', regex=False), errors='coerce')
+    return montants.where(~nombres, pd.to_numeric(serie.where(nombres), errors='coerce'))
+
+def valider_lot(lot, collection, correspondance, categorie_defaut='Autre', sens='tous'):
+    """Enregistrements valides d'un lot et nombre de lignes rejetées
+
+    Les lignes sans date lisible ou sans montant non nul sont rejetées ;
+    les montants conservés sont positifs.
+    """
+    categorie = COLONNE_CATEGORIE[collection]
+    df = pd.DataFrame(index=lot.index)
+    for champ in CHAMPS[collection]:
+        colonne = correspondance.get(champ)
+        if colonne in lot.columns:
+            df[champ] = lot[colonne]
+        else:
+            df[champ] = ''
+    dates = convertir_dates(df['date'])
+    montants = convertir_montants(df['montant'])
+    if sens == 'debits':
+        montants = -montants.where(montants < 0)
+    elif sens == 'credits':
+        montants = montants.where(montants > 0)
+    else:
+        montants = montants.abs()
+    valides = dates.notna() & montants.gt(0)
+    df = df[valides].copy()
+    df['date'] = dates[valides].dt.strftime('%Y-%m-%d')
+    df['montant'] = montants[valides].astype(float)
+    for champ in CHAMPS[collection]:
+        if champ not in ('date', 'montant'):
+            df[champ] = df[champ].fillna('').astype(str).str.strip()
+    df[categorie] = df[categorie].mask(df[categorie].eq(''), categorie_defaut)
+    # Enregistrements construits colonne par colonne (to_dict('records') est lent sur le texte)
+    colonnes = ('id',) + CHAMPS[collection]
+    valeurs = [nouveaux_ids(len(df))] + [df[champ].tolist() for champ in CHAMPS[collection]]
+    return [dict(zip(colonnes, ligne)) for ligne in zip(*valeurs)], int((~valides).sum())
+
+# ==================== IMPORT ====================
+def importer(fichier, nom, collection, correspondance, enregistrer, categorie_defaut='Autre',
+             sens='tous', taille=TAILLE_LOT, progression=None):
+    """Importer un fichier lot par lot ; renvoie {'importees', 'rejetees', 'lots'}
+
+    `enregistrer(mutations)` reçoit les ajouts d'un lot en une fois (une
+    écriture par lot). `progression(bilan)` est appelé après chaque lot.
+    """
+    manquants = [champ for champ in CHAMPS_OBLIGATOIRES if not correspondance.get(champ)]
+    if manquants:
+        raise ValueError(f"Colonnes obligatoires non associées : {', '.join(manquants)}")
+    bilan = {'importees': 0, 'rejetees': 0, 'lots': 0}
+    for lot in lire_par_lots(fichier, nom, taille):
+        enregistrements, rejetees = valider_lot(lot, collection, correspondance, categorie_defaut, sens)
+        if enregistrements:
+            enregistrer([{'op': 'ajout', 'col': collection, 'rec': rec} for rec in enregistrements])
+        bilan['importees'] += len(enregistrements)
+        bilan['rejetees'] += rejetees
+        bilan['lots'] += 1
+        if progression is not None:
+            progression(bilan)
+    return bilan
@@ -0,0 +1,1035 @@
+"""Moteur comptable de Finance Pro : requêtes et mutations utilisables sans Streamlit
+
+    from moteur import ouvrir_registre, calculer_soldes_periode
+    registre = ouvrir_registre('sqlite')
+    soldes = calculer_soldes_periode(registre, 'mois', 6, 2026)
+
+Toutes les fonctions reçoivent explicitement le registre sur lequel elles
+portent ; depense.py n'en est qu'une interface.
+"""
+import bisect
+import calendar
+import copy
+from collections import OrderedDict
+from datetime import date
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from amortissement import calculer_echeanciers
+from prevision import CHEMINS_DEFAUT, HORIZON_DEFAUT, debut_historique, echeances_mensuelles, matrice_mensuelle, simuler
+from recherche import CHAMPS_RECHERCHE, IndexTexte, correspond, mots
+from recurrences import lire_identifiant, materialiser
+from diagnostic import chronometrer
+from grand_livre import GrandLivre
+from stockage import DOSSIER_DONNEES, nouvel_id, ouvrir_stockage
+
+# ==================== CATÉGORIES ====================
+CATEGORIES_INFO = {
+    "Virements": {"icon": "💸", "color": "#66ffcc"},
+    "Transport": {"icon": "🚗", "color": "#6699ff"},
+    "Nourriture": {"icon": "🍔", "color": "#ffcc66"},
+    "Factures": {"icon": "📄", "color": "#ff9966"},
+    "Shopping": {"icon": "🛍️", "color": "#ff66cc"},
+    "Santé": {"icon": "⚕️", "color": "#cc66ff"},
+    "Loisirs": {"icon": "🎮", "color": "#66ff99"},
+    "Restaurant": {"icon": "🍽️", "color": "#ff6699"},
+    "Salaires": {"icon": "💼", "color": "#6699ff"},
+    "Marketing": {"icon": "📢", "color": "#ff9966"},
+}
+CATEGORIE_DEFAUT = {"icon": "📦", "color": "#8a8a8a"}
+
+TYPES_REVENUS = ["Vente", "Service", "Consultation", "Abonnement", "Commission", "Salaire", "Encaissement de devis", "Maintenance", "Dons", "Autre"]
+TYPES_DEPENSES = list(CATEGORIES_INFO.keys()) + ["Loyer", "Équipement", "Maintenance", "Dîme", "Offrande", "Promesse", "Sortie entre amis", "Salaire des employés", "WiFi", "Crédit téléphonique", "Vêtement", "Engagement", "Autre"]
+ETATS_PROJET = ["En cours", "Terminé", "En attente", "Annulé"]
+
+# ==================== REGISTRE ====================
+class Registre:
+    """Accès aux données : grand livre partagé et instantané figé
+
+    Toutes les lectures d'un registre portent sur le même instantané
+    jusqu'à actualiser() ; ses propres mutations l'avancent jusqu'à
+    l'instantané qui les contient. Les structures dérivées (DataFrames,
+    index) sont partagées par tous les registres d'un même grand livre.
+    """
+
+    def __init__(self, livre):
+        self.livre = livre
+        self.instantane = livre.instantane()
+
+    @property
+    def stockage(self):
+        return self.livre.stockage
+
+    @property
+    def donnees(self):
+        """Listes de l'instantané, indexées par collection (lecture seule)"""
+        return self.instantane.donnees
+
+    def actualiser(self):
+        """Adopter le dernier instantané publié par le grand livre"""
+        self.instantane = self.livre.instantane()
+        return self
+
+    def version(self, collection):
+        """Version de la collection dans l'instantané (compteur global du grand livre)"""
+        return self.instantane.versions[collection]
+
+    def enregistrement(self, collection, id_):
+        return self.instantane.enregistrement(collection, id_)
+
+    def soumettre(self, mutations):
+        """Faire appliquer des mutations par le grand livre puis adopter son nouvel instantané"""
+        self.instantane = self.livre.soumettre(mutations)
+
+    # ---------- Caches partagés ----------
+    def lire_cache(self, cle):
+        """Valeur dérivée partagée : (version, valeur) ou None"""
+        with self.livre.verrou_caches:
+            return self.livre.caches.get(cle)
+
+    def publier_cache(self, cle, version, valeur):
+        """Partager une valeur dérivée, sauf si une version plus récente l'est déjà"""
+        with self.livre.verrou_caches:
+            actuelle = self.livre.caches.get(cle)
+            if actuelle is None or actuelle[0] <= version:
+                self.livre.caches[cle] = (version, valeur)
+
+    def rattraper(self, index, collection, version):
+        """Copie de l'index avancée jusqu'à `version` par les changements du grand livre
+
+        None si l'index est plus récent ou si l'historique ne suffit plus :
+        il faut alors le reconstruire. L'index partagé n'est jamais modifié.
+        """
+        if index.version > version:
+            return None
+        changements = self.livre.changements(collection, index.version, version)
+        if changements is None:
+            return None
+        index = index.copie()
+        for ancien, nouveau in changements:
+            index.mettre_a_jour(ancien, nouveau)
+        index.version = version
+        return index
+
+def ouvrir_registre(mode='json', dossier=DOSSIER_DONNEES, differe=False):
+    """Registre sur un grand livre chargé depuis le stockage demandé (scripts, tâches)"""
+    return Registre(GrandLivre(ouvrir_stockage(mode, dossier, differe=differe)))
+
+# ==================== INDEX ====================
+def jour_numero(d):
+    """Numéro de jour (jours depuis 1970-01-01) d'une date ou d'une chaîne AAAA-MM-JJ"""
+    return int(np.datetime64(d, 'D').astype(np.int64))
+
+class CumulJournalier:
+    """Totaux journaliers et leurs sommes cumulées, triés par jour
+
+    Le total d'une plage de dates se lit avec deux recherches dichotomiques
+    et une soustraction. Un ajout ou une suppression met à jour les cumuls
+    à partir du jour concerné, sans reconstruire l'index.
+    """
+
+    def __init__(self, enregistrements, version):
+        self.version = version
+        if enregistrements:
+            jours = np.array([r['date'] for r in enregistrements], dtype='datetime64[D]').astype(np.int64)
+            montants = np.array([r['montant'] for r in enregistrements], dtype=float)
+            self.jours, inverse = np.unique(jours, return_inverse=True)
+            self.cumuls = np.cumsum(np.bincount(inverse, weights=montants))
+        else:
+            self.jours = np.empty(0, dtype=np.int64)
+            self.cumuls = np.empty(0, dtype=float)
+
+    def copie(self):
+        # np.insert renvoie un nouveau tableau : seuls les cumuls sont modifiés en place
+        autre = copy.copy(self)
+        autre.cumuls = self.cumuls.copy()
+        return autre
+
+    def ajouter(self, jour, montant):
+        k = int(np.searchsorted(self.jours, jour))
+        if k == len(self.jours) or self.jours[k] != jour:
+            self.jours = np.insert(self.jours, k, jour)
+            self.cumuls = np.insert(self.cumuls, k, self.cumuls[k - 1] if k > 0 else 0.0)
+        self.cumuls[k:] += montant
+
+    def retirer(self, jour, montant):
+        self.ajouter(jour, -montant)
+
+    def mettre_a_jour(self, ancien, nouveau):
+        if ancien is not None:
+            self.retirer(jour_numero(ancien['date']), ancien['montant'])
+        if nouveau is not None:
+            self.ajouter(jour_numero(nouveau['date']), nouveau['montant'])
+
+    def total(self, debut, fin):
+        """Somme des montants datés entre debut et fin inclus"""
+        i = int(np.searchsorted(self.jours, jour_numero(debut), side='left'))
+        j = int(np.searchsorted(self.jours, jour_numero(fin), side='right'))
+        if j <= i:
+            return 0.0
+        return float(self.cumuls[j - 1] - (self.cumuls[i - 1] if i > 0 else 0.0))
+
+def get_cumul(registre, collection):
+    """Index des totaux journaliers de revenus ou dépenses, partagé entre registres"""
+    version = registre.version(collection)
+    entree = registre.lire_cache(('cumul', collection))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    cumul = registre.rattraper(entree[1], collection, version) if entree is not None else None
+    if cumul is None:
+        cumul = CumulJournalier(registre.donnees[collection], version)
+    registre.publier_cache(('cumul', collection), version, cumul)
+    return cumul
+
+class RemboursementsParPret:
+    """Remboursements de chaque prêt triés par date, et total remboursé par prêt
+
+    Tenu à jour à chaque remboursement ajouté ou annulé, sans relire le flux
+    complet. Les listes d'un prêt sont remplacées, jamais modifiées : une
+    copie peut partager celles des prêts qu'elle ne touche pas.
+    """
+
+    def __init__(self, remboursements, version):
+        self.version = version
+        self.par_pret = {}
+        for remboursement in sorted(remboursements, key=itemgetter('date')):
+            self.par_pret.setdefault(remboursement['pret_id'], []).append(remboursement)
+        self.totaux = {pret_id: sum(r['montant'] for r in liste) for pret_id, liste in self.par_pret.items()}
+
+    def copie(self):
+        autre = copy.copy(self)
+        autre.par_pret = dict(self.par_pret)
+        autre.totaux = dict(self.totaux)
+        return autre
+
+    def mettre_a_jour(self, ancien, nouveau):
+        if ancien is not None:
+            pret_id = ancien['pret_id']
+            self.par_pret[pret_id] = [r for r in self.par_pret.get(pret_id, []) if r['id'] != ancien['id']]
+            self.totaux[pret_id] = self.totaux.get(pret_id, 0.0) - ancien['montant']
+        if nouveau is not None:
+            pret_id = nouveau['pret_id']
+            liste = list(self.par_pret.get(pret_id, []))
+            bisect.insort(liste, nouveau, key=itemgetter('date'))
+            self.par_pret[pret_id] = liste
+            self.totaux[pret_id] = self.totaux.get(pret_id, 0.0) + nouveau['montant']
+
+    def historique(self, pret_id):
+        return self.par_pret.get(pret_id, [])
+
+    def total(self, pret_id):
+        return self.totaux.get(pret_id, 0.0)
+
+def get_remboursements(registre):
+    """Index des remboursements par prêt, partagé entre registres"""
+    version = registre.version('remboursements')
+    entree = registre.lire_cache(('remboursements', 'prets'))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    index = registre.rattraper(entree[1], 'remboursements', version) if entree is not None else None
+    if index is None:
+        index = RemboursementsParPret(registre.donnees['remboursements'], version)
+    registre.publier_cache(('remboursements', 'prets'), version, index)
+    return index
+
+# Jours couverts par l'arbre des soldes d'épargne : du 1900-01-01 au 2258-11-11
+ORIGINE_SOLDES = jour_numero('1900-01-01')
+JOURS_SOLDES = 2 ** 17
+
+def rang_solde(jour):
+    """Rang (1 à JOURS_SOLDES) d'un numéro de jour dans l'arbre des soldes d'épargne"""
+    rang = jour - ORIGINE_SOLDES + 1
+    if not 1 <= rang <= JOURS_SOLDES:
+        raise ValueError(f"date d'épargne hors de la plage 1900-01-01 — 2258-11-11 : {np.datetime64(jour, 'D')}")
+    return rang
+
+class SoldesEpargne:
+    """Mouvements d'épargne cumulés par jour dans un arbre de Fenwick
+
+    Un dépôt ou un retrait ajouté ou supprimé à n'importe quelle date, comme
+    le solde à une date donnée, coûtent O(log n) : un mouvement antidaté ne
+    laisse aucun solde ultérieur périmé.
+    """
+
+    def __init__(self, enregistrements, version):
+        self.version = version
+        mouvements = np.zeros(JOURS_SOLDES + 1)
+        if enregistrements:
+            jours = np.array([r['date'] for r in enregistrements], dtype='datetime64[D]').astype(np.int64)
+            montants = np.array([r['montant_depose'] for r in enregistrements], dtype=float)
+            rangs = jours - ORIGINE_SOLDES + 1
+            hors_plage = (rangs < 1) | (rangs > JOURS_SOLDES)
+            if hors_plage.any():
+                # ValueError plutôt qu'un indice négatif replié à l'autre bout de l'arbre
+                rang_solde(int(jours[hors_plage][0]))
+            np.add.at(mouvements, rangs, montants)
+        # Construction en O(n) : chaque nœud i couvre les jours ]i - (i & -i), i]
+        prefixes = np.cumsum(mouvements)
+        rangs = np.arange(JOURS_SOLDES + 1)
+        self.arbre = prefixes - prefixes[rangs - (rangs & -rangs)]
+        self.total = float(prefixes[-1])
+
+    def copie(self):
+        autre = copy.copy(self)
+        autre.arbre = self.arbre.copy()
+        return autre
+
+    def ajouter(self, jour, montant):
+        i = rang_solde(jour)
+        while i <= JOURS_SOLDES:
+            self.arbre[i] += montant
+            i += i & -i
+        self.total += montant
+
+    def mettre_a_jour(self, ancien, nouveau):
+        if ancien is not None:
+            self.ajouter(jour_numero(ancien['date']), -ancien['montant_depose'])
+        if nouveau is not None:
+            self.ajouter(jour_numero(nouveau['date']), nouveau['montant_depose'])
+
+    def solde(self, jour=None):
+        """Solde à la fin du jour donné (solde actuel sans date)"""
+        if jour is None:
+            return self.total
+        # Avant la plage : aucun mouvement ; après : tous
+        i = min(jour_numero(jour) - ORIGINE_SOLDES + 1, JOURS_SOLDES)
+        somme = 0.0
+        while i > 0:
+            somme += self.arbre[i]
+            i -= i & -i
+        return float(somme)
+
+def get_soldes_epargne(registre):
+    """Index des soldes d'épargne, partagé entre registres"""
+    version = registre.version('epargne')
+    entree = registre.lire_cache(('soldes', 'epargne'))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    index = registre.rattraper(entree[1], 'epargne', version) if entree is not None else None
+    if index is None:
+        index = SoldesEpargne(registre.donnees['epargne'], version)
+    registre.publier_cache(('soldes', 'epargne'), version, index)
+    return index
+
+class TotauxObjectifs:
+    """Total versé et nombre de mouvements de chaque objectif d'épargne
+
+    Tenu à jour à chaque mouvement ajouté, modifié ou supprimé, sans relire
+    l'historique. Les mouvements sans objectif sont comptés sous None.
+    """
+
+    def __init__(self, mouvements, version):
+        self.version = version
+        self.totaux = {}
+        self.nombres = {}
+        for mouvement in mouvements:
+            self.ajouter(mouvement.get('objectif_id'), mouvement['montant_depose'], 1)
+
+    def copie(self):
+        autre = copy.copy(self)
+        autre.totaux = dict(self.totaux)
+        autre.nombres = dict(self.nombres)
+        return autre
+
+    def ajouter(self, objectif_id, montant, nombre):
+        self.totaux[objectif_id] = self.totaux.get(objectif_id, 0.0) + montant
+        self.nombres[objectif_id] = self.nombres.get(objectif_id, 0) + nombre
+
+    def mettre_a_jour(self, ancien, nouveau):
+        if ancien is not None:
+            self.ajouter(ancien.get('objectif_id'), -ancien['montant_depose'], -1)
+        if nouveau is not None:
+            self.ajouter(nouveau.get('objectif_id'), nouveau['montant_depose'], 1)
+
+    def total(self, objectif_id):
+        return self.totaux.get(objectif_id, 0.0)
+
+    def nombre(self, objectif_id):
+        return self.nombres.get(objectif_id, 0)
+
+def get_totaux_objectifs(registre):
+    """Index des totaux par objectif d'épargne, partagé entre registres"""
+    version = registre.version('epargne')
+    entree = registre.lire_cache(('objectifs', 'epargne'))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    index = registre.rattraper(entree[1], 'epargne', version) if entree is not None else None
+    if index is None:
+        index = TotauxObjectifs(registre.donnees['epargne'], version)
+    registre.publier_cache(('objectifs', 'epargne'), version, index)
+    return index
+
+# Nombre de périodes dont l'agrégat par catégorie est conservé
+AGREGATS_MAX = 12
+
+class AgregatCategories:
+    """Totaux des dépenses par catégorie sur une période
+
+    Calculé une fois par période puis tenu à jour à chaque ajout ou
+    suppression de dépense. tableau() fournit au graphique et à la liste
+    les catégories triées avec pourcentage, icône et couleur.
+    """
+
+    def __init__(self, debut, fin, totaux, version):
+        self.debut = jour_numero(debut)
+        self.fin = jour_numero(fin)
+        self.totaux = {cat: float(montant) for cat, montant in totaux.items()}
+        self.version = version
+        self._tableau = None
+
+    def copie(self):
+        autre = copy.copy(self)
+        autre.totaux = dict(self.totaux)
+        autre._tableau = None
+        return autre
+
+    def _appliquer(self, enregistrement, signe):
+        if not self.debut <= jour_numero(enregistrement['date']) <= self.fin:
+            return
+        cat = enregistrement['type_depense']
+        total = self.totaux.get(cat, 0.0) + signe * enregistrement['montant']
+        if round(total, 6) == 0:
+            self.totaux.pop(cat, None)
+        else:
+            self.totaux[cat] = total
+        self._tableau = None
+
+    def mettre_a_jour(self, ancien, nouveau):
+        if ancien is not None:
+            self._appliquer(ancien, -1)
+        if nouveau is not None:
+            self._appliquer(nouveau, 1)
+
+    def tableau(self):
+        if self._tableau is None:
+            total = sum(self.totaux.values())
+            self._tableau = [
+                {
+                    'categorie': cat,
+                    'montant': montant,
+                    'pourcentage': (montant / total * 100) if total > 0 else 0,
+                    **CATEGORIES_INFO.get(cat, CATEGORIE_DEFAUT),
+                }
+                for cat, montant in sorted(self.totaux.items(), key=lambda item: item[1], reverse=True)
+            ]
+        return self._tableau
+
+def sommes_categories(depenses, debut, fin):
+    """Totaux par catégorie des dépenses datées entre debut et fin, lus dans les enregistrements"""
+    # Dates AAAA-MM-JJ : l'ordre des chaînes est celui des dates
+    debut, fin = str(debut)[:10], str(fin)[:10]
+    totaux = {}
+    for depense in depenses:
+        if debut <= depense['date'][:10] <= fin:
+            cat = depense['type_depense']
+            totaux[cat] = totaux.get(cat, 0.0) + depense['montant']
+    return totaux
+
+@chronometrer()
+def get_agregat_categories(registre, debut, fin):
+    """Agrégat par catégorie des dépenses de la période, partagé entre registres"""
+    livre = registre.livre
+    version = registre.version('depenses')
+    with livre.verrou_caches:
+        agregats = livre.caches.setdefault('agregats', OrderedDict())
+        agregat = agregats.get((debut, fin))
+    if agregat is not None and agregat.version == version:
+        return agregat
+    nouveau = registre.rattraper(agregat, 'depenses', version) if agregat is not None else None
+    if nouveau is None:
+        # Totaux lus dans les données de l'instantané, jamais dans le stockage : celui-ci
+        # peut déjà contenir des écritures plus récentes que `version`, que rattraper() rejouerait
+        entree = registre.lire_cache(('df', 'depenses'))
+        if entree is not None and entree[0] == version:
+            depenses_df = filtrer_periode(entree[1], debut, fin)
+            totaux = depenses_df.groupby('type_depense', observed=True)['montant'].sum()
+        else:
+            # Premier affichage : quelques totaux ne justifient pas de construire le DataFrame
+            totaux = pd.Series(sommes_categories(registre.donnees['depenses'], debut, fin), dtype=float)
+        nouveau = AgregatCategories(debut, fin, totaux.to_dict(), version)
+    with livre.verrou_caches:
+        actuel = agregats.get((debut, fin))
+        if actuel is None or actuel.version <= version:
+            agregats[(debut, fin)] = nouveau
+            agregats.move_to_end((debut, fin))
+            if len(agregats) > AGREGATS_MAX:
+                agregats.popitem(last=False)
+    return nouveau
+
+# ==================== PÉRIODES ====================
+def bornes_periode(periode_type, param1, param2):
+    """Première et dernière date (incluses) de la période sélectionnée"""
+    if periode_type == 'jour':
+        # param1 = date sélectionnée
+        return param1, param1
+    if periode_type == 'semaine':
+        # param1 = une date de la semaine
+        debut_semaine = param1 - pd.Timedelta(days=param1.weekday())
+        return debut_semaine, debut_semaine + pd.Timedelta(days=6)
+    if periode_type == 'mois':
+        # param1 = mois, param2 = année
+        return date(param2, param1, 1), date(param2, param1, calendar.monthrange(param2, param1)[1])
+    if periode_type == 'plage':
+        # param1 = date de début, param2 = date de fin
+        return param1, param2
+    # 'annee' : param2 = année
+    return date(param2, 1, 1), date(param2, 12, 31)
+
+def filtrer_periode(df, debut, fin):
+    """Lignes d'un DataFrame (colonne 'date' typée) comprises entre debut et fin inclus"""
+    if df.empty:
+        return df
+    return df[(df['date'] >= pd.Timestamp(debut)) & (df['date'] < pd.Timestamp(fin) + pd.Timedelta(days=1))]
+
+# ==================== DATAFRAMES ====================
+COLONNES_DF = {
+    'revenus': ['id', 'date', 'type_revenu', 'client', 'montant', 'description'],
+    'depenses': ['id', 'date', 'type_depense', 'montant', 'fournisseur', 'description'],
+    'epargne': ['id', 'date', 'montant_depose', 'objectif', 'solde_actuel', 'objectif_id'],
+    'prets': ['id', 'nom_pret', 'montant_total', 'montant_rembourse', 'echeance', 'prochaine_echeance', 'solde_restant', 'statut',
+              'taux_annuel', 'periodicite', 'mode_amortissement', 'date_debut', 'total_du'],
+    'remboursements': ['id', 'date', 'pret_id', 'montant', 'note'],
+    'objectifs': ['id', 'nom', 'montant_cible', 'date_cible', 'date_creation'],
+}
+COLONNES_MONTANT = ('montant', 'montant_depose', 'solde_actuel', 'montant_total', 'montant_rembourse', 'solde_restant', 'taux_annuel',
+                    'montant_cible', 'total_du')
+COLONNES_CATEGORIE = ('type_revenu', 'type_depense', 'statut')
+
+def construire_df(collection, enregistrements):
+    """DataFrame typé (dates, montants, catégories), trié par date décroissante"""
+    if not enregistrements:
+        df = pd.DataFrame(columns=COLONNES_DF[collection])
+    else:
+        df = pd.DataFrame(enregistrements)
+
+    for col in df.columns:
+        if col == 'date':
+            df[col] = pd.to_datetime(df[col])
+        elif col in COLONNES_MONTANT:
+            df[col] = df[col].astype(float)
+        elif col in COLONNES_CATEGORIE:
+            df[col] = df[col].astype('category')
+
+    if collection == 'epargne' and not df.empty:
+        # Solde après chaque mouvement, recalculé à chaque construction : jamais figé à la saisie
+        df['solde_actuel'] = df['montant_depose'].loc[df['date'].sort_values(kind='stable').index].cumsum()
+
+    if 'date' in df.columns:
+        df = df.sort_values('date', ascending=False, kind='stable')
+    return df
+
+@chronometrer()
+def get_df(registre, collection):
+    """DataFrame typé d'une collection, reconstruit uniquement après une mutation
+
+    Le DataFrame renvoyé est partagé entre les registres : ne pas le modifier en place.
+    """
+    version = registre.version(collection)
+    entree = registre.lire_cache(('df', collection))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    df = construire_df(collection, registre.donnees[collection])
+    registre.publier_cache(('df', collection), version, df)
+    return df
+
+# ==================== RÉCURRENCES ====================
+# Nombre de périodes dont les occurrences sont conservées
+OCCURRENCES_MAX = 24
+
+@chronometrer()
+def get_occurrences(registre, collection, debut=None, fin=None):
+    """Occurrences des règles récurrentes de `collection` entre debut et fin, mémorisées par période
+
+    Sans `fin`, les occurrences s'arrêtent à aujourd'hui.
+    """
+    fin = fin or date.today()
+    regles = [r for r in registre.donnees['recurrences'] if r['collection'] == collection]
+    if not regles:
+        return []
+    livre = registre.livre
+    version = registre.version('recurrences')
+    cle = (collection, str(debut), str(fin))
+    with livre.verrou_caches:
+        memo = livre.caches.setdefault('occurrences', OrderedDict())
+        entree = memo.get(cle)
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    occurrences = materialiser(regles, debut, fin)
+    with livre.verrou_caches:
+        actuelle = memo.get(cle)
+        if actuelle is None or actuelle[0] <= version:
+            memo[cle] = (version, occurrences)
+            memo.move_to_end(cle)
+            if len(memo) > OCCURRENCES_MAX:
+                memo.popitem(last=False)
+    return occurrences
+
+def ajouter_occurrences(registre, collection, df, debut=None, fin=None):
+    """DataFrame `df` complété des occurrences de la période, trié par date décroissante"""
+    occurrences = get_occurrences(registre, collection, debut, fin)
+    if not occurrences:
+        return df
+    df = pd.concat([df, construire_df(collection, occurrences)], ignore_index=True)
+    for col in COLONNES_CATEGORIE:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df.sort_values('date', ascending=False, kind='stable')
+
+def get_historique_df(registre, collection):
+    """Enregistrements et occurrences passées d'une collection, reconstruit après une mutation ou le lendemain"""
+    df = get_df(registre, collection)
+    if not any(r['collection'] == collection for r in registre.donnees['recurrences']):
+        return df
+    version = (max(registre.version(collection), registre.version('recurrences')), str(date.today()))
+    entree = registre.lire_cache(('historique', collection))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    df = ajouter_occurrences(registre, collection, df)
+    registre.publier_cache(('historique', collection), version, df)
+    return df
+
+def totaux_occurrences(occurrences):
+    """Total et totaux par catégorie (type_depense) d'une liste d'occurrences"""
+    totaux = {}
+    for occurrence in occurrences:
+        cat = occurrence.get('type_depense')
+        totaux[cat] = totaux.get(cat, 0.0) + occurrence['montant']
+    return sum(totaux.values()), totaux
+
+# ==================== RECHERCHE ====================
+@chronometrer()
+def get_index_recherche(registre, collection):
+    """Index plein texte d'une collection, partagé entre registres"""
+    version = registre.version(collection)
+    entree = registre.lire_cache(('recherche', collection))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    index = registre.rattraper(entree[1], collection, version) if entree is not None else None
+    if index is None:
+        index = IndexTexte(registre.donnees[collection], CHAMPS_RECHERCHE[collection], version)
+    registre.publier_cache(('recherche', collection), version, index)
+    return index
+
+@chronometrer()
+def rechercher(registre, collection, requete, debut=None, fin=None):
+    """Lignes dont les champs texte contiennent tous les mots de la requête (préfixes, sans accents)
+
+    Les lignes sont lues dans le DataFrame partagé par leur position,
+    sans le parcourir ; les occurrences des récurrences de la période
+    sont comparées une à une.
+    """
+    df = get_df(registre, collection)
+    ids = get_index_recherche(registre, collection).rechercher(requete)
+    positions = registre.instantane.positions[collection]
+    resultats = df.loc[sorted(positions[id_] for id_ in ids)] if ids else df.iloc[:0]
+    if debut is not None:
+        resultats = filtrer_periode(resultats, debut, fin)
+    if collection in ('revenus', 'depenses'):
+        termes = mots(requete)
+        occurrences = [
+            o for o in get_occurrences(registre, collection, debut, fin)
+            if termes and correspond(o, CHAMPS_RECHERCHE[collection], termes)
+        ]
+        if occurrences:
+            resultats = pd.concat([resultats, construire_df(collection, occurrences)], ignore_index=True)
+    return resultats.sort_values('date', ascending=False, kind='stable')
+
+# ==================== REQUÊTES ====================
+def get_revenus_df(registre, mois=None, annee=None):
+    """Revenus du mois (tout l'historique sans mois), occurrences des récurrences comprises"""
+    if not (mois and annee):
+        return get_historique_df(registre, 'revenus')
+    debut, fin = bornes_periode('mois', mois, annee)
+    if registre.stockage.supporte_requetes:
+        # Lecture indexée des seules lignes du mois
+        df = registre.stockage.lire_periode('revenus', debut, fin).sort_values('date', ascending=False)
+    else:
+        df = filtrer_periode(get_df(registre, 'revenus'), debut, fin)
+    return ajouter_occurrences(registre, 'revenus', df, debut, fin)
+
+def get_depenses_df(registre, mois=None, annee=None):
+    """Dépenses du mois (tout l'historique sans mois), occurrences des récurrences comprises"""
+    if not (mois and annee):
+        return get_historique_df(registre, 'depenses')
+    debut, fin = bornes_periode('mois', mois, annee)
+    if registre.stockage.supporte_requetes:
+        df = registre.stockage.lire_periode('depenses', debut, fin).sort_values('date', ascending=False)
+    else:
+        df = filtrer_periode(get_df(registre, 'depenses'), debut, fin)
+    return ajouter_occurrences(registre, 'depenses', df, debut, fin)
+
+def get_epargne_df(registre):
+    return get_df(registre, 'epargne')
+
+def get_solde_epargne(registre, jour=None):
+    """Solde d'épargne actuel, ou à la fin du jour donné"""
+    return get_soldes_epargne(registre).solde(jour)
+
+def mois_restants(jour, date_cible):
+    """Mois entamés de `jour` à `date_cible` (0 une fois la date passée)"""
+    mois = (date_cible.year - jour.year) * 12 + date_cible.month - jour.month
+    if date_cible.day > jour.day:
+        mois += 1
+    return max(mois, 0)
+
+def suivi_objectifs(registre, jour=None):
+    """Progression de chaque objectif d'épargne, en temps constant par objectif
+
+    Le versement mensuel requis répartit le reste à verser sur les mois
+    restants ; une fois la date cible passée, tout le reste est dû.
+    """
+    jour = jour or date.today()
+    totaux = get_totaux_objectifs(registre)
+    suivi = []
+    for objectif in registre.donnees['objectifs']:
+        verse = totaux.total(objectif['id'])
+        cible = objectif['montant_cible']
+        reste = max(cible - verse, 0.0)
+        mois = mois_restants(jour, date.fromisoformat(objectif['date_cible']))
+        suivi.append({
+            **objectif,
+            'verse': verse,
+            'mouvements': totaux.nombre(objectif['id']),
+            'progression': min(verse / cible, 1.0) if cible > 0 else 1.0,
+            'reste': reste,
+            'mois_restants': mois,
+            'mensuel_requis': reste / mois if mois else reste,
+        })
+    return suivi
+
+def get_total_objectif(registre, objectif_id):
+    """Total versé sur un objectif (None : mouvements sans objectif)"""
+    return get_totaux_objectifs(registre).total(objectif_id)
+
+def get_prets_df(registre, statut=None):
+    df = get_df(registre, 'prets')
+    if statut:
+        df = df[df['statut'] == statut]
+    return df
+
+def get_echeancier(registre):
+    """Échéanciers de tous les prêts, recalculés uniquement après une mutation des prêts"""
+    version = registre.version('prets')
+    entree = registre.lire_cache(('echeancier', 'prets'))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    echeancier = calculer_echeanciers(registre.donnees['prets'])
+    registre.publier_cache(('echeancier', 'prets'), version, echeancier)
+    return echeancier
+
+def suivi_prets(registre, jour, statut='actif'):
+    """Prêts avec reste attendu selon l'échéancier, écart au reste réel et prochaine échéance
+
+    Reste réel et reste attendu comptent tous deux les intérêts : le
+    premier est le total dû moins les remboursements, le second le total dû
+    moins les échéances passées.
+    """
+    df = get_prets_df(registre, statut)
+    echeancier = get_echeancier(registre)
+    lignes = np.array([echeancier.positions[id_] for id_ in df['id']], dtype=np.int64)
+    attendus = echeancier.solde_attendu(jour)[lignes]
+    dates, montants = echeancier.prochaine(jour)
+    df = df.assign(
+        solde_attendu=attendus,
+        # Positif : en retard sur l'échéancier ; négatif : en avance
+        ecart=df['solde_restant'].to_numpy() - attendus,
+        prochaine_date=dates[lignes],
+        prochain_montant=montants[lignes],
+    )
+    return df
+
+def historique_remboursements(registre, pret_id):
+    """Remboursements d'un prêt, du plus récent au plus ancien"""
+    # Ordre inverse de saisie pour les remboursements d'un même jour
+    remboursements = get_remboursements(registre).historique(pret_id)[::-1]
+    return construire_df('remboursements', remboursements)
+
+def calculer_soldes_periode(registre, periode_type, param1, param2):
+    """Totaux, solde, épargne et dépenses par catégorie de la période"""
+    debut, fin = bornes_periode(periode_type, param1, param2)
+    # Totaux lus dans l'index des cumuls journaliers, tenu à jour depuis l'instantané
+    # de la session comme les catégories, quel que soit le stockage
+    total_revenus = get_cumul(registre, 'revenus').total(debut, fin)
+    total_depenses = get_cumul(registre, 'depenses').total(debut, fin)
+
+    agregat = get_agregat_categories(registre, debut, fin)
+    # Occurrences des récurrences générées pour la seule période, hors stockage
+    revenus_recurrents, _ = totaux_occurrences(get_occurrences(registre, 'revenus', debut, fin))
+    depenses_recurrentes, par_categorie = totaux_occurrences(get_occurrences(registre, 'depenses', debut, fin))
+    total_revenus += revenus_recurrents
+    total_depenses += depenses_recurrentes
+    if par_categorie:
+        totaux = dict(agregat.totaux)
+        for cat, montant in par_categorie.items():
+            totaux[cat] = totaux.get(cat, 0.0) + montant
+        agregat = AgregatCategories(debut, fin, totaux, agregat.version)
+
+    return {
+        'revenus': total_revenus,
+        'depenses': total_depenses,
+        'solde': total_revenus - total_depenses,
+        'epargne': get_solde_epargne(registre),
+        'categories': agregat.tableau()
+    }
+
+def calculer_soldes(registre, mois, annee):
+    revenus_df = get_revenus_df(registre, mois, annee)
+    depenses_df = get_depenses_df(registre, mois, annee)
+
+    total_revenus = revenus_df['montant'].sum() if not revenus_df.empty else 0
+    total_depenses = depenses_df['montant'].sum() if not depenses_df.empty else 0
+
+    return {
+        'revenus': total_revenus,
+        'depenses': total_depenses,
+        'solde': total_revenus - total_depenses,
+        'epargne': get_solde_epargne(registre)
+    }
+
+# ==================== PRÉVISION ====================
+# Collections dont dépend la prévision
+COLLECTIONS_PREVISION = ('revenus', 'depenses', 'epargne', 'prets', 'recurrences')
+
+def parametres_prevision(registre, jour, horizon=HORIZON_DEFAUT):
+    """Distributions mensuelles par catégorie et échéances connues, pour les `horizon` mois suivant `jour`
+
+    L'historique s'arrête au dernier mois complet ; la prévision commence
+    le mois suivant celui de `jour`.
+    """
+    revenus = get_revenus_df(registre)
+    depenses = get_depenses_df(registre)
+    epargne = get_epargne_df(registre)
+    mois_courant = np.datetime64(jour, 'M')
+    debut = debut_historique(mois_courant, [revenus, depenses, epargne])
+    prets = get_prets_df(registre, 'actif')
+    echeancier = get_echeancier(registre)
+    lignes = np.array([echeancier.positions[id_] for id_ in prets['id']], dtype=np.int64)
+    return {
+        'horizon': horizon,
+        'premier_mois': mois_courant + 1,
+        'revenus': matrice_mensuelle(revenus, 'montant', debut, mois_courant, 'type_revenu'),
+        'depenses': matrice_mensuelle(depenses, 'montant', debut, mois_courant, 'type_depense'),
+        'epargne': matrice_mensuelle(epargne, 'montant_depose', debut, mois_courant),
+        'echeances': echeances_mensuelles(echeancier, lignes, prets['solde_restant'], mois_courant + 1, horizon),
+        'solde_epargne': get_solde_epargne(registre),
+    }
+
+@chronometrer()
+def get_prevision(registre, horizon=HORIZON_DEFAUT, chemins=CHEMINS_DEFAUT, jour=None, processus=None):
+    """Prévision de Monte-Carlo, recalculée uniquement après une mutation (ou au changement de mois)"""
+    jour = jour or date.today()
+    version = max(registre.version(c) for c in COLLECTIONS_PREVISION)
+    cle = ('prevision', str(np.datetime64(jour, 'M')), horizon, chemins)
+    entree = registre.lire_cache(cle)
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    prevision = simuler(parametres_prevision(registre, jour, horizon), chemins, processus)
+    registre.publier_cache(cle, version, prevision)
+    return prevision
+
+def lire_prevision(registre, horizon=HORIZON_DEFAUT, chemins=CHEMINS_DEFAUT, jour=None):
+    """Dernière prévision calculée ce mois-ci, sans relancer la simulation
+
+    Renvoie (prevision, a_jour) ou (None, False) si aucune n'a été calculée.
+    `a_jour` est faux si des mutations ont eu lieu depuis.
+    """
+    jour = jour or date.today()
+    entree = registre.lire_cache(('prevision', str(np.datetime64(jour, 'M')), horizon, chemins))
+    if entree is None:
+        return None, False
+    return entree[1], entree[0] == max(registre.version(c) for c in COLLECTIONS_PREVISION)
+
+# ==================== MUTATIONS ====================
+def ajouter_enregistrement(registre, collection, enregistrement):
+    """Ajouter un enregistrement (identifiant attribué ici) ; renvoie son identifiant"""
+    id_ = nouvel_id()
+    registre.soumettre([{'op': 'ajout', 'col': collection, 'rec': {'id': id_, **enregistrement}}])
+    return id_
+
+def supprimer_enregistrements(registre, collection, ids):
+    """Supprimer plusieurs enregistrements par identifiant, en une seule écriture
+
+    Une occurrence de récurrence n'est pas stockée : la supprimer revient
+    à l'ignorer dans sa règle.
+    """
+    positions = registre.instantane.positions[collection]
+    regles = registre.instantane.positions['recurrences']
+    stockes, ignorees, retires = [], {}, []
+    for id_ in dict.fromkeys(ids):
+        occurrence = None if id_ in positions else lire_identifiant(id_)
+        if id_ in positions:
+            stockes.append(id_)
+        elif occurrence is not None and occurrence[0] in regles:
+            ignorees.setdefault(occurrence[0], {})[occurrence[1]] = None
+        else:
+            continue
+        retires.append(id_)
+    mutations = [{'op': 'suppression', 'col': collection, 'ids': stockes}] if stockes else []
+    mutations += [_mutation_exceptions(regle_id, exceptions) for regle_id, exceptions in ignorees.items()]
+    if mutations:
+        registre.soumettre(mutations)
+    return retires
+
+def modifier_enregistrement(registre, collection, enregistrement):
+    """Remplacer l'enregistrement de même identifiant"""
+    registre.soumettre([{'op': 'modification', 'col': collection, 'rec': enregistrement}])
+
+def deposer_epargne(registre, date_depot, montant, objectif='', objectif_id=None):
+    """Enregistrer un dépôt (retrait si `montant` est négatif) ; renvoie le nouveau solde
+
+    Le solde courant n'est pas stocké avec le mouvement : il se lit dans
+    l'index des soldes, toujours à jour. Le mouvement est imputé à
+    l'objectif `objectif_id`, dont le nom est repris dans `objectif`.
+    Une date hors de la plage de l'index des soldes lève ValueError.
+    """
+    rang_solde(jour_numero(date_depot))
+    if objectif_id is not None:
+        objectif = registre.enregistrement('objectifs', objectif_id)['nom']
+    ajouter_enregistrement(registre, 'epargne', {
+        'date': str(date_depot),
+        'montant_depose': montant,
+        'objectif': objectif,
+        'objectif_id': objectif_id,
+    })
+    return get_solde_epargne(registre)
+
+def ajouter_objectif(registre, nom, montant_cible, date_cible):
+    """Créer un objectif d'épargne ; renvoie son identifiant"""
+    return ajouter_enregistrement(registre, 'objectifs', {
+        'nom': nom,
+        'montant_cible': montant_cible,
+        'date_cible': str(date_cible),
+        'date_creation': str(date.today()),
+    })
+
+def supprimer_objectif(registre, objectif_id):
+    """Supprimer un objectif ; ses mouvements restent, sans objectif
+
+    Les mouvements sont relus par le rédacteur : un mouvement modifié ou
+    versé sur l'objectif entre-temps par une autre session est détaché
+    dans sa dernière version.
+    """
+    def detacher(etat):
+        return [
+            {'op': 'modification', 'col': 'epargne', 'rec': {**m, 'objectif_id': None}}
+            for m in etat['epargne'] if m.get('objectif_id') == objectif_id
+        ] + [{'op': 'suppression', 'col': 'objectifs', 'ids': [objectif_id]}]
+    registre.soumettre([{'op': 'calcul', 'fonction': detacher}])
+
+def ajouter_recurrence(registre, collection, modele, frequence, date_debut, date_fin=None, intervalle=1):
+    """Enregistrer une règle récurrente (revenu ou dépense `modele` sans date) ; renvoie son identifiant"""
+    return ajouter_enregistrement(registre, 'recurrences', {
+        'collection': collection,
+        'modele': modele,
+        'frequence': frequence,
+        'intervalle': intervalle,
+        'date_debut': str(date_debut),
+        'date_fin': str(date_fin) if date_fin else None,
+        'exceptions': {},
+    })
+
+def _mutation_regle(regle_id, modifier):
+    """Modification de la règle par `modifier` (copie de la règle → None), appliquée à sa dernière version
+
+    Évaluée par le rédacteur : deux sessions qui modifient la même règle
+    ne s'écrasent pas.
+    """
+    def calculer(etat):
+        # Copie : les enregistrements ne sont jamais modifiés en place
+        regle = dict(etat.enregistrement('recurrences', regle_id))
+        modifier(regle)
+        return [{'op': 'modification', 'col': 'recurrences', 'rec': regle}]
+    return {'op': 'calcul', 'fonction': calculer}
+
+def _mutation_exceptions(regle_id, exceptions, retablies=()):
+    """Modification de la règle dont les exceptions sont complétées (None : occurrence ignorée)"""
+    def completer(regle):
+        regle['exceptions'] = {**(regle.get('exceptions') or {}), **exceptions}
+        for jour in retablies:
+            regle['exceptions'].pop(jour, None)
+    return _mutation_regle(regle_id, completer)
+
+def remplacer_occurrence(registre, regle_id, jour, modifications):
+    """Modifier une seule occurrence (`modifications` : champs remplacés, None pour l'ignorer)"""
+    registre.soumettre([_mutation_exceptions(regle_id, {str(jour): modifications})])
+
+def retablir_occurrence(registre, regle_id, jour):
+    """Annuler la modification ou l'omission d'une occurrence"""
+    registre.soumettre([_mutation_exceptions(regle_id, {}, [str(jour)])])
+
+def arreter_recurrence(registre, regle_id, date_fin):
+    """Fixer la date de fin d'une règle ; ses occurrences passées sont conservées"""
+    registre.soumettre([_mutation_regle(regle_id, lambda regle: regle.update(date_fin=str(date_fin)))])
+
+def ajouter_pret(registre, nom_pret, montant_total, date_debut, echeance, taux_annuel=0.0,
+                 periodicite='mensuelle', mode_amortissement='annuite'):
+    """Enregistrer un prêt ; sa prochaine échéance est la première de son échéancier
+
+    `montant_total` est le capital emprunté ; le solde restant part du
+    total dû selon l'échéancier, intérêts compris.
+    """
+    pret = {
+        'nom_pret': nom_pret,
+        'montant_total': montant_total,
+        'montant_rembourse': 0,
+        'echeance': str(echeance),
+        'statut': 'actif',
+        'taux_annuel': taux_annuel,
+        'periodicite': periodicite,
+        'mode_amortissement': mode_amortissement,
+        'date_debut': str(date_debut),
+    }
+    echeancier = calculer_echeanciers([{'id': None, **pret}])
+    pret['prochaine_echeance'] = str(echeancier.dates[0, 0])
+    pret['total_du'] = pret['solde_restant'] = float(echeancier.totaux[0])
+    return ajouter_enregistrement(registre, 'prets', pret)
+
+def _imputer(pret, montant):
+    """Copie du prêt dont le remboursé et le restant sont ajustés de `montant` (négatif pour annuler)"""
+    # Copie : les enregistrements ne sont jamais modifiés en place
+    pret = dict(pret)
+    pret['montant_rembourse'] += montant
+    pret['solde_restant'] -= montant
+    # Soldé une fois le total dû payé, intérêts compris (au centime près)
+    pret['statut'] = 'soldé' if round(pret['solde_restant'], 2) <= 0 else 'actif'
+    return pret
+
+def _imputation(etat, pret_id, montant):
+    """Modification imputant `montant` sur la version courante du prêt (évaluée par le rédacteur)"""
+    return {'op': 'modification', 'col': 'prets', 'rec': _imputer(etat.enregistrement('prets', pret_id), montant)}
+
+def rembourser_pret(registre, pret_id, montant, date_remb=None, note=''):
+    """Enregistrer un remboursement et imputer son montant sur le prêt ; renvoie le prêt mis à jour
+
+    L'événement et l'imputation sont soumis ensemble : ils sont appliqués
+    et persistés dans le même lot. Le nouveau solde part du prêt tel que
+    le rédacteur le trouve, deux remboursements simultanés s'additionnent.
+    """
+    remboursement = {
+        'id': nouvel_id(),
+        'pret_id': pret_id,
+        'date': str(date_remb or date.today()),
+        'montant': montant,
+        'note': note,
+    }
+    registre.soumettre([
+        {'op': 'ajout', 'col': 'remboursements', 'rec': remboursement},
+        {'op': 'calcul', 'fonction': lambda etat: [_imputation(etat, pret_id, montant)]},
+    ])
+    return registre.enregistrement('prets', pret_id)
+
+def annuler_remboursement(registre, remboursement_id):
+    """Supprimer un remboursement saisi par erreur et rétablir le solde du prêt ; renvoie le prêt"""
+    pret_id = registre.enregistrement('remboursements', remboursement_id)['pret_id']
+
+    def annuler(etat):
+        # Relu par le rédacteur : un remboursement déjà annulé ailleurs rejette la demande
+        remboursement = etat.enregistrement('remboursements', remboursement_id)
+        return [
+            {'op': 'suppression', 'col': 'remboursements', 'ids': [remboursement_id]},
+            _imputation(etat, pret_id, -remboursement['montant']),
+        ]
+    registre.soumettre([{'op': 'calcul', 'fonction': annuler}])
+    return registre.enregistrement('prets', pret_id)
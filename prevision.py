@@ -0,0 +1,136 @@
+"""Prévision de trésorerie par simulation de Monte-Carlo (NumPy, chemins répartis entre processus)"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ==================== CONFIGURATION ====================
+HORIZON_DEFAUT = 12
+CHEMINS_DEFAUT = 10000
+# Mois complets d'historique dont les totaux mensuels sont ré-échantillonnés
+HISTORIQUE_MOIS = 24
+PERCENTILES_PREVISION = (5, 25, 50, 75, 95)
+# Chemins simulés par tâche : même résultat quel que soit le nombre de processus
+CHEMINS_PAR_LOT = 2500
+# En deçà, le démarrage des processus coûte plus que le calcul : simulation dans le processus courant
+CHEMINS_PARALLELE = 40000
+GRAINE_PREVISION = 20240601
+
+# revenus, dépenses et échéances de prêts du mois ; solde du mois, trésorerie cumulée, épargne en fin de mois
+SERIES = ('revenus', 'depenses', 'echeances', 'solde', 'tresorerie', 'epargne')
+
+# ==================== HISTORIQUE ====================
+def debut_historique(fin, dfs, mois=HISTORIQUE_MOIS):
+    """Premier mois de l'historique : `mois` mois avant `fin`, sans précéder la première donnée"""
+    dates = [df['date'].min() for df in dfs if not df.empty]
+    if not dates:
+        return fin
+    return min(max(fin - mois, np.datetime64(min(dates), 'M')), fin)
+
+def matrice_mensuelle(df, colonne, debut, fin, categorie=None):
+    """Totaux mensuels (mois × catégories) de `colonne` entre les mois `debut` inclus et `fin` exclu
+
+    Les mois sans mouvement valent 0 : ils font partie de la distribution.
+    """
+    nombre = max(int((fin - debut).astype(np.int64)), 0)
+    if df.empty or nombre == 0:
+        return np.zeros((max(nombre, 1), 1))
+    mois = df['date'].to_numpy().astype('datetime64[M]')
+    dans = (mois >= debut) & (mois < fin)
+    rangs = (mois[dans] - debut).astype(np.int64)
+    montants = df[colonne].to_numpy(dtype=float)[dans]
+    if categorie is None:
+        return np.bincount(rangs, weights=montants, minlength=nombre)[:, None]
+    codes, noms = pd.factorize(df[categorie].to_numpy()[dans])
+    matrice = np.zeros((nombre, max(len(noms), 1)))
+    np.add.at(matrice, (rangs, codes), montants)
+    return matrice
+
+def echeances_mensuelles(echeancier, lignes, restants, premier_mois, horizon):
+    """Échéances à payer chaque mois de l'horizon pour les prêts `lignes` de l'échéancier
+
+    Les échéances d'un prêt sont plafonnées à son reste dû : un
+    prêt remboursé en avance n'est pas compté deux fois.
+    """
+    if len(lignes) == 0:
+        return np.zeros(horizon)
+    dates = echeancier.dates[lignes].astype('datetime64[M]')
+    rangs = (dates - premier_mois).astype(np.int64)
+    futures = ~np.isnat(echeancier.dates[lignes]) & (rangs >= 0) & (rangs < horizon)
+    paiements = np.where(futures, echeancier.paiements[lignes], 0.0)
+    cumul = np.minimum(np.cumsum(paiements, axis=1), np.asarray(restants, dtype=float)[:, None])
+    plafonnes = np.diff(cumul, axis=1, prepend=0.0)
+    return np.bincount(rangs[futures], weights=plafonnes[futures], minlength=horizon)
+
+# ==================== SIMULATION ====================
+def _tirer(rng, matrice, chemins, horizon):
+    """Totaux mensuels simulés : un mois d'historique tiré indépendamment par catégorie et par mois"""
+    mois, categories = matrice.shape
+    tirages = rng.integers(0, mois, size=(chemins, horizon, categories))
+    return matrice[tirages, np.arange(categories)].sum(axis=2)
+
+def simuler_lot(parametres, chemins, graine):
+    """Chemins (chemins × horizon) de chaque série pour un lot"""
+    rng = np.random.default_rng(graine)
+    horizon = parametres['horizon']
+    revenus = _tirer(rng, parametres['revenus'], chemins, horizon)
+    depenses = _tirer(rng, parametres['depenses'], chemins, horizon)
+    mouvements = _tirer(rng, parametres['epargne'], chemins, horizon)
+    echeances = np.broadcast_to(parametres['echeances'], (chemins, horizon))
+    solde = revenus - depenses - echeances
+    return {
+        'revenus': revenus,
+        'depenses': depenses,
+        'echeances': echeances,
+        'solde': solde,
+        'tresorerie': np.cumsum(solde, axis=1),
+        'epargne': parametres['solde_epargne'] + np.cumsum(mouvements, axis=1),
+    }
+
+def _simuler(tache):
+    parametres, chemins, graine = tache
+    return simuler_lot(parametres, chemins, graine)
+
+class Prevision:
+    """Percentiles de chaque série, mois par mois, sur l'ensemble des chemins simulés"""
+
+    def __init__(self, mois, chemins, percentiles, moyennes):
+        self.mois = mois
+        self.chemins = chemins
+        self.percentiles = percentiles
+        self.moyennes = moyennes
+
+    def tableau(self, serie):
+        """Mois, moyenne et percentiles d'une série"""
+        return pd.DataFrame({
+            'mois': self.mois.astype('datetime64[ns]'),
+            'moyenne': self.moyennes[serie],
+            **{f'p{p}': self.percentiles[serie][i] for i, p in enumerate(PERCENTILES_PREVISION)},
+        })
+
+def simuler(parametres, chemins=CHEMINS_DEFAUT, processus=None, graine=GRAINE_PREVISION):
+    """Prévision sur `chemins` chemins, répartis par lots entre `processus` processus"""
+    tailles = [CHEMINS_PAR_LOT] * (chemins // CHEMINS_PAR_LOT)
+    if chemins % CHEMINS_PAR_LOT:
+        tailles.append(chemins % CHEMINS_PAR_LOT)
+    graines = np.random.SeedSequence(graine).spawn(len(tailles))
+    taches = [(parametres, taille, g) for taille, g in zip(tailles, graines)]
+    processus = processus or os.cpu_count() or 1
+    if processus == 1 or chemins < CHEMINS_PARALLELE:
+        lots = [_simuler(tache) for tache in taches]
+    else:
+        # forkserver : les processus ne dupliquent pas les threads du serveur Streamlit
+        methodes = multiprocessing.get_all_start_methods()
+        contexte = multiprocessing.get_context('forkserver' if 'forkserver' in methodes else 'spawn')
+        with ProcessPoolExecutor(max_workers=min(processus, len(taches)), mp_context=contexte) as executeur:
+            lots = list(executeur.map(_simuler, taches))
+
+    percentiles, moyennes = {}, {}
+    for serie in SERIES:
+        valeurs = np.concatenate([lot[serie] for lot in lots])
+        percentiles[serie] = np.percentile(valeurs, PERCENTILES_PREVISION, axis=0)
+        moyennes[serie] = valeurs.mean(axis=0)
+    mois = parametres['premier_mois'] + np.arange(parametres['horizon'])
+    return Prevision(mois, chemins, percentiles, moyennes)
@@ -0,0 +1,295 @@
+"""Relevés périodiques de Finance Pro générés en parallèle (HTML, CSV, Excel)
+
+Usage (depuis la racine du dépôt) :
+    python rapports.py --debut 2024-01 --fin 2026-12 --formats html xlsx --sortie releves
+    python rapports.py --debut 2024 --fin 2026 --periodicite annee --stockage sqlite
+
+Les données sont chargées une seule fois puis partagées en lecture seule
+avec les processus (hérités par fork, sinon transmis une fois à chacun) ;
+chaque processus calcule et écrit les relevés des périodes qui lui sont confiées.
+"""
+import argparse
+import csv
+import html
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from amortissement import parametres
+from moteur import AgregatCategories, CumulJournalier, bornes_periode, jour_numero
+from recurrences import avec_occurrences
+from stockage import DOSSIER_DONNEES, MODES_STOCKAGE, ouvrir_stockage
+
+# ==================== CONFIGURATION ====================
+FORMATS_RAPPORT = ('html', 'csv', 'xlsx')
+PERIODICITES = ('mois', 'annee')
+NOMS_MOIS = ["Janvier", "Février", "Mars", "Avril", "Mai", "Juin", "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"]
+
+STYLE_HTML = """
+body { font-family: -apple-system, 'Segoe UI', Roboto, sans-serif; background: #0a0a0a; color: #ffffff; margin: 2rem; }
+h1 { font-size: 1.6rem; margin-bottom: 0.2rem; }
+h2 { font-size: 1.1rem; color: #8a8a8a; margin-top: 2rem; }
+table { border-collapse: collapse; width: 100%; max-width: 48rem; }
+th, td { padding: 0.45rem 0.8rem; border-bottom: 1px solid #252525; text-align: left; }
+td.montant, th.montant { text-align: right; font-variant-numeric: tabular-nums; }
+.positif { color: #66ffcc; } .negatif { color: #ff6699; }
+"""
+
+# ==================== PÉRIODES ====================
+def lire_mois(texte):
+    """(année, mois) d'une chaîne AAAA-MM ; mois None pour AAAA"""
+    morceaux = texte.split('-')
+    if len(morceaux) == 1:
+        return int(morceaux[0]), None
+    return int(morceaux[0]), int(morceaux[1])
+
+def periodes(debut, fin, periodicite='mois'):
+    """Périodes (libellé, type, param1, param2) de debut à fin inclus, au format de bornes_periode"""
+    (annee, mois), (annee_fin, mois_fin) = lire_mois(debut), lire_mois(fin)
+    if periodicite == 'annee':
+        return [(f"{a}", 'annee', None, a) for a in range(annee, annee_fin + 1)]
+    mois, mois_fin = mois or 1, mois_fin or 12
+    resultat = []
+    while (annee, mois) <= (annee_fin, mois_fin):
+        resultat.append((f"{annee}-{mois:02d}", 'mois', mois, annee))
+        annee, mois = (annee + 1, 1) if mois == 12 else (annee, mois + 1)
+    return resultat
+
+# ==================== DONNÉES PARTAGÉES ====================
+# Structures construites une fois par processus à partir des données chargées
+_PARTAGE = {}
+
+def _trier_par_jour(enregistrements, *champs):
+    """Numéros de jour triés et colonnes `champs` dans le même ordre"""
+    jours = np.array([r['date'] for r in enregistrements], dtype='datetime64[D]').astype(np.int64)
+    ordre = np.argsort(jours, kind='stable')
+    return [jours[ordre]] + [np.asarray([r[c] for r in enregistrements])[ordre] for c in champs]
+
+def _initialiser(donnees):
+    """Index de lecture du processus : cumuls, catégories codées, soldes d'épargne et remboursements cumulés par jour"""
+    _PARTAGE['revenus'] = CumulJournalier(donnees['revenus'], 0)
+    _PARTAGE['depenses'] = CumulJournalier(donnees['depenses'], 0)
+    if donnees['depenses']:
+        jours, categories, montants = _trier_par_jour(donnees['depenses'], 'type_depense', 'montant')
+        codes, noms = pd.factorize(categories)
+        _PARTAGE['categories'] = (jours, codes, montants.astype(float), list(noms))
+    else:
+        _PARTAGE['categories'] = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), [])
+    if donnees['epargne']:
+        jours, mouvements = _trier_par_jour(donnees['epargne'], 'montant_depose')
+        _PARTAGE['epargne'] = (jours, np.cumsum(mouvements.astype(float)))
+    else:
+        _PARTAGE['epargne'] = (np.empty(0, dtype=np.int64), np.empty(0))
+    prets = donnees['prets']
+    _PARTAGE['prets'] = prets
+    # Date de début de chaque prêt, reconstituée comme dans l'échéancier pour les prêts antérieurs
+    _PARTAGE['debuts_prets'] = parametres([{'id': None, **p} for p in prets])['debuts'].astype(np.int64) if prets else []
+    remboursements = {}
+    if donnees.get('remboursements'):
+        jours, prets_ids, montants = _trier_par_jour(donnees['remboursements'], 'pret_id', 'montant')
+        for pret_id in np.unique(prets_ids):
+            du_pret = prets_ids == pret_id
+            remboursements[pret_id] = (jours[du_pret], np.cumsum(montants[du_pret].astype(float)))
+    _PARTAGE['remboursements'] = remboursements
+
+def pret_au(pret, jour):
+    """Remboursé, restant et statut d'un prêt à la fin du jour `jour` (numéro de jour)
+
+    Les remboursements datés comptent à leur date ; la part du remboursé
+    sans événement (saisie avant les remboursements datés) compte dès le
+    début du prêt.
+    """
+    jours, cumuls = _PARTAGE['remboursements'].get(pret.get('id'), ((), ()))
+    k = int(np.searchsorted(jours, jour, side='right'))
+    non_date = pret['montant_rembourse'] - (float(cumuls[-1]) if len(cumuls) else 0.0)
+    rembourse = non_date + (float(cumuls[k - 1]) if k > 0 else 0.0)
+    # Total dû constant : remboursé + restant
+    restant = pret['montant_rembourse'] + pret['solde_restant'] - rembourse
+    return rembourse, restant, 'soldé' if round(restant, 2) <= 0 else 'actif'
+
+# ==================== RELEVÉ ====================
+def calculer_releve(libelle, periode_type, param1, param2):
+    """Totaux, dépenses par catégorie, épargne et prêts d'une période"""
+    debut, fin = bornes_periode(periode_type, param1, param2)
+    revenus = _PARTAGE['revenus'].total(debut, fin)
+    depenses = _PARTAGE['depenses'].total(debut, fin)
+
+    jours, codes, montants, noms = _PARTAGE['categories']
+    i = int(np.searchsorted(jours, jour_numero(debut), side='left'))
+    j = int(np.searchsorted(jours, jour_numero(fin), side='right'))
+    sommes = np.bincount(codes[i:j], weights=montants[i:j], minlength=len(noms))
+    totaux = {noms[k]: sommes[k] for k in np.flatnonzero(sommes)}
+    # Même tri, pourcentages, icônes et couleurs que la liste du tableau de bord
+    categories = AgregatCategories(debut, fin, totaux, 0).tableau()
+
+    # Solde d'épargne du dernier dépôt de la période (ou d'avant)
+    jours_epargne, soldes = _PARTAGE['epargne']
+    k = int(np.searchsorted(jours_epargne, jour_numero(fin), side='right'))
+    epargne = float(soldes[k - 1]) if k > 0 else 0.0
+
+    # État des prêts commencés à la fin de la période, d'après les remboursements datés
+    prets = []
+    jour_fin = jour_numero(fin)
+    for p, debut_pret in zip(_PARTAGE['prets'], _PARTAGE['debuts_prets']):
+        if debut_pret > jour_fin:
+            continue
+        rembourse, restant, statut = pret_au(p, jour_fin)
+        prets.append({
+            'nom_pret': p['nom_pret'],
+            'montant_total': p['montant_total'],
+            'montant_rembourse': rembourse,
+            'solde_restant': restant,
+            'echeance': p['echeance'],
+            'statut': statut,
+            'en_retard': statut == 'actif' and str(p['echeance']) < str(fin),
+        })
+    return {
+        'periode': libelle,
+        'debut': str(debut),
+        'fin': str(fin),
+        'revenus': revenus,
+        'depenses': depenses,
+        'solde': revenus - depenses,
+        'epargne': epargne,
+        'categories': categories,
+        'prets': prets,
+    }
+
+def titre_releve(releve):
+    annee, mois = lire_mois(releve['periode'])
+    return f"Relevé {NOMS_MOIS[mois - 1].lower()} {annee}" if mois else f"Relevé annuel {annee}"
+
+# ==================== ÉCRIVAINS ====================
+def _lignes_synthese(releve):
+    return [
+        ("Revenus", releve['revenus']),
+        ("Dépenses", releve['depenses']),
+        ("Solde", releve['solde']),
+        ("Épargne (fin de période)", releve['epargne']),
+    ]
+
+def _ecrire_html(releve, chemin):
+    def montant(valeur, signe=False):
+        classe = ' positif' if signe and valeur >= 0 else ' negatif' if signe else ''
+        return f'<td class="montant{classe}">{valeur:,.0f} FCFA</td>'
+
+    synthese = "".join(f"<tr><th>{nom}</th>{montant(valeur, nom == 'Solde')}</tr>" for nom, valeur in _lignes_synthese(releve))
+    categories = "".join(
+        f"<tr><td>{cat['icon']} {html.escape(cat['categorie'])}</td>{montant(cat['montant'])}"
+        f"<td class=\"montant\">{cat['pourcentage']:.0f}%</td></tr>"
+        for cat in releve['categories']
+    ) or '<tr><td colspan="3">Aucune dépense pour cette période</td></tr>'
+    prets = "".join(
+        f"<tr><td>{html.escape(p['nom_pret'])}</td>{montant(p['montant_total'])}{montant(p['montant_rembourse'])}"
+        f"{montant(p['solde_restant'])}<td>{p['echeance']}</td>"
+        f"<td>{html.escape(p['statut'])}{' ⚠️ échu' if p['en_retard'] else ''}</td></tr>"
+        for p in releve['prets']
+    ) or '<tr><td colspan="6">Aucun prêt</td></tr>'
+    titre = titre_releve(releve)
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.write(f"""<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>{titre}</title><style>{STYLE_HTML}</style></head>
+<body>
+<h1>💎 {titre}</h1>
+<p>Du {releve['debut']} au {releve['fin']}</p>
+<h2>Synthèse</h2><table>{synthese}</table>
+<h2>Dépenses par catégorie</h2>
+<table><tr><th>Catégorie</th><th class="montant">Montant</th><th class="montant">Part</th></tr>{categories}</table>
+<h2>Prêts</h2>
+<table><tr><th>Prêt</th><th class="montant">Total</th><th class="montant">Remboursé</th><th class="montant">Restant</th><th>Échéance</th><th>Statut</th></tr>{prets}</table>
+</body></html>
+""")
+
+def _ecrire_csv(releve, chemin):
+    # utf-8-sig : les accents s'affichent correctement à l'ouverture dans Excel
+    with open(chemin, 'w', encoding='utf-8-sig', newline='') as f:
+        ecrivain = csv.writer(f)
+        ecrivain.writerow(['section', 'libelle', 'montant', 'pourcentage'])
+        for nom, valeur in _lignes_synthese(releve):
+            ecrivain.writerow(['synthese', nom, round(valeur, 2), ''])
+        for cat in releve['categories']:
+            ecrivain.writerow(['categorie', cat['categorie'], round(cat['montant'], 2), round(cat['pourcentage'], 1)])
+        for p in releve['prets']:
+            ecrivain.writerow(['pret', p['nom_pret'], round(p['solde_restant'], 2), ''])
+
+def _ecrire_xlsx(releve, chemin):
+    with pd.ExcelWriter(chemin, engine='openpyxl') as classeur:
+        pd.DataFrame(_lignes_synthese(releve), columns=['Libellé', 'Montant (FCFA)']).to_excel(classeur, sheet_name='Synthèse', index=False)
+        pd.DataFrame(
+            [(c['categorie'], c['montant'], round(c['pourcentage'], 1)) for c in releve['categories']],
+            columns=['Catégorie', 'Montant (FCFA)', 'Part (%)']
+        ).to_excel(classeur, sheet_name='Catégories', index=False)
+        pd.DataFrame(releve['prets'], columns=['nom_pret', 'montant_total', 'montant_rembourse', 'solde_restant', 'echeance', 'statut', 'en_retard']).rename(columns={
+            'nom_pret': 'Prêt', 'montant_total': 'Total (FCFA)', 'montant_rembourse': 'Remboursé (FCFA)',
+            'solde_restant': 'Restant (FCFA)', 'echeance': 'Échéance', 'statut': 'Statut', 'en_retard': 'Échu',
+        }).to_excel(classeur, sheet_name='Prêts', index=False)
+
+ECRIVAINS = {'html': _ecrire_html, 'csv': _ecrire_csv, 'xlsx': _ecrire_xlsx}
+
+def produire_releve(periode, formats, dossier):
+    """Calculer le relevé d'une période et l'écrire dans chaque format ; renvoie sa synthèse"""
+    releve = calculer_releve(*periode)
+    for format_rapport in formats:
+        ECRIVAINS[format_rapport](releve, os.path.join(dossier, f"releve_{releve['periode']}.{format_rapport}"))
+    return {cle: releve[cle] for cle in ('periode', 'debut', 'fin', 'revenus', 'depenses', 'solde', 'epargne')}
+
+def _produire(arguments):
+    return produire_releve(*arguments)
+
+# ==================== GÉNÉRATION ====================
+def generer(donnees, liste_periodes, formats, dossier, processus=None):
+    """Relevés de toutes les périodes, répartis entre `processus` processus ; renvoie les synthèses"""
+    os.makedirs(dossier, exist_ok=True)
+    processus = processus or os.cpu_count() or 1
+    taches = [(periode, formats, dossier) for periode in liste_periodes]
+    if processus == 1 or len(taches) == 1:
+        _initialiser(donnees)
+        syntheses = [_produire(tache) for tache in taches]
+    else:
+        # fork : les processus héritent des données sans copie ni sérialisation
+        methodes = multiprocessing.get_all_start_methods()
+        contexte = multiprocessing.get_context('fork' if 'fork' in methodes else None)
+        with ProcessPoolExecutor(max_workers=min(processus, len(taches)), mp_context=contexte,
+                                 initializer=_initialiser, initargs=(donnees,)) as executeur:
+            syntheses = list(executeur.map(_produire, taches, chunksize=max(1, len(taches) // (processus * 4))))
+    pd.DataFrame(syntheses).to_csv(os.path.join(dossier, 'synthese.csv'), index=False, encoding='utf-8-sig')
+    return syntheses
+
+def main(arguments=None):
+    aujourd_hui = date.today()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--debut', default=f"{aujourd_hui.year}-01", help="premier mois (AAAA-MM) ou première année (AAAA)")
+    parser.add_argument('--fin', default=f"{aujourd_hui.year}-{aujourd_hui.month:02d}", help="dernier mois (AAAA-MM) ou dernière année (AAAA)")
+    parser.add_argument('--periodicite', choices=PERIODICITES, default='mois')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS_RAPPORT, default=['html'])
+    parser.add_argument('--sortie', default='releves', help="dossier des relevés")
+    parser.add_argument('--stockage', choices=list(MODES_STOCKAGE), default=os.environ.get('FINANCE_STOCKAGE', 'json'))
+    parser.add_argument('--donnees', default=DOSSIER_DONNEES, help="dossier des données")
+    parser.add_argument('--processus', type=int, default=None, help="nombre de processus (défaut : un par cœur)")
+    args = parser.parse_args(arguments)
+
+    liste_periodes = periodes(args.debut, args.fin, args.periodicite)
+    if not liste_periodes:
+        parser.error("aucune période entre --debut et --fin")
+
+    debut = time.perf_counter()
+    stockage = ouvrir_stockage(args.stockage, args.donnees)
+    try:
+        donnees = stockage.charger()
+    finally:
+        stockage.fermer()
+    # Occurrences des opérations récurrentes générées pour les seules périodes demandées
+    premier, dernier = bornes_periode(*liste_periodes[0][1:])[0], bornes_periode(*liste_periodes[-1][1:])[1]
+    donnees = avec_occurrences(donnees, premier, dernier)
+    syntheses = generer(donnees, liste_periodes, args.formats, args.sortie, args.processus)
+    print(f"✅ {len(syntheses)} relevé(s) écrit(s) dans {args.sortie}/ en {time.perf_counter() - debut:.1f} s", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Recherche plein texte : index inversé des mots, insensible aux accents et à la casse, par préfixe"""
+import bisect
+import copy
+import re
+import unicodedata
+from functools import lru_cache
+
+# ==================== CONFIGURATION ====================
+# Champs texte indexés de chaque collection
+CHAMPS_RECHERCHE = {
+    'revenus': ('description', 'client'),
+    'depenses': ('description', 'fournisseur'),
+    'epargne': ('objectif',),
+}
+MOT = re.compile(r'[a-z0-9]+')
+
+# ==================== MOTS ====================
+@lru_cache(maxsize=65536)
+def mots(texte):
+    """Mots d'un texte sans accents ni majuscules (« Électricité » → ('electricite',))"""
+    decompose = unicodedata.normalize('NFKD', texte.casefold())
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return tuple(MOT.findall(sans_accents))
+
+def mots_enregistrement(enregistrement, champs):
+    """Mots distincts des champs indexés d'un enregistrement"""
+    resultat = set()
+    for champ in champs:
+        valeur = enregistrement.get(champ)
+        if isinstance(valeur, str) and valeur:
+            resultat.update(mots(valeur))
+    return resultat
+
+def correspond(enregistrement, champs, termes):
+    """Chaque terme est-il le préfixe d'un mot de l'enregistrement ?"""
+    vocabulaire = mots_enregistrement(enregistrement, champs)
+    return all(any(mot.startswith(terme) for mot in vocabulaire) for terme in termes)
+
+# ==================== INDEX ====================
+class IndexTexte:
+    """Identifiants des enregistrements de chaque mot, et vocabulaire trié pour la recherche par préfixe
+
+    Tenu à jour à chaque ajout, modification ou suppression. Une copie
+    partage les ensembles et le vocabulaire de l'original ; ils sont
+    copiés à leur première modification, une fois par copie.
+    """
+
+    def __init__(self, enregistrements, champs, version):
+        self.version = version
+        self.champs = champs
+        self.postings = {}
+        for enregistrement in enregistrements:
+            for mot in mots_enregistrement(enregistrement, champs):
+                ids = self.postings.get(mot)
+                if ids is None:
+                    ids = self.postings[mot] = set()
+                ids.add(enregistrement['id'])
+        self.vocabulaire = sorted(self.postings)
+        # Index construit : ensembles et vocabulaire lui appartiennent
+        self._copies = None
+        self._vocabulaire_copie = True
+
+    def copie(self):
+        autre = copy.copy(self)
+        autre.postings = dict(self.postings)
+        # Mots dont l'ensemble a déjà été copié
+        autre._copies = set()
+        autre._vocabulaire_copie = False
+        return autre
+
+    def _ids(self, mot):
+        """Ensemble modifiable des identifiants d'un mot"""
+        if self._copies is not None and mot not in self._copies:
+            self._copies.add(mot)
+            if mot in self.postings:
+                self.postings[mot] = set(self.postings[mot])
+        ids = self.postings.get(mot)
+        if ids is None:
+            ids = self.postings[mot] = set()
+            self._modifier_vocabulaire(mot, True)
+        return ids
+
+    def _modifier_vocabulaire(self, mot, ajout):
+        if not self._vocabulaire_copie:
+            self.vocabulaire = list(self.vocabulaire)
+            self._vocabulaire_copie = True
+        i = bisect.bisect_left(self.vocabulaire, mot)
+        if ajout:
+            self.vocabulaire.insert(i, mot)
+        else:
+            del self.vocabulaire[i]
+
+    def mettre_a_jour(self, ancien, nouveau):
+        if ancien is not None:
+            for mot in mots_enregistrement(ancien, self.champs):
+                ids = self._ids(mot)
+                ids.discard(ancien['id'])
+                if not ids:
+                    del self.postings[mot]
+                    self._modifier_vocabulaire(mot, False)
+        if nouveau is not None:
+            for mot in mots_enregistrement(nouveau, self.champs):
+                self._ids(mot).add(nouveau['id'])
+
+    def prefixe(self, terme):
+        """Identifiants des enregistrements ayant un mot commençant par `terme`"""
+        i = bisect.bisect_left(self.vocabulaire, terme)
+        ensembles = []
+        while i < len(self.vocabulaire) and self.vocabulaire[i].startswith(terme):
+            ensembles.append(self.postings[self.vocabulaire[i]])
+            i += 1
+        if len(ensembles) == 1:
+            return ensembles[0]
+        return set().union(*ensembles)
+
+    def rechercher(self, requete):
+        """Identifiants des enregistrements contenant tous les termes de la requête (préfixes)"""
+        termes = mots(requete)
+        if not termes:
+            return set()
+        resultats = sorted((self.prefixe(terme) for terme in set(termes)), key=len)
+        # Intersection en partant du plus petit ensemble ; jamais l'ensemble partagé lui-même
+        ids = set(resultats[0])
+        for autres in resultats[1:]:
+            if not ids:
+                break
+            ids.intersection_update(autres)
+        return ids
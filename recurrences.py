@@ -0,0 +1,96 @@
+"""Opérations récurrentes : règles stockées une fois, occurrences générées à la demande pour une période
+
+Une règle (collection 'recurrences') décrit le modèle d'un revenu ou d'une
+dépense, sa fréquence et ses dates de début et de fin. Ses occurrences ne
+sont jamais stockées : elles sont calculées pour la seule période demandée.
+Une occurrence peut être modifiée ou ignorée individuellement : l'exception
+est conservée dans la règle, indexée par la date de l'occurrence.
+"""
+import numpy as np
+
+# ==================== CONFIGURATION ====================
+# Fréquence : (unité, pas en unités pour un intervalle de 1)
+FREQUENCES = {
+    'mensuelle': ('M', 1),
+    'hebdomadaire': ('D', 7),
+    'jours': ('D', 1),
+}
+# Identifiant d'une occurrence : <identifiant de la règle>@<date>
+SEPARATEUR_OCCURRENCE = '@'
+
+# ==================== DATES ====================
+def _bornes_rangs(premier, dernier, pas):
+    """Rangs k ≥ 0 tels que k × pas tombe entre premier et dernier (inclus), en unités depuis le début"""
+    return max(0, -(-premier // pas)), dernier // pas
+
+def dates_occurrences(regle, debut=None, fin=None):
+    """Dates (datetime64[D]) des occurrences de la règle entre debut et fin inclus
+
+    Fréquence mensuelle : même jour du mois que la date de début, ramené
+    au dernier jour des mois plus courts.
+    """
+    unite, pas = FREQUENCES[regle['frequence']]
+    pas *= int(regle.get('intervalle') or 1)
+    depart = np.datetime64(regle['date_debut'], 'D')
+    bas = depart if debut is None else max(depart, np.datetime64(debut, 'D'))
+    haut = np.datetime64(fin, 'D') if fin is not None else None
+    if regle.get('date_fin'):
+        fin_regle = np.datetime64(regle['date_fin'], 'D')
+        haut = fin_regle if haut is None else min(haut, fin_regle)
+    if haut is None:
+        raise ValueError("période sans fin pour une règle sans date de fin")
+    if haut < bas:
+        return np.empty(0, dtype='datetime64[D]')
+
+    if unite == 'D':
+        k_min, k_max = _bornes_rangs(int((bas - depart).astype(np.int64)), int((haut - depart).astype(np.int64)), pas)
+        return depart + np.arange(k_min, k_max + 1) * pas
+
+    mois_depart = depart.astype('datetime64[M]')
+    jour = int((depart - mois_depart.astype('datetime64[D]')).astype(np.int64))
+    k_min, k_max = _bornes_rangs(
+        int((bas.astype('datetime64[M]') - mois_depart).astype(np.int64)),
+        int((haut.astype('datetime64[M]') - mois_depart).astype(np.int64)),
+        pas,
+    )
+    mois = mois_depart + np.arange(k_min, k_max + 1) * pas
+    longueurs = ((mois + 1).astype('datetime64[D]') - mois.astype('datetime64[D]')).astype(np.int64)
+    dates = mois.astype('datetime64[D]') + np.minimum(jour, longueurs - 1)
+    return dates[(dates >= bas) & (dates <= haut)]
+
+# ==================== OCCURRENCES ====================
+def identifiant_occurrence(regle_id, jour):
+    return f"{regle_id}{SEPARATEUR_OCCURRENCE}{jour}"
+
+def lire_identifiant(id_):
+    """(identifiant de la règle, date AAAA-MM-JJ) d'une occurrence, None pour un enregistrement stocké"""
+    regle_id, separateur, jour = str(id_).rpartition(SEPARATEUR_OCCURRENCE)
+    return (regle_id, jour) if separateur else None
+
+def materialiser(regles, debut=None, fin=None):
+    """Enregistrements des occurrences des règles entre debut et fin, exceptions appliquées"""
+    occurrences = []
+    for regle in regles:
+        exceptions = regle.get('exceptions') or {}
+        for jour in dates_occurrences(regle, debut, fin).astype(str).tolist():
+            if jour in exceptions and exceptions[jour] is None:
+                # Occurrence ignorée
+                continue
+            occurrences.append({
+                **regle['modele'],
+                **(exceptions.get(jour) or {}),
+                'id': identifiant_occurrence(regle['id'], jour),
+                'date': jour,
+                'recurrence_id': regle['id'],
+            })
+    return occurrences
+
+def avec_occurrences(donnees, debut, fin):
+    """Copie des données dont revenus et dépenses incluent les occurrences entre debut et fin"""
+    donnees = dict(donnees)
+    for collection in ('revenus', 'depenses'):
+        regles = [r for r in donnees.get('recurrences', []) if r['collection'] == collection]
+        occurrences = materialiser(regles, debut, fin)
+        if occurrences:
+            donnees[collection] = list(donnees[collection]) + occurrences
+    return donnees
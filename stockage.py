@@ -0,0 +1,826 @@
+"""Persistance des données Finance Pro (fichiers JSON, journal d'écritures, SQLite, Parquet)"""
+import atexit
+import json
+import logging
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    # Décodeur de la bibliothèque standard, plus lent
+    orjson = None
+
+# ==================== CONFIGURATION ====================
+DOSSIER_DONNEES = 'data'
+COLLECTIONS = ('revenus', 'depenses', 'recurrences', 'epargne', 'objectifs', 'prets', 'remboursements', 'projets', 'clients')
+
+# Nombre de lignes de journal au-delà duquel une compaction est lancée
+SEUIL_COMPACTION = 2000
+
+# ==================== UTILITAIRES ====================
+def decoder_json(octets):
+    """Décoder du JSON (octets UTF-8 ou texte), avec orjson s'il est installé"""
+    return orjson.loads(octets) if orjson is not None else json.loads(octets)
+
+def encoder_json(contenu, indent=None):
+    """Encoder en octets UTF-8 : indenté de 2 espaces, ou compact si indent est None"""
+    if orjson is not None and indent in (None, 2):
+        options = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(contenu, option=options)
+    separateurs = None if indent else (',', ':')
+    return json.dumps(contenu, ensure_ascii=False, indent=indent, separators=separateurs).encode('utf-8')
+
+def lire_json(chemin):
+    """Lire une liste JSON, liste vide si le fichier est absent ou illisible"""
+    if not os.path.exists(chemin):
+        return []
+    try:
+        with open(chemin, 'rb') as f:
+            return decoder_json(f.read())
+    except (OSError, ValueError):
+        return []
+
+def ecrire_json(chemin, contenu, indent=2):
+    """Écrire un fichier JSON de façon atomique (fichier temporaire + renommage)"""
+    tmp = chemin + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(encoder_json(contenu, indent))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, chemin)
+
+def nouvel_id():
+    """Identifiant unique et stable d'un enregistrement"""
+    return uuid.uuid4().hex[:16]
+
+def nouveaux_ids(nombre):
+    """`nombre` identifiants au format de nouvel_id(), tirés en une fois"""
+    hexa = os.urandom(8 * nombre).hex()
+    return [hexa[i:i + 16] for i in range(0, 16 * nombre, 16)]
+
+def attribuer_ids(donnees):
+    """Donner un identifiant aux enregistrements qui n'en ont pas ; renvoie le nombre attribué"""
+    attribues = 0
+    for col in COLLECTIONS:
+        liste = donnees[col]
+        for pos, enregistrement in enumerate(liste):
+            if 'id' not in enregistrement:
+                liste[pos] = {'id': nouvel_id(), **enregistrement}
+                attribues += 1
+    return attribues
+
+def indexer_positions(liste):
+    """Table {id: position} d'une liste d'enregistrements"""
+    return {enregistrement['id']: pos for pos, enregistrement in enumerate(liste) if 'id' in enregistrement}
+
+def appliquer_mutation(donnees, mutation, positions=None, annulation=None):
+    """Appliquer une mutation (ajout, suppression, modification) aux listes en mémoire
+
+    `positions` est la table {id: position} de la collection, tenue à jour
+    (recalculée si elle n'est pas fournie). Une suppression met le dernier
+    enregistrement à la place de celui retiré : O(1) par identifiant.
+    Chaque changement est noté dans `annulation` si elle est fournie, pour
+    annuler_mutations().
+    """
+    col = mutation['col']
+    liste = donnees[col]
+    op = mutation['op']
+    if positions is None:
+        positions = indexer_positions(liste)
+    if annulation is None:
+        annulation = []
+    if op == 'ajout':
+        if 'id' in mutation['rec']:
+            positions[mutation['rec']['id']] = len(liste)
+        liste.append(mutation['rec'])
+        annulation.append((col, 'ajout', None, None))
+    elif op == 'suppression':
+        for id_ in mutation['ids']:
+            pos = positions.pop(id_, None)
+            if pos is None:
+                continue
+            dernier = liste.pop()
+            retire = dernier
+            if pos < len(liste):
+                retire = liste[pos]
+                liste[pos] = dernier
+                positions[dernier['id']] = pos
+            annulation.append((col, 'suppression', pos, retire))
+    elif op == 'modification':
+        pos = positions[mutation['rec']['id']]
+        annulation.append((col, 'modification', pos, liste[pos]))
+        liste[pos] = mutation['rec']
+    else:
+        raise ValueError(f"Mutation inconnue : {op}")
+
+def annuler_mutations(donnees, positions, annulation):
+    """Défaire, du dernier au premier, les changements notés par appliquer_mutation()
+
+    `positions` est la table {collection: {id: position}}. Listes et
+    positions retrouvent exactement leur état d'avant, ordre compris.
+    """
+    for col, op, pos, ancien in reversed(annulation):
+        liste, table = donnees[col], positions[col]
+        if op == 'ajout':
+            rec = liste.pop()
+            if 'id' in rec:
+                table.pop(rec['id'], None)
+        elif op == 'modification':
+            liste[pos] = ancien
+        else:
+            if pos < len(liste):
+                # Le dernier enregistrement avait pris la place de celui retiré
+                deplace = liste[pos]
+                table[deplace['id']] = len(liste)
+                liste.append(deplace)
+                liste[pos] = ancien
+            else:
+                liste.append(ancien)
+            table[ancien['id']] = pos
+
+def regrouper_ajouts(mutations):
+    """Découper un lot en suites d'ajouts consécutifs sur une même collection
+
+    Produit (col, [enregistrements]) pour chaque suite d'ajouts et
+    (None, mutation) pour les autres mutations, dans l'ordre du lot.
+    """
+    col_suite, suite = None, []
+    for mutation in mutations:
+        if mutation['op'] == 'ajout' and mutation['col'] == col_suite:
+            suite.append(mutation['rec'])
+            continue
+        if suite:
+            yield col_suite, suite
+        col_suite, suite = None, []
+        if mutation['op'] == 'ajout':
+            col_suite, suite = mutation['col'], [mutation['rec']]
+        else:
+            yield None, mutation
+    if suite:
+        yield col_suite, suite
+
+def rejouer(donnees, mutations):
+    """Appliquer une suite de mutations en gardant une table de positions par collection"""
+    positions = {col: indexer_positions(donnees[col]) for col in COLLECTIONS}
+    for mutation in mutations:
+        appliquer_mutation(donnees, mutation, positions[mutation['col']])
+
+# ==================== INTERFACE ====================
+class Stockage:
+    """Interface commune des modes de stockage
+
+    charger() renvoie {collection: liste d'enregistrements}, sauvegarder()
+    réécrit tout et enregistrer() persiste une seule mutation déjà appliquée
+    à `donnees`. Les stockages qui savent filtrer eux-mêmes (supporte_requetes)
+    lisent aussi les revenus et dépenses d'une période (lire_periode).
+    """
+    supporte_requetes = False
+
+    def charger(self):
+        raise NotImplementedError
+
+    def sauvegarder(self, donnees):
+        raise NotImplementedError
+
+    def enregistrer(self, mutation, donnees):
+        raise NotImplementedError
+
+    def enregistrer_lot(self, mutations, donnees):
+        """Persister plusieurs mutations d'un coup (par défaut une à une)"""
+        for mutation in mutations:
+            self.enregistrer(mutation, donnees)
+
+    def reecrit_collection(self, collection):
+        """Vrai si enregistrer() relit toute la collection dans `donnees`"""
+        return False
+
+    def lire_periode(self, collection, debut, fin):
+        """Enregistrements de `collection` datés entre debut et fin inclus (DataFrame)"""
+        raise NotImplementedError
+
+    def fermer(self):
+        pass
+
+# ==================== STOCKAGE JSON ====================
+class StockageJSON(Stockage):
+    """Un fichier JSON par collection (data/revenus.json, data/depenses.json...)"""
+
+    def __init__(self, dossier=DOSSIER_DONNEES):
+        self.dossier = dossier
+        os.makedirs(dossier, exist_ok=True)
+
+    def chemin(self, collection):
+        return os.path.join(self.dossier, f'{collection}.json')
+
+    def charger(self):
+        return {col: lire_json(self.chemin(col)) for col in COLLECTIONS}
+
+    def sauvegarder(self, donnees):
+        for col in COLLECTIONS:
+            ecrire_json(self.chemin(col), donnees[col])
+
+    def enregistrer(self, mutation, donnees):
+        # Seule la collection modifiée est réécrite
+        col = mutation['col']
+        ecrire_json(self.chemin(col), donnees[col])
+
+    def enregistrer_lot(self, mutations, donnees):
+        # Chaque collection touchée n'est réécrite qu'une fois
+        for col in dict.fromkeys(m['col'] for m in mutations):
+            ecrire_json(self.chemin(col), donnees[col])
+
+    def reecrit_collection(self, collection):
+        return True
+
+# ==================== STOCKAGE JOURNAL ====================
+class StockageJournal(StockageJSON):
+    """Fichiers JSON complétés par un journal d'écritures en ajout seul
+
+    Chaque mutation est ajoutée comme une ligne JSON compacte dans
+    data/journal.jsonl. Au chargement, les fichiers JSON sont lus puis le
+    journal est rejoué. Une compaction en arrière-plan replie le journal
+    dans les fichiers JSON : les fichiers sont d'abord écrits en .tmp, puis
+    data/compaction.json enregistre le dernier numéro replié avant les
+    renommages, ce qui permet de terminer une compaction interrompue.
+    """
+
+    def __init__(self, dossier=DOSSIER_DONNEES, seuil_compaction=SEUIL_COMPACTION):
+        super().__init__(dossier)
+        self.seuil_compaction = seuil_compaction
+        self.chemin_journal = os.path.join(dossier, 'journal.jsonl')
+        self.chemin_marqueur = os.path.join(dossier, 'compaction.json')
+        self._verrou = threading.Lock()
+        self._verrou_compaction = threading.Lock()
+        self._compaction_en_cours = False
+        self._fichier = None
+        with self._verrou_compaction:
+            self._reprendre_compaction()
+            mutations = self._lire_journal()
+        self._seq = max((m['seq'] for m in mutations), default=0)
+        self._taille = len(mutations)
+        if self._fichier is None:
+            self._fichier = open(self.chemin_journal, 'ab')
+
+    def _lire_journal(self):
+        mutations = []
+        if not os.path.exists(self.chemin_journal):
+            return mutations
+        with open(self.chemin_journal, 'rb') as f:
+            for ligne in f:
+                try:
+                    mutations.append(decoder_json(ligne))
+                except ValueError:
+                    # Dernière ligne tronquée par un arrêt brutal
+                    continue
+        return mutations
+
+    def _reprendre_compaction(self):
+        """Terminer une compaction interrompue ou nettoyer ses fichiers temporaires"""
+        if os.path.exists(self.chemin_marqueur):
+            with open(self.chemin_marqueur, 'rb') as f:
+                seq_limite = decoder_json(f.read())['seq']
+            self._finaliser_compaction(seq_limite)
+        else:
+            for col in COLLECTIONS:
+                if os.path.exists(self.chemin(col) + '.tmp'):
+                    os.remove(self.chemin(col) + '.tmp')
+
+    def charger(self):
+        with self._verrou_compaction:
+            donnees = super().charger()
+            with self._verrou:
+                self._fichier.flush()
+                mutations = self._lire_journal()
+        rejouer(donnees, mutations)
+        return donnees
+
+    def enregistrer(self, mutation, donnees):
+        self.enregistrer_lot([mutation], donnees)
+
+    def enregistrer_lot(self, mutations, donnees):
+        # Toutes les lignes du lot sont écrites avant un seul fsync
+        with self._verrou:
+            for mutation in mutations:
+                self._seq += 1
+                self._fichier.write(encoder_json({'seq': self._seq, **mutation}) + b'\n')
+            self._fichier.flush()
+            os.fsync(self._fichier.fileno())
+            self._taille += len(mutations)
+            lancer = self._taille >= self.seuil_compaction and not self._compaction_en_cours
+            if lancer:
+                self._compaction_en_cours = True
+        if lancer:
+            threading.Thread(target=self.compacter, daemon=True).start()
+
+    def reecrit_collection(self, collection):
+        return False
+
+    def sauvegarder(self, donnees):
+        with self._verrou_compaction:
+            with self._verrou:
+                seq_limite = self._seq
+            self._replier(donnees, seq_limite)
+
+    def compacter(self):
+        """Replier le journal dans les fichiers JSON"""
+        try:
+            with self._verrou_compaction:
+                with self._verrou:
+                    if self._fichier is None:
+                        # Stockage fermé entre-temps
+                        return
+                    seq_limite = self._seq
+                    self._fichier.flush()
+                    mutations = self._lire_journal()
+                donnees = super().charger()
+                rejouer(donnees, [m for m in mutations if m['seq'] <= seq_limite])
+                self._replier(donnees, seq_limite)
+        finally:
+            self._compaction_en_cours = False
+
+    def _replier(self, donnees, seq_limite):
+        # Appelé avec self._verrou_compaction déjà acquis
+        for col in COLLECTIONS:
+            chemin_tmp = self.chemin(col) + '.tmp'
+            with open(chemin_tmp, 'wb') as f:
+                f.write(encoder_json(donnees[col], indent=2))
+                f.flush()
+                os.fsync(f.fileno())
+        ecrire_json(self.chemin_marqueur, {'seq': seq_limite})
+        self._finaliser_compaction(seq_limite)
+
+    def _finaliser_compaction(self, seq_limite):
+        for col in COLLECTIONS:
+            if os.path.exists(self.chemin(col) + '.tmp'):
+                os.replace(self.chemin(col) + '.tmp', self.chemin(col))
+        with self._verrou:
+            if self._fichier is not None:
+                self._fichier.flush()
+            restantes = [m for m in self._lire_journal() if m['seq'] > seq_limite]
+            self._reecrire_journal(restantes)
+        os.remove(self.chemin_marqueur)
+
+    def _reecrire_journal(self, mutations):
+        # Appelé avec self._verrou déjà acquis
+        if self._fichier is not None:
+            self._fichier.close()
+        tmp = self.chemin_journal + '.tmp'
+        with open(tmp, 'wb') as f:
+            for mutation in mutations:
+                f.write(encoder_json(mutation) + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.chemin_journal)
+        self._taille = len(mutations)
+        self._fichier = open(self.chemin_journal, 'ab')
+
+    def fermer(self):
+        # Une compaction en cours se termine avant la fermeture
+        with self._verrou_compaction, self._verrou:
+            if self._fichier is not None:
+                self._fichier.close()
+                self._fichier = None
+
+# ==================== STOCKAGE SQLITE ====================
+# Colonnes typées des collections interrogées par période ; les autres
+# collections sont stockées telles quelles en JSON.
+COLONNES_TYPEES = {
+    'revenus': ('id', 'date', 'type_revenu', 'client', 'montant', 'description'),
+    'depenses': ('id', 'date', 'type_depense', 'montant', 'fournisseur', 'description'),
+}
+COLONNE_CATEGORIE = {'revenus': 'type_revenu', 'depenses': 'type_depense'}
+INDEX_SQL = {
+    'revenus': ('date', 'type_revenu', 'client'),
+    'depenses': ('date', 'type_depense', 'fournisseur'),
+}
+
+class StockageSQLite(Stockage):
+    """Base SQLite data/finance.db, avec index sur date, catégorie, client et fournisseur
+
+    À la première ouverture, les fichiers data/*.json existants sont importés
+    en une seule transaction.
+    """
+    supporte_requetes = True
+
+    def __init__(self, dossier=DOSSIER_DONNEES):
+        os.makedirs(dossier, exist_ok=True)
+        self.dossier = dossier
+        self._verrou = threading.Lock()
+        # Connexion partagée entre les threads des sessions, protégée par le verrou
+        self._cnx = sqlite3.connect(os.path.join(dossier, 'finance.db'), check_same_thread=False)
+        self._cnx.execute('PRAGMA journal_mode=WAL')
+        self._cnx.execute('PRAGMA synchronous=NORMAL')
+        self._creer_schema()
+        if self._lire_meta('migration_json') is None:
+            self.sauvegarder(StockageJSON(dossier).charger())
+            with self._verrou, self._cnx:
+                self._cnx.execute("INSERT OR REPLACE INTO meta VALUES ('migration_json', '1')")
+
+    def _creer_schema(self):
+        with self._verrou, self._cnx:
+            self._cnx.execute('CREATE TABLE IF NOT EXISTS meta (cle TEXT PRIMARY KEY, valeur TEXT)')
+            for col in COLLECTIONS:
+                if col in COLONNES_TYPEES:
+                    colonnes = ', '.join(
+                        f'{c} REAL' if c == 'montant' else f'{c} TEXT' for c in COLONNES_TYPEES[col]
+                    )
+                    self._cnx.execute(f'CREATE TABLE IF NOT EXISTS {col} ({colonnes}, extra TEXT)')
+                    for c in INDEX_SQL[col]:
+                        self._cnx.execute(f'CREATE INDEX IF NOT EXISTS idx_{col}_{c} ON {col} ({c})')
+                else:
+                    self._cnx.execute(f'CREATE TABLE IF NOT EXISTS {col} (id TEXT, rec TEXT NOT NULL)')
+                self._cnx.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{col}_id ON {col} (id)')
+
+    def _lire_meta(self, cle):
+        with self._verrou:
+            ligne = self._cnx.execute('SELECT valeur FROM meta WHERE cle = ?', (cle,)).fetchone()
+        return ligne[0] if ligne else None
+
+    def _vers_ligne(self, collection, enregistrement):
+        colonnes = COLONNES_TYPEES.get(collection)
+        if colonnes is None:
+            return (enregistrement.get('id'), json.dumps(enregistrement, ensure_ascii=False))
+        extra = {k: v for k, v in enregistrement.items() if k not in colonnes}
+        return (*[enregistrement.get(c) for c in colonnes],
+                json.dumps(extra, ensure_ascii=False) if extra else None)
+
+    def _depuis_ligne(self, collection, ligne):
+        colonnes = COLONNES_TYPEES.get(collection)
+        if colonnes is None:
+            return decoder_json(ligne[1])
+        enregistrement = dict(zip(colonnes, ligne[:-1]))
+        if enregistrement['id'] is None:
+            del enregistrement['id']
+        if ligne[-1]:
+            enregistrement.update(decoder_json(ligne[-1]))
+        return enregistrement
+
+    def _colonnes(self, collection):
+        colonnes = COLONNES_TYPEES.get(collection)
+        return ('id', 'rec') if colonnes is None else (*colonnes, 'extra')
+
+    def _inserer(self, collection, lignes, remplacer=False):
+        marques = ', '.join('?' * len(self._colonnes(collection)))
+        ordre = 'INSERT OR REPLACE' if remplacer else 'INSERT'
+        self._cnx.executemany(f'{ordre} INTO {collection} VALUES ({marques})', lignes)
+
+    def charger(self):
+        donnees = {}
+        with self._verrou:
+            for col in COLLECTIONS:
+                curseur = self._cnx.execute(f"SELECT {', '.join(self._colonnes(col))} FROM {col} ORDER BY rowid")
+                donnees[col] = [self._depuis_ligne(col, ligne) for ligne in curseur]
+        return donnees
+
+    def sauvegarder(self, donnees):
+        with self._verrou, self._cnx:
+            for col in COLLECTIONS:
+                self._cnx.execute(f'DELETE FROM {col}')
+                self._inserer(col, (self._vers_ligne(col, rec) for rec in donnees[col]))
+
+    def enregistrer(self, mutation, donnees):
+        self.enregistrer_lot([mutation], donnees)
+
+    def enregistrer_lot(self, mutations, donnees):
+        # Une seule transaction pour tout le lot, un executemany par suite d'ajouts
+        with self._verrou, self._cnx:
+            for col_ajouts, mutation in regrouper_ajouts(mutations):
+                if col_ajouts is not None:
+                    self._inserer(col_ajouts, [self._vers_ligne(col_ajouts, rec) for rec in mutation])
+                    continue
+                col = mutation['col']
+                op = mutation['op']
+                if op == 'suppression':
+                    self._cnx.executemany(f'DELETE FROM {col} WHERE id = ?', [(id_,) for id_ in mutation['ids']])
+                elif op == 'modification':
+                    self._inserer(col, [self._vers_ligne(col, mutation['rec'])], remplacer=True)
+
+    def lire_periode(self, collection, debut, fin):
+        colonnes = COLONNES_TYPEES[collection]
+        with self._verrou:
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(colonnes)} FROM {collection} WHERE date BETWEEN ? AND ?",
+                self._cnx, params=(str(debut), str(fin))
+            )
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def fermer(self):
+        with self._verrou:
+            self._cnx.close()
+
+# ==================== STOCKAGE PARQUET ====================
+# Nombre de partitions gardées en mémoire après lecture
+TAILLE_CACHE_PARTITIONS = 24
+
+class StockageParquet(StockageJSON):
+    """Revenus et dépenses en partitions Parquet par mois, autres collections en JSON
+
+    data/parquet/<collection>/annee=AAAA/mois=MM/part.parquet contient les
+    enregistrements du mois, colonnes typées (date datetime64, catégorie
+    category, montant float). Une requête sur un mois ne lit qu'une partition
+    et une mutation ne réécrit que les partitions concernées. Les fichiers
+    data/*.json sont importés à la première ouverture.
+    """
+    supporte_requetes = True
+
+    def __init__(self, dossier=DOSSIER_DONNEES):
+        super().__init__(dossier)
+        self.racine = os.path.join(dossier, 'parquet')
+        self._verrou = threading.Lock()
+        # Mois ('AAAA-MM') de la partition de chaque identifiant
+        self._partitions = {col: {} for col in COLONNES_TYPEES}
+        # Dernières partitions lues, invalidées à chaque réécriture
+        self._cache = OrderedDict()
+        if not os.path.exists(self.racine):
+            self.sauvegarder(StockageJSON.charger(self))
+
+    def _chemin_partition(self, collection, cle):
+        annee, mois = cle.split('-')
+        return os.path.join(self.racine, collection, f'annee={annee}', f'mois={mois}', 'part.parquet')
+
+    def _cles(self, collection):
+        dossier = os.path.join(self.racine, collection)
+        if not os.path.exists(dossier):
+            return []
+        cles = []
+        for rep_annee in os.listdir(dossier):
+            for rep_mois in os.listdir(os.path.join(dossier, rep_annee)):
+                cle = f"{rep_annee.split('=')[1]}-{rep_mois.split('=')[1]}"
+                if os.path.exists(self._chemin_partition(collection, cle)):
+                    cles.append(cle)
+        return sorted(cles)
+
+    def _vers_df(self, collection, enregistrements):
+        colonnes = COLONNES_TYPEES[collection]
+        df = pd.DataFrame({c: [r.get(c) for r in enregistrements] for c in colonnes})
+        extras = ({k: v for k, v in r.items() if k not in colonnes} for r in enregistrements)
+        df['id'] = df['id'].astype(object)
+        df['extra'] = [json.dumps(e, ensure_ascii=False) if e else None for e in extras]
+        df['date'] = pd.to_datetime(df['date'])
+        df['montant'] = df['montant'].astype(float)
+        df[COLONNE_CATEGORIE[collection]] = df[COLONNE_CATEGORIE[collection]].astype('category')
+        return df
+
+    def _depuis_df(self, df):
+        df = df.assign(date=df['date'].dt.strftime('%Y-%m-%d')).astype(object)
+        df = df.where(df.notna(), None)
+        enregistrements = []
+        for enregistrement in df.to_dict('records'):
+            extra = enregistrement.pop('extra')
+            if enregistrement.get('id') is None:
+                enregistrement.pop('id', None)
+            if extra:
+                enregistrement.update(decoder_json(extra))
+            enregistrements.append(enregistrement)
+        return enregistrements
+
+    def _lire_partition(self, collection, cle, colonnes=None):
+        if (collection, cle) not in self._cache:
+            chemin = self._chemin_partition(collection, cle)
+            if not os.path.exists(chemin):
+                return None
+            self._cache[(collection, cle)] = pd.read_parquet(chemin)
+            if len(self._cache) > TAILLE_CACHE_PARTITIONS:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end((collection, cle))
+        df = self._cache[(collection, cle)]
+        return df if colonnes is None else df[colonnes]
+
+    def _ecrire_partition(self, collection, cle, df):
+        self._cache.pop((collection, cle), None)
+        chemin = self._chemin_partition(collection, cle)
+        if df.empty:
+            if os.path.exists(chemin):
+                os.remove(chemin)
+                # Retirer les dossiers mois/année devenus vides
+                rep_mois = os.path.dirname(chemin)
+                os.rmdir(rep_mois)
+                if not os.listdir(os.path.dirname(rep_mois)):
+                    os.rmdir(os.path.dirname(rep_mois))
+            return
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        df = df.reset_index(drop=True)
+        categorie = COLONNE_CATEGORIE[collection]
+        df[categorie] = df[categorie].astype('category').cat.remove_unused_categories()
+        df.to_parquet(chemin + '.tmp', index=False)
+        os.replace(chemin + '.tmp', chemin)
+
+    def _ajouter_lignes(self, collection, enregistrements):
+        par_mois = {}
+        for enregistrement in enregistrements:
+            par_mois.setdefault(enregistrement['date'][:7], []).append(enregistrement)
+        for cle, groupe in par_mois.items():
+            df = self._lire_partition(collection, cle)
+            lignes = self._vers_df(collection, groupe)
+            self._ecrire_partition(collection, cle, lignes if df is None else pd.concat([df, lignes], ignore_index=True))
+            for enregistrement in groupe:
+                self._partitions[collection][enregistrement['id']] = cle
+
+    def _retirer_lignes(self, collection, ids):
+        par_mois = {}
+        for id_ in ids:
+            cle = self._partitions[collection].pop(id_, None)
+            if cle is not None:
+                par_mois.setdefault(cle, set()).add(id_)
+        for cle, groupe in par_mois.items():
+            df = self._lire_partition(collection, cle)
+            self._ecrire_partition(collection, cle, df[~df['id'].isin(groupe)])
+
+    def charger(self):
+        donnees = super().charger()
+        with self._verrou:
+            for col in COLONNES_TYPEES:
+                donnees[col] = []
+                self._partitions[col] = {}
+                for cle in self._cles(col):
+                    enregistrements = self._depuis_df(self._lire_partition(col, cle))
+                    donnees[col].extend(enregistrements)
+                    self._partitions[col].update((r['id'], cle) for r in enregistrements if 'id' in r)
+        return donnees
+
+    def sauvegarder(self, donnees):
+        with self._verrou:
+            for col in COLLECTIONS:
+                if col not in COLONNES_TYPEES:
+                    ecrire_json(self.chemin(col), donnees[col])
+                    continue
+                shutil.rmtree(os.path.join(self.racine, col), ignore_errors=True)
+                cles = [r['date'][:7] for r in donnees[col]]
+                self._partitions[col] = {r['id']: cle for r, cle in zip(donnees[col], cles) if 'id' in r}
+                df = self._vers_df(col, donnees[col])
+                for cle, partition in df.groupby(pd.Index(cles), sort=True):
+                    self._ecrire_partition(col, cle, partition)
+
+    def enregistrer(self, mutation, donnees):
+        col = mutation['col']
+        if col not in COLONNES_TYPEES:
+            super().enregistrer(mutation, donnees)
+            return
+        with self._verrou:
+            if mutation['op'] == 'ajout':
+                self._ajouter_lignes(col, [mutation['rec']])
+            elif mutation['op'] == 'suppression':
+                self._retirer_lignes(col, mutation['ids'])
+            elif mutation['op'] == 'modification':
+                self._retirer_lignes(col, [mutation['rec']['id']])
+                self._ajouter_lignes(col, [mutation['rec']])
+
+    def enregistrer_lot(self, mutations, donnees):
+        typees = [m for m in mutations if m['col'] in COLONNES_TYPEES]
+        super().enregistrer_lot([m for m in mutations if m['col'] not in COLONNES_TYPEES], donnees)
+        # Une suite d'ajouts ne réécrit chaque partition touchée qu'une fois
+        for col_ajouts, mutation in regrouper_ajouts(typees):
+            if col_ajouts is not None:
+                with self._verrou:
+                    self._ajouter_lignes(col_ajouts, mutation)
+            else:
+                self.enregistrer(mutation, donnees)
+
+    def reecrit_collection(self, collection):
+        return collection not in COLONNES_TYPEES
+
+    def _lire_plage(self, collection, debut, fin, colonnes):
+        # Seules les partitions des mois couverts par [debut, fin] sont lues
+        mois = pd.period_range(pd.Timestamp(debut), pd.Timestamp(fin), freq='M')
+        with self._verrou:
+            morceaux = [self._lire_partition(collection, str(m), colonnes) for m in mois]
+        morceaux = [m for m in morceaux if m is not None]
+        if not morceaux:
+            return self._vers_df(collection, [])[colonnes]
+        df = pd.concat(morceaux, ignore_index=True) if len(morceaux) > 1 else morceaux[0]
+        return df[(df['date'] >= pd.Timestamp(debut)) & (df['date'] < pd.Timestamp(fin) + pd.Timedelta(days=1))]
+
+    def lire_periode(self, collection, debut, fin):
+        return self._lire_plage(collection, debut, fin, list(COLONNES_TYPEES[collection]))
+
+# ==================== ÉCRITURE DIFFÉRÉE ====================
+# Temps laissé aux mutations suivantes pour rejoindre le même lot (secondes)
+DELAI_REGROUPEMENT = 0.05
+
+class PersistanceDifferee(Stockage):
+    """Stockage dont les mutations sont persistées par un thread d'écriture
+
+    enregistrer() ne fait que mettre la mutation en file : l'interface rend la
+    main tout de suite. Le thread regroupe les mutations arrivées ensemble et
+    les confie au stockage sous-jacent en une seule écriture (un fichier
+    réécrit une fois, un fsync, une transaction). Les lectures et sauvegardes
+    complètes attendent que la file soit vide, et la file est vidée à l'arrêt
+    du processus.
+    """
+
+    def __init__(self, stockage, delai=DELAI_REGROUPEMENT):
+        self.stockage = stockage
+        self.delai = delai
+        self.derniere_erreur = None
+        self._file = queue.Queue()
+        # Un seul écrivain à la fois sur le stockage sous-jacent
+        self._verrou_ecriture = threading.Lock()
+        self._ouvert = True
+        self._thread = threading.Thread(target=self._ecrire_en_continu, name='persistance', daemon=True)
+        self._thread.start()
+        atexit.register(self.fermer)
+
+    @property
+    def supporte_requetes(self):
+        return self.stockage.supporte_requetes
+
+    def enregistrer(self, mutation, donnees):
+        self.enregistrer_lot([mutation], donnees)
+
+    def enregistrer_lot(self, mutations, donnees):
+        # Copie des listes (pas des enregistrements, jamais modifiés sur place)
+        # pour les stockages qui réécrivent la collection entière
+        copies = {
+            col: list(donnees[col])
+            for col in dict.fromkeys(m['col'] for m in mutations)
+            if self.stockage.reecrit_collection(col)
+        }
+        self._file.put((mutations, copies))
+
+    def _ecrire_en_continu(self):
+        while True:
+            lot = [self._file.get()]
+            if lot[0] is None:
+                self._file.task_done()
+                return
+            time.sleep(self.delai)
+            while True:
+                try:
+                    lot.append(self._file.get_nowait())
+                except queue.Empty:
+                    break
+            arret = lot[-1] is None
+            if arret:
+                lot.pop()
+            self._ecrire_lot(lot)
+            for _ in range(len(lot) + arret):
+                self._file.task_done()
+            if arret:
+                return
+
+    def _ecrire_lot(self, lot):
+        mutations = [mutation for groupe, _ in lot for mutation in groupe]
+        # La dernière copie de chaque collection contient toutes les mutations du lot
+        donnees = {}
+        for _, copies in lot:
+            donnees.update(copies)
+        try:
+            with self._verrou_ecriture:
+                self.stockage.enregistrer_lot(mutations, donnees)
+            self.derniere_erreur = None
+        except Exception as erreur:
+            self.derniere_erreur = erreur
+            logging.getLogger(__name__).exception("Échec de l'écriture de %d mutation(s)", len(mutations))
+
+    def vider(self):
+        """Attendre que toutes les mutations en file soient écrites"""
+        self._file.join()
+
+    def charger(self):
+        self.vider()
+        return self.stockage.charger()
+
+    def sauvegarder(self, donnees):
+        self.vider()
+        with self._verrou_ecriture:
+            self.stockage.sauvegarder(donnees)
+
+    def lire_periode(self, collection, debut, fin):
+        self.vider()
+        return self.stockage.lire_periode(collection, debut, fin)
+
+    def fermer(self):
+        if not self._ouvert:
+            return
+        self._ouvert = False
+        self._file.put(None)
+        self._thread.join()
+        self.stockage.fermer()
+
+# ==================== FABRIQUE ====================
+MODES_STOCKAGE = {
+    'json': StockageJSON,
+    'journal': StockageJournal,
+    'sqlite': StockageSQLite,
+    'parquet': StockageParquet,
+}
+
+def ouvrir_stockage(mode='json', dossier=DOSSIER_DONNEES, differe=False):
+    """Créer le stockage correspondant au mode demandé
+
+    Avec `differe`, les mutations sont persistées en arrière-plan par lots.
+    """
+    if mode not in MODES_STOCKAGE:
+        raise ValueError(f"Mode de stockage inconnu : {mode} (choix : {', '.join(MODES_STOCKAGE)})")
+    stockage = MODES_STOCKAGE[mode](dossier)
+    return PersistanceDifferee(stockage) if differe else stockage
@@ -0,0 +1,90 @@
+"""Grand livre : isolement des demandes d'un même lot"""
+import threading
+
+import pytest
+
+from grand_livre import GrandLivre
+from stockage import ouvrir_stockage
+
+
+def soumettre_en_fond(livre, mutations, resultats, cle):
+    def tache():
+        try:
+            resultats[cle] = livre.soumettre(mutations)
+        except Exception as erreur:
+            resultats[cle] = erreur
+    thread = threading.Thread(target=tache)
+    thread.start()
+    return thread
+
+
+def soumettre_en_lot(livre, *demandes):
+    """Soumettre `demandes` pendant que le rédacteur est occupé : elles forment un seul lot"""
+    occupe, liberer = threading.Event(), threading.Event()
+
+    def bloquer(etat):
+        occupe.set()
+        liberer.wait(5)
+        return []
+
+    resultats = {}
+    threads = [soumettre_en_fond(livre, [{'op': 'calcul', 'fonction': bloquer}], resultats, 'blocage')]
+    occupe.wait(5)
+    for i, mutations in enumerate(demandes):
+        threads.append(soumettre_en_fond(livre, mutations, resultats, i))
+        while livre._file.qsize() <= i:
+            threading.Event().wait(0.01)
+    liberer.set()
+    for thread in threads:
+        thread.join(5)
+    return [resultats[i] for i in range(len(demandes))]
+
+
+@pytest.fixture
+def livre(tmp_path):
+    livre = GrandLivre(ouvrir_stockage('json', str(tmp_path)))
+    livre.soumettre([{'op': 'ajout', 'col': 'revenus', 'rec': {'id': 'r1', 'montant': 100}}])
+    yield livre
+    livre.fermer()
+
+
+def test_calcul_en_echec_ne_rejette_pas_le_lot(livre):
+    def diviser(etat):
+        return [{'op': 'modification', 'col': 'revenus', 'rec': {'id': 'r1', 'montant': 1 / 0}}]
+
+    echec, succes = soumettre_en_lot(
+        livre,
+        [{'op': 'calcul', 'fonction': diviser}],
+        [{'op': 'ajout', 'col': 'revenus', 'rec': {'id': 'r2', 'montant': 50}}],
+    )
+    assert isinstance(echec, ZeroDivisionError)
+    assert succes['revenus'] == [{'id': 'r1', 'montant': 100}, {'id': 'r2', 'montant': 50}]
+    assert livre.instantane() is succes
+
+
+def test_demande_interrompue_annulee_en_entier(livre):
+    succes, echec = soumettre_en_lot(
+        livre,
+        [{'op': 'ajout', 'col': 'revenus', 'rec': {'id': 'r3', 'montant': 20}}],
+        [{'op': 'ajout', 'col': 'revenus', 'rec': {'id': 'r2', 'montant': 50}},
+         {'op': 'suppression', 'col': 'revenus', 'ids': ['r1']},
+         {'op': 'modification', 'col': 'revenus', 'rec': {'id': 'r3', 'montant': 0}},
+         {'op': 'fusion', 'col': 'revenus', 'rec': {'id': 'r2'}}],
+    )
+    assert isinstance(echec, ValueError)
+    instantane = livre.instantane()
+    assert instantane is succes
+    assert instantane['revenus'] == [{'id': 'r1', 'montant': 100}, {'id': 'r3', 'montant': 20}]
+    assert instantane.positions['revenus'] == {'r1': 0, 'r3': 1}
+    assert livre.changements('revenus', 2, instantane.versions['revenus']) == [(None, {'id': 'r3', 'montant': 20})]
+
+
+def test_historique_d_une_demande_volumineuse(livre):
+    depuis = livre.instantane().versions['revenus']
+    for debut in range(0, 80 * 100, 100):
+        livre.soumettre([{'op': 'ajout', 'col': 'revenus', 'rec': {'id': f'i{n}', 'montant': n}}
+                         for n in range(debut, debut + 100)])
+    instantane = livre.instantane()
+    assert instantane.versions['revenus'] == depuis + 80
+    changements = livre.changements('revenus', instantane.versions['revenus'] - 50, instantane.versions['revenus'])
+    assert len(changements) == 50 * 100